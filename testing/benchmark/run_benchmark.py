@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+""" Run report_tool.py stages against the synthetic databases
+
+Each stage is a report_tool.py run for one data source. Its wall time and
+peak memory (max RSS) are appended as a JSON line to the results file,
+with the git revision, so the results of different revisions can be
+compared with --compare.
+"""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from optparse import OptionParser
+
+from synthetic_dbs import SyntheticDBs, get_db_names, parse_scale
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_TOOL_DIR = os.path.join(BENCHMARK_DIR, "..", "..", "vizGrimoireJS")
+
+# report_tool.py data source name: synthetic database
+DATA_SOURCES = {"scm": "cvsanaly", "its": "bicho", "mls": "mlstats", "scr": "gerrit"}
+
+# (stage, report_tool.py options) for all the data sources
+STAGES = [
+    ("global", ["--no-filters"]), # evolutionary, aggregated, top and studies
+    ("filter-repository", ["--filter", "repository"]),
+    ("filter-company", ["--filter", "company"]),
+    ("filter-country", ["--filter", "country"])
+]
+
+# Key metrics and studies of each data source, run alone
+METRICS = {"scm": ["commits", "authors", "added_lines"], "its": ["opened", "closed"],
+           "mls": ["sent", "senders"], "scr": ["submitted", "merged"]}
+STUDIES = {"scm": ["onion", "contributors_new_gone"],
+           "its": ["times_tickets", "tickets_states"], "mls": [], "scr": []}
+
+CONFIG = """
+[generic]
+db_user = %(user)s
+db_password = %(password)s
+db_identities = %(sortinghat)s
+db_sortinghat = %(sortinghat)s
+db_cvsanaly = %(cvsanaly)s
+db_bicho = %(bicho)s
+db_gerrit = %(gerrit)s
+db_mlstats = %(mlstats)s
+
+[bicho]
+backend = bg
+
+[r]
+start_date = 2010-01-01
+end_date = 2015-01-01
+period = months
+reports = repositories,organizations,countries,people
+studies = %(studies)s
+"""
+
+def get_matrix(data_sources):
+    """ [(data source, stage, report_tool.py options)] """
+    matrix = []
+    for ds in data_sources:
+        options = ["--data-source", ds]
+        for (stage, stage_options) in STAGES:
+            matrix.append((ds, stage, options + stage_options))
+        for metric in METRICS[ds]:
+            matrix.append((ds, "metric-" + metric, options + ["--metric", metric]))
+        for study in STUDIES[ds]:
+            matrix.append((ds, "study-" + study, options + ["--study", study]))
+    return matrix
+
+def get_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd = BENCHMARK_DIR).strip()
+    except Exception:
+        return None
+
+def write_config(path, opts, db_names):
+    params = dict(db_names)
+    params["user"] = opts.dbuser
+    params["password"] = opts.dbpassword
+    params["studies"] = ",".join(sorted(set(sum(STUDIES.values(), []))))
+    with open(path, "w") as f:
+        f.write(CONFIG % params)
+
+def run_stage(config_file, destdir, options):
+    """ Runs report_tool.py, returns (exit status, seconds, max RSS in KB) """
+    cmd = [sys.executable, "report_tool.py", "-c", config_file, "-o", destdir] + options
+    with open(os.devnull, "w") as devnull:
+        start = time.time()
+        proc = subprocess.Popen(cmd, cwd = REPORT_TOOL_DIR, stdout = devnull, stderr = devnull)
+        # wait4 returns the resources used by this child only
+        (pid, status, rusage) = os.wait4(proc.pid, 0)
+        seconds = time.time() - start
+    return (os.WEXITSTATUS(status), seconds, rusage.ru_maxrss)
+
+def run(opts):
+    revision = get_revision()
+    data_sources = opts.data_sources or sorted(DATA_SOURCES.keys())
+    for scale in opts.scales:
+        db_names = get_db_names(opts.prefix, scale)
+        if opts.generate:
+            import MySQLdb
+            conn = MySQLdb.connect(user=opts.dbuser, passwd=opts.dbpassword,
+                                   host=opts.dbhost, charset="utf8")
+            SyntheticDBs(conn.cursor(), db_names, parse_scale(scale)).create()
+            conn.close()
+
+        workdir = tempfile.mkdtemp(prefix = "grimoirelib-benchmark-")
+        try:
+            config_file = os.path.join(workdir, "main.conf")
+            write_config(config_file, opts, db_names)
+            for (ds, stage, options) in get_matrix(data_sources):
+                if opts.stages and stage not in opts.stages: continue
+                destdir = os.path.join(workdir, "json")
+                os.mkdir(destdir)
+                status, seconds, max_rss = run_stage(config_file, destdir, options)
+                shutil.rmtree(destdir)
+                result = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "revision": revision,
+                          "scale": scale, "data_source": ds, "stage": stage,
+                          "seconds": round(seconds, 3), "max_rss_kb": max_rss,
+                          "status": status}
+                logging.info("%(scale)s %(data_source)s %(stage)s: %(seconds).1fs "
+                             "%(max_rss_kb)i KB (status %(status)i)" % result)
+                with open(opts.results, "a") as f:
+                    f.write(json.dumps(result) + "\n")
+        finally:
+            shutil.rmtree(workdir)
+
+def compare(results_file):
+    """ Last two results of each stage, with the time and memory changes """
+    runs = {}
+    with open(results_file) as f:
+        for line in f:
+            result = json.loads(line)
+            if result["status"] != 0: continue
+            key = (result["scale"], result["data_source"], result["stage"])
+            runs.setdefault(key, []).append(result)
+    change = lambda prev, last: 100.0 * (last - prev) / prev if prev else 0
+    print "%-6s %-4s %-32s %10s %8s %10s %8s" % ("scale", "ds", "stage", "seconds", "change",
+                                                 "max RSS KB", "change")
+    for key in sorted(runs):
+        last = runs[key][-1]
+        prev = runs[key][-2] if len(runs[key]) > 1 else last
+        print "%-6s %-4s %-32s %10.1f %+7.1f%% %10i %+7.1f%%" % \
+            (key + (last["seconds"], change(prev["seconds"], last["seconds"]),
+                    last["max_rss_kb"], change(prev["max_rss_kb"], last["max_rss_kb"])))
+
+def get_options():
+    parser = OptionParser(usage='Usage: %prog [options]',
+                          description='Benchmark report_tool.py with synthetic databases',
+                          version='0.1')
+    parser.add_option("-s", "--scale", action="append", dest="scales",
+                      help="Scale of the databases: 10k, 1M, 10M ... (default 10k)")
+    parser.add_option("-u", "--db-user", action="store", dest="dbuser", default="root",
+                      help="MySQL user")
+    parser.add_option("-p", "--db-password", action="store", dest="dbpassword", default="",
+                      help="MySQL password")
+    parser.add_option("--db-host", action="store", dest="dbhost", default="127.0.0.1",
+                      help="MySQL host")
+    parser.add_option("--prefix", action="store", dest="prefix", default="bench",
+                      help="Prefix of the databases names")
+    parser.add_option("--generate", action="store_true", dest="generate", default=False,
+                      help="Generate the synthetic databases before the benchmark")
+    parser.add_option("--data-source", action="append", dest="data_sources",
+                      help="Data source to benchmark (all if not used)")
+    parser.add_option("--stage", action="append", dest="stages",
+                      help="Stage to run (all if not used)")
+    parser.add_option("-r", "--results", action="store", dest="results",
+                      default="benchmark-results.jsonl",
+                      help="File where the results are appended")
+    parser.add_option("--compare", action="store_true", dest="compare", default=False,
+                      help="Show the changes between the last two results of each stage")
+    (opts, args) = parser.parse_args()
+    if len(args) != 0:
+        parser.error("Wrong number of arguments")
+    if opts.scales is None: opts.scales = ["10k"]
+    for ds in opts.data_sources or []:
+        if ds not in DATA_SOURCES:
+            parser.error("Data source not supported: " + ds)
+    return opts
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    opts = get_options()
+    if opts.compare:
+        compare(opts.results)
+    else:
+        run(opts)
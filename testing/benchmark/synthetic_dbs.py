@@ -0,0 +1,520 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+""" Synthetic CVSAnalY, Bicho, MLStats, Gerrit and SortingHat databases
+
+The databases have the tables and columns used by GrimoireLib, with the
+activity of a community of a given scale: scale commits, scale messages,
+scale/10 tickets and scale/20 reviews. Activity per person, organization
+and repository follows Zipf distributions, and it grows over time. The
+same seed always generates the same databases.
+"""
+
+import bisect
+import datetime
+import hashlib
+import logging
+import random
+from optparse import OptionParser
+
+SCHEMAS = {
+    "sortinghat": [
+        "CREATE TABLE uidentities (uuid VARCHAR(128) PRIMARY KEY, identifier VARCHAR(128), "
+        "last_modified DATETIME)",
+        "CREATE TABLE profiles (uuid VARCHAR(128) PRIMARY KEY, name VARCHAR(128), "
+        "email VARCHAR(128), gender VARCHAR(32), is_bot TINYINT(1) DEFAULT 0, "
+        "country_code VARCHAR(2))",
+        "CREATE TABLE countries (code VARCHAR(2) PRIMARY KEY, name VARCHAR(128), "
+        "alpha3 VARCHAR(3))",
+        "CREATE TABLE organizations (id INT PRIMARY KEY, name VARCHAR(191))",
+        "CREATE TABLE enrollments (id INT PRIMARY KEY, uuid VARCHAR(128), "
+        "organization_id INT, start DATETIME, end DATETIME, INDEX (uuid))",
+        "CREATE TABLE identities (id VARCHAR(128) PRIMARY KEY, name VARCHAR(128), "
+        "email VARCHAR(128), username VARCHAR(128), source VARCHAR(32), "
+        "uuid VARCHAR(128), last_modified DATETIME)"
+    ],
+    "cvsanaly": [
+        "CREATE TABLE repositories (id INT PRIMARY KEY, uri VARCHAR(255), "
+        "name VARCHAR(255), type VARCHAR(30))",
+        "CREATE TABLE people (id INT PRIMARY KEY, name VARCHAR(255), email VARCHAR(255))",
+        "CREATE TABLE people_uidentities (people_id INT, uuid VARCHAR(128))",
+        "CREATE TABLE scmlog (id INT PRIMARY KEY, rev MEDIUMTEXT, committer_id INT, "
+        "author_id INT, date DATETIME, date_tz INT, author_date DATETIME, "
+        "author_date_tz INT, message LONGTEXT, composed_rev TINYINT(1), "
+        "repository_id INT, INDEX (author_id), INDEX (author_date))",
+        "CREATE TABLE branches (id INT PRIMARY KEY, name VARCHAR(255))",
+        "CREATE TABLE files (id INT PRIMARY KEY, file_name VARCHAR(255), repository_id INT)",
+        "CREATE TABLE file_types (id INT PRIMARY KEY, file_id INT, type MEDIUMTEXT)",
+        "CREATE TABLE actions (id INT PRIMARY KEY, type VARCHAR(1), file_id INT, "
+        "commit_id INT, branch_id INT, current_file_path VARCHAR(255), INDEX (commit_id))",
+        "CREATE TABLE commits_lines (id INT PRIMARY KEY, commit_id INT, added INT, "
+        "removed INT, INDEX (commit_id))"
+    ],
+    "bicho": [
+        "CREATE TABLE trackers (id INT PRIMARY KEY, url VARCHAR(255), type VARCHAR(32))",
+        "CREATE TABLE people (id INT PRIMARY KEY, name VARCHAR(255), email VARCHAR(255), "
+        "user_id VARCHAR(255))",
+        "CREATE TABLE people_uidentities (people_id INT, uuid VARCHAR(128))",
+        "CREATE TABLE issues (id INT PRIMARY KEY, tracker_id INT, issue VARCHAR(255), "
+        "type VARCHAR(32), summary VARCHAR(255), description TEXT, status VARCHAR(32), "
+        "resolution VARCHAR(32), priority VARCHAR(32), submitted_by INT, "
+        "submitted_on DATETIME, assigned_to INT, INDEX (submitted_on))",
+        "CREATE TABLE changes (id INT PRIMARY KEY, issue_id INT, field VARCHAR(64), "
+        "old_value VARCHAR(255), new_value VARCHAR(255), changed_by INT, "
+        "changed_on DATETIME, INDEX (issue_id), INDEX (changed_on))",
+        "CREATE TABLE comments (id INT PRIMARY KEY, issue_id INT, comment_id INT, "
+        "text TEXT, submitted_by INT, submitted_on DATETIME, INDEX (issue_id))"
+    ],
+    "mlstats": [
+        "CREATE TABLE mailing_lists (mailing_list_url VARCHAR(255) PRIMARY KEY, "
+        "mailing_list_name VARCHAR(255), project_name VARCHAR(255), last_analysis DATETIME)",
+        "CREATE TABLE people (email_address VARCHAR(255) PRIMARY KEY, name VARCHAR(255), "
+        "username VARCHAR(255), domain_name VARCHAR(255), top_level_domain VARCHAR(255))",
+        "CREATE TABLE people_uidentities (people_id VARCHAR(255), uuid VARCHAR(128))",
+        "CREATE TABLE messages (message_id VARCHAR(255) PRIMARY KEY, "
+        "mailing_list_url VARCHAR(255), mailing_list VARCHAR(255), subject VARCHAR(1024), "
+        "message_body MEDIUMTEXT, is_response_of VARCHAR(255), mail_path TEXT, "
+        "arrival_date DATETIME, first_date DATETIME, first_date_tz INT, "
+        "INDEX (first_date), INDEX (is_response_of))",
+        "CREATE TABLE messages_people (type_of_recipient VARCHAR(20), "
+        "message_id VARCHAR(255), email_address VARCHAR(255), mailing_list_url VARCHAR(255), "
+        "INDEX (message_id), INDEX (email_address))"
+    ],
+    "gerrit": [
+        "CREATE TABLE trackers (id INT PRIMARY KEY, url VARCHAR(255), type VARCHAR(32))",
+        "CREATE TABLE people (id INT PRIMARY KEY, name VARCHAR(255), email VARCHAR(255), "
+        "user_id VARCHAR(255))",
+        "CREATE TABLE people_uidentities (people_id INT, uuid VARCHAR(128))",
+        "CREATE TABLE issues (id INT PRIMARY KEY, tracker_id INT, issue VARCHAR(255), "
+        "type VARCHAR(32), summary VARCHAR(255), status VARCHAR(32), submitted_by INT, "
+        "submitted_on DATETIME, INDEX (submitted_on))",
+        "CREATE TABLE issues_ext_gerrit (id INT PRIMARY KEY, branch VARCHAR(255), "
+        "url VARCHAR(255), change_id VARCHAR(255), project VARCHAR(255), "
+        "status VARCHAR(32), issue_id INT, INDEX (issue_id))",
+        "CREATE TABLE changes (id INT PRIMARY KEY, issue_id INT, field VARCHAR(64), "
+        "old_value VARCHAR(255), new_value VARCHAR(255), changed_by INT, "
+        "changed_on DATETIME, INDEX (issue_id), INDEX (changed_on))"
+    ]
+}
+
+COUNTRIES = [("US", "United States", "USA"), ("ES", "Spain", "ESP"),
+             ("DE", "Germany", "DEU"), ("IN", "India", "IND"),
+             ("CN", "China", "CHN"), ("FR", "France", "FRA"),
+             ("BR", "Brazil", "BRA"), ("GB", "United Kingdom", "GBR")]
+
+
+def parse_scale(scale):
+    """ 10k, 1M or 10M: number of commits and messages """
+    units = {"k": 1000, "m": 1000000}
+    if scale[-1].lower() in units:
+        return int(float(scale[:-1]) * units[scale[-1].lower()])
+    return int(scale)
+
+def get_db_names(prefix, scale):
+    """ Names of the databases generated for a scale """
+    return dict([(db, "%s_%s_%s" % (prefix, str(scale).lower(), db)) for db in SCHEMAS])
+
+
+class ZipfChooser(object):
+    """ Choose items 0..n-1 with probability proportional to 1/(rank+1)^s """
+
+    def __init__(self, n, s, rnd):
+        self.rnd = rnd
+        self.cumulative = []
+        total = 0.0
+        for rank in range(1, n + 1):
+            total += 1.0 / rank ** s
+            self.cumulative.append(total)
+        self.total = total
+
+    def choose(self):
+        return bisect.bisect_left(self.cumulative, self.rnd.random() * self.total)
+
+
+class SyntheticDBs(object):
+    """ Generator of a set of related databases for a community of a scale """
+
+    batch_size = 5000
+
+    def __init__(self, cursor, db_names, scale, seed = 1,
+                 startdate = datetime.datetime(2010, 1, 1),
+                 enddate = datetime.datetime(2014, 12, 31)):
+        self.cursor = cursor
+        self.db_names = db_names
+        self.scale = scale
+        self.rnd = random.Random(seed)
+        self.startdate = startdate
+        self.span = (enddate - startdate).total_seconds()
+
+        self.npeople = min(max(50, scale / 100), 200000)
+        self.norgs = max(5, self.npeople / 20)
+        self.people = ZipfChooser(self.npeople, 1.1, self.rnd)
+
+    def _get_date(self, after = None, max_days = None):
+        """ Activity grows over time: more dates near the end """
+        if after is None:
+            seconds = self.span * self.rnd.random() ** 0.5
+            return self.startdate + datetime.timedelta(seconds = seconds)
+        return after + datetime.timedelta(seconds = self.rnd.random() * max_days * 86400)
+
+    def _get_sorted_dates(self, n):
+        """ n dates in ascending order, without storing all of them """
+        # Order statistics of n uniform values, from the maximum to the minimum
+        value = 1.0
+        for k in xrange(n, 0, -1):
+            value *= self.rnd.random() ** (1.0 / k)
+            seconds = self.span * (1 - value) ** 0.5
+            yield self.startdate + datetime.timedelta(seconds = seconds)
+
+    def _get_uuid(self, person):
+        return hashlib.sha1(str(person)).hexdigest()
+
+    def _insert(self, table, columns, rows):
+        """ Insert rows from an iterator in batches """
+        q = "INSERT INTO %s (%s) VALUES (%s)" % (table, ",".join(columns),
+                                                 ",".join(["%s"] * len(columns)))
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.cursor.executemany(q, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self.cursor.executemany(q, batch)
+            total += len(batch)
+        self.cursor.connection.commit()
+        logging.info("%i rows in %s" % (total, table))
+
+    def _create(self, db):
+        name = self.db_names[db]
+        self.cursor.execute("DROP DATABASE IF EXISTS " + name)
+        self.cursor.execute("CREATE DATABASE " + name + " CHARACTER SET utf8")
+        self.cursor.execute("USE " + name)
+        for sql in SCHEMAS[db]:
+            self.cursor.execute(sql)
+        logging.info("Generating " + name)
+
+    def _people_rows(self):
+        """ (id, person) of the people in a data source: some have two ids """
+        people_id = 0
+        for person in range(0, self.npeople):
+            for i in range(0, 2 if person % 10 == 0 else 1):
+                people_id += 1
+                yield (people_id, person)
+
+    def _get_people_ids(self):
+        people_ids = [[] for person in range(0, self.npeople)]
+        for (people_id, person) in self._people_rows():
+            people_ids[person].append(people_id)
+        return people_ids
+
+    def _create_people(self, user_id = False):
+        """ people and people_uidentities tables of CVSAnalY and Bicho """
+        rows = [(people_id, "Person %i" % person, "person%i@example.com" % person)
+                for (people_id, person) in self._people_rows()]
+        columns = ["id", "name", "email"]
+        if user_id:
+            rows = [row + (row[2].split("@")[0],) for row in rows]
+            columns.append("user_id")
+        self._insert("people", columns, rows)
+        self._insert("people_uidentities", ["people_id", "uuid"],
+                     [(people_id, self._get_uuid(person))
+                      for (people_id, person) in self._people_rows()])
+
+    def create_sortinghat(self):
+        self._create("sortinghat")
+        countries = ZipfChooser(len(COUNTRIES), 1.0, self.rnd)
+        orgs = ZipfChooser(self.norgs, 1.2, self.rnd)
+        now = datetime.datetime(2015, 1, 1)
+
+        self._insert("countries", ["code", "name", "alpha3"], COUNTRIES)
+        self._insert("organizations", ["id", "name"],
+                     [(org + 1, "Organization %i" % org) for org in range(0, self.norgs)])
+        self._insert("uidentities", ["uuid", "identifier", "last_modified"],
+                     [(self._get_uuid(p), "Person %i" % p, now) for p in range(0, self.npeople)])
+        self._insert("profiles", ["uuid", "name", "email", "is_bot", "country_code"],
+                     [(self._get_uuid(p), "Person %i" % p, "person%i@example.com" % p,
+                       1 if p % 500 == 7 else 0, COUNTRIES[countries.choose()][0])
+                      for p in range(0, self.npeople)])
+        self._insert("identities", ["id", "name", "email", "username", "source", "uuid"],
+                     [(self._get_uuid(p), "Person %i" % p, "person%i@example.com" % p,
+                       "person%i" % p, "synthetic", self._get_uuid(p))
+                      for p in range(0, self.npeople)])
+
+        def enrollments():
+            enrollment_id = 0
+            for person in range(0, self.npeople):
+                # Some people have no organization, some changed of organization
+                if person % 4 == 3: continue
+                start = datetime.datetime(1900, 1, 1)
+                for i in range(0, 2 if person % 7 == 0 else 1):
+                    end = datetime.datetime(2100, 1, 1)
+                    if i == 0 and person % 7 == 0: end = self._get_date()
+                    enrollment_id += 1
+                    yield (enrollment_id, self._get_uuid(person), orgs.choose() + 1, start, end)
+                    start = end
+        self._insert("enrollments", ["id", "uuid", "organization_id", "start", "end"],
+                     enrollments())
+
+    def create_cvsanaly(self):
+        self._create("cvsanaly")
+        people_ids = self._get_people_ids()
+        nrepos = min(max(5, self.scale / 2000), 500)
+        nfiles = max(100, self.scale / 5)
+        repos = ZipfChooser(nrepos, 1.0, self.rnd)
+        files = ZipfChooser(nfiles, 0.8, self.rnd)
+        branches = ZipfChooser(10, 2.0, self.rnd)
+
+        self._create_people()
+        self._insert("repositories", ["id", "uri", "name", "type"],
+                     [(r + 1, "https://example.com/repo%i.git" % r, "repo%i" % r, "git")
+                      for r in range(0, nrepos)])
+        self._insert("branches", ["id", "name"],
+                     [(b + 1, "branch%i" % b if b > 0 else "master") for b in range(0, 10)])
+        self._insert("files", ["id", "file_name", "repository_id"],
+                     [(f + 1, "file%i.py" % f, f % nrepos + 1) for f in range(0, nfiles)])
+        self._insert("file_types", ["id", "file_id", "type"],
+                     [(f + 1, f + 1, ["code", "documentation", "build"][f % 3])
+                      for f in range(0, nfiles)])
+
+        # Commits are generated ordered by date, as in a real repository
+        commits = []
+        for (i, date) in enumerate(self._get_sorted_dates(self.scale)):
+            author = self.rnd.choice(people_ids[self.people.choose()])
+            committer = author
+            if self.rnd.random() < 0.2:
+                committer = self.rnd.choice(people_ids[self.people.choose()])
+            commits.append((i + 1, hashlib.sha1("commit%i" % i).hexdigest(), committer,
+                            author, date, 0, date, 0, "Commit %i" % i, 0,
+                            repos.choose() + 1))
+            if len(commits) == self.batch_size:
+                self._insert("scmlog", ["id", "rev", "committer_id", "author_id", "date",
+                                        "date_tz", "author_date", "author_date_tz",
+                                        "message", "composed_rev", "repository_id"], commits)
+                commits = []
+        self._insert("scmlog", ["id", "rev", "committer_id", "author_id", "date", "date_tz",
+                                "author_date", "author_date_tz", "message", "composed_rev",
+                                "repository_id"], commits)
+
+        def actions():
+            action_id = 0
+            for commit in xrange(1, self.scale + 1):
+                # 2% of commits are merges, without actions
+                if commit % 50 == 0: continue
+                for i in range(0, 1 + int(self.rnd.paretovariate(1.5)) % 10):
+                    action_id += 1
+                    file_id = files.choose() + 1
+                    yield (action_id, self.rnd.choice("AMMMMD"), file_id, commit,
+                           branches.choose() + 1, "file%i.py" % (file_id - 1))
+        self._insert("actions", ["id", "type", "file_id", "commit_id", "branch_id",
+                                 "current_file_path"], actions())
+        self._insert("commits_lines", ["id", "commit_id", "added", "removed"],
+                     ((c, c, int(self.rnd.paretovariate(1.2) * 5), int(self.rnd.paretovariate(1.4) * 3))
+                      for c in xrange(1, self.scale + 1)))
+
+    def create_bicho(self):
+        self._create("bicho")
+        people_ids = self._get_people_ids()
+        nissues = max(100, self.scale / 10)
+        trackers = ZipfChooser(min(max(2, nissues / 5000), 50), 1.0, self.rnd)
+        statuses = ["NEW", "ASSIGNED", "RESOLVED", "CLOSED"]
+
+        self._create_people(user_id = True)
+        self._insert("trackers", ["id", "url", "type"],
+                     [(t + 1, "https://bugs.example.com/tracker%i" % t, "bugzilla")
+                      for t in range(0, len(trackers.cumulative))])
+        issues, changes, comments = [], [], []
+        change_id, comment_id = 0, 0
+        columns = {"issues": ["id", "tracker_id", "issue", "type", "summary", "status",
+                              "priority", "submitted_by", "submitted_on", "assigned_to"],
+                   "changes": ["id", "issue_id", "field", "old_value", "new_value",
+                               "changed_by", "changed_on"],
+                   "comments": ["id", "issue_id", "comment_id", "text", "submitted_by",
+                                "submitted_on"]}
+        for issue in xrange(1, nissues + 1):
+            submitted_on = self._get_date()
+            status = "NEW"
+            date = submitted_on
+            for i in range(0, self.rnd.randint(0, 8)):
+                date = self._get_date(date, 30)
+                new_status = self.rnd.choice(statuses)
+                change_id += 1
+                changes.append((change_id, issue, "Status", status, new_status,
+                                self.rnd.choice(people_ids[self.people.choose()]), date))
+                status = new_status
+            for i in range(0, self.rnd.randint(0, 5)):
+                comment_id += 1
+                comments.append((comment_id, issue, i, "Comment %i" % comment_id,
+                                 self.rnd.choice(people_ids[self.people.choose()]),
+                                 self._get_date(submitted_on, 60)))
+            issues.append((issue, trackers.choose() + 1, str(issue), "Bug", "Issue %i" % issue,
+                           status, "Normal", self.rnd.choice(people_ids[self.people.choose()]),
+                           submitted_on, self.rnd.choice(people_ids[self.people.choose()])))
+            if len(issues) == self.batch_size:
+                for table, rows in [("issues", issues), ("changes", changes),
+                                    ("comments", comments)]:
+                    self._insert(table, columns[table], rows)
+                issues, changes, comments = [], [], []
+        for table, rows in [("issues", issues), ("changes", changes), ("comments", comments)]:
+            self._insert(table, columns[table], rows)
+
+    def create_mlstats(self):
+        self._create("mlstats")
+        nlists = min(max(2, self.scale / 20000), 100)
+        lists = ZipfChooser(nlists, 1.0, self.rnd)
+        list_url = lambda l: "https://lists.example.com/list%i" % l
+
+        self._insert("mailing_lists", ["mailing_list_url", "mailing_list_name", "project_name"],
+                     [(list_url(l), "list%i" % l, "project") for l in range(0, nlists)])
+        self._insert("people", ["email_address", "name", "username", "domain_name",
+                                "top_level_domain"],
+                     [("person%i@example.com" % p, "Person %i" % p, "person%i" % p,
+                       "example.com", "com") for p in range(0, self.npeople)])
+        self._insert("people_uidentities", ["people_id", "uuid"],
+                     [("person%i@example.com" % p, self._get_uuid(p))
+                      for p in range(0, self.npeople)])
+
+        messages, messages_people = [], []
+        mlist = {} # message: mailing list of the last messages, for replies
+        for (i, date) in enumerate(self._get_sorted_dates(self.scale)):
+            message_id = "<%i@example.com>" % i
+            parent = None
+            mailing_list = lists.choose()
+            if i > 0 and self.rnd.random() < 0.6:
+                parent = i - self.rnd.randint(1, min(i, 500))
+                mailing_list = mlist[parent]
+            mlist[i] = mailing_list
+            mlist.pop(i - 500, None)
+            sender = "person%i@example.com" % self.people.choose()
+            messages.append((message_id, list_url(mailing_list), "list%i" % mailing_list,
+                             "Subject %i" % (parent if parent is not None else i), "Body",
+                             "<%i@example.com>" % parent if parent is not None else None,
+                             date, date, 0))
+            messages_people.append(("From", message_id, sender, list_url(mailing_list)))
+            if len(messages) == self.batch_size:
+                self._insert_messages(messages, messages_people)
+                messages, messages_people = [], []
+        self._insert_messages(messages, messages_people)
+
+    def _insert_messages(self, messages, messages_people):
+        self._insert("messages", ["message_id", "mailing_list_url", "mailing_list", "subject",
+                                  "message_body", "is_response_of", "arrival_date",
+                                  "first_date", "first_date_tz"], messages)
+        self._insert("messages_people", ["type_of_recipient", "message_id", "email_address",
+                                         "mailing_list_url"], messages_people)
+
+    def create_gerrit(self):
+        self._create("gerrit")
+        people_ids = self._get_people_ids()
+        nreviews = max(100, self.scale / 20)
+        projects = ZipfChooser(min(max(2, nreviews / 2000), 200), 1.0, self.rnd)
+
+        self._create_people(user_id = True)
+        self._insert("trackers", ["id", "url", "type"],
+                     [(t + 1, "review.example.com_project%i" % t, "gerrit")
+                      for t in range(0, len(projects.cumulative))])
+        issues, issues_ext, changes = [], [], []
+        change_id = 0
+        for review in xrange(1, nreviews + 1):
+            submitted_by = self.rnd.choice(people_ids[self.people.choose()])
+            date = self._get_date()
+            status = self.rnd.choice(["MERGED", "MERGED", "MERGED", "ABANDONED", "NEW"])
+            for patchset in range(1, 2 + int(self.rnd.paretovariate(2.0)) % 5):
+                date = self._get_date(date, 5)
+                change_id += 1
+                changes.append((change_id, review, "status", str(patchset), "UPLOADED",
+                                submitted_by, date))
+                for vote in range(0, self.rnd.randint(0, 3)):
+                    change_id += 1
+                    changes.append((change_id, review, self.rnd.choice(["Code-Review", "Verified"]),
+                                    str(patchset), self.rnd.choice(["-2", "-1", "1", "2"]),
+                                    self.rnd.choice(people_ids[self.people.choose()]),
+                                    self._get_date(date, 3)))
+            if status != "NEW":
+                change_id += 1
+                changes.append((change_id, review, "status", None, status,
+                                self.rnd.choice(people_ids[self.people.choose()]),
+                                self._get_date(date, 5)))
+            project = projects.choose()
+            issues.append((review, project + 1, str(review), "change", "Review %i" % review,
+                           status, submitted_by, date))
+            issues_ext.append((review, "master", "https://review.example.com/%i" % review,
+                               hashlib.sha1("review%i" % review).hexdigest(),
+                               "project%i" % project, status, review))
+            if len(issues) == self.batch_size:
+                self._insert_reviews(issues, issues_ext, changes)
+                issues, issues_ext, changes = [], [], []
+        self._insert_reviews(issues, issues_ext, changes)
+
+    def _insert_reviews(self, issues, issues_ext, changes):
+        self._insert("issues", ["id", "tracker_id", "issue", "type", "summary", "status",
+                                "submitted_by", "submitted_on"], issues)
+        self._insert("issues_ext_gerrit", ["id", "branch", "url", "change_id", "project",
+                                           "status", "issue_id"], issues_ext)
+        self._insert("changes", ["id", "issue_id", "field", "old_value", "new_value",
+                                 "changed_by", "changed_on"], changes)
+
+    def create(self, dbs = None):
+        """ Generate all the databases, or only dbs """
+        if dbs is None: dbs = ["sortinghat", "cvsanaly", "bicho", "mlstats", "gerrit"]
+        for db in dbs:
+            getattr(self, "create_" + db)()
+
+
+def get_options():
+    parser = OptionParser(usage='Usage: %prog [options]',
+                          description='Generate synthetic MetricsGrimoire databases',
+                          version='0.1')
+    parser.add_option("-s", "--scale", action="store", dest="scale", default="10k",
+                      help="Number of commits and messages: 10k, 1M, 10M ...")
+    parser.add_option("-u", "--db-user", action="store", dest="dbuser", default="root",
+                      help="MySQL user")
+    parser.add_option("-p", "--db-password", action="store", dest="dbpassword", default="",
+                      help="MySQL password")
+    parser.add_option("--db-host", action="store", dest="dbhost", default="127.0.0.1",
+                      help="MySQL host")
+    parser.add_option("--prefix", action="store", dest="prefix", default="bench",
+                      help="Prefix of the databases names")
+    parser.add_option("--seed", action="store", type="int", dest="seed", default=1,
+                      help="Seed of the random generator")
+    parser.add_option("--db", action="append", dest="dbs",
+                      help="Database to generate (all if not used): " + ",".join(SCHEMAS))
+    (opts, args) = parser.parse_args()
+    if len(args) != 0:
+        parser.error("Wrong number of arguments")
+    return opts
+
+if __name__ == '__main__':
+    import MySQLdb
+
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    opts = get_options()
+    conn = MySQLdb.connect(user=opts.dbuser, passwd=opts.dbpassword, host=opts.dbhost,
+                           charset="utf8")
+    db_names = get_db_names(opts.prefix, opts.scale)
+    SyntheticDBs(conn.cursor(), db_names, parse_scale(opts.scale), opts.seed).create(opts.dbs)
+    conn.close()
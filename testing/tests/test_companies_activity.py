@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the organizations activity study"""
+
+import sys
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.analysis.companies_activity import CompaniesActivity
+from vizgrimoire.report import Report
+
+
+class FakeDB(object):
+    """ Returns the same result for all the queries """
+
+    def __init__(self, result):
+        self.result = result
+        self.queries = []
+
+    def ExecuteQuery(self, sql):
+        self.queries.append(sql)
+        return dict([(key, list(value)) for (key, value) in self.result.items()])
+
+
+class TestCompaniesActivity(unittest.TestCase):
+
+    def setUp(self):
+        self.automator = Report._automator
+        Report._automator = {'generic': {'db_identities': 'sortinghat'}}
+
+    def tearDown(self):
+        Report._automator = self.automator
+
+    def test_add_organizations_data(self):
+        activity = {'name': ['Bitergia', 'Other'], 'commits': [10, 3]}
+        study = CompaniesActivity()
+        study.add_organizations_data(activity, {'name': ['New', 'Bitergia'], 'authors': [4, 2]})
+        self.assertEqual(['Bitergia', 'Other', 'New'], activity['name'])
+        self.assertEqual([10, 3, 0], activity['commits'])
+        self.assertEqual([2, 0, 4], activity['authors'])
+        # One row results are not lists
+        study.add_organizations_data(activity, {'name': 'Other', 'actions': 7})
+        self.assertEqual([0, 7, 0], activity['actions'])
+
+    def test_add_metric_years(self):
+        activity = {'name': ['Bitergia', 'Other'], 'lines-added': [100, 30]}
+        db = FakeDB({'name': ['Bitergia', 'Other', 'Bitergia', 'New', 'Old'],
+                     'year': [2013, 2014, 2014, 2014, 2009],
+                     'lines_added': [60, 25, 40, 1, 5]})
+        study = CompaniesActivity(db)
+        study.add_metric_years("lines-added", activity, 2012, 2014)
+
+        self.assertEqual(1, len(db.queries))
+        self.assertTrue("group by org.id, year" in db.queries[0])
+        self.assertEqual(['Bitergia', 'Other', 'New'], activity['name'])
+        self.assertEqual([100, 30, 0], activity['lines-added'])
+        self.assertEqual([0, 0, 0], activity['lines-added_2012'])
+        self.assertEqual([60, 0, 0], activity['lines-added_2013'])
+        self.assertEqual([40, 25, 1], activity['lines-added_2014'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the pool of database connections"""
+
+import sys
+import threading
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.connection_pool import ConnectionPool
+
+
+class FakeConnection(object):
+
+    def __init__(self, **params):
+        self.params = params
+        self.alive = True
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.queries.append(sql)
+
+    def ping(self):
+        if not self.alive: raise Exception(2006, "MySQL server has gone away")
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool(max_size = 1, check_interval = 0,
+                                   connect = FakeConnection)
+
+    def test_same_thread(self):
+        conn1 = self.pool.get("root", "", "scm")
+        conn2 = self.pool.get("root", "", "scm")
+        self.assertIs(conn1, conn2)
+        self.pool.get("root", "", "its")
+        self.assertEqual(2, self.pool.get_stats()["created"])
+
+    def test_session_utc(self):
+        conn = self.pool.get("root", "", "scm")[0]
+        self.assertIn("SET time_zone = '+00:00'", conn.queries)
+
+    def test_release_reuse(self):
+        conn = self.pool.get("root", "", "scm")[0]
+        self.pool.release()
+        self.assertIs(conn, self.pool.get("root", "", "scm")[0])
+        self.assertEqual(1, self.pool.get_stats()["reused"])
+
+    def test_reconnect_lost(self):
+        conn = self.pool.get("root", "", "scm")[0]
+        conn.alive = False
+        self.pool.release()
+        self.assertIsNot(conn, self.pool.get("root", "", "scm")[0])
+        self.assertEqual(1, self.pool.get_stats()["reconnects"])
+
+    def test_bounded(self):
+        # The second thread waits for the connection of the first one
+        conn = self.pool.get("root", "", "scm")[0]
+        conns = []
+        thread = threading.Thread(target = lambda: conns.append(self.pool.get("root", "", "scm")[0]))
+        thread.start()
+        thread.join(0.2)
+        self.assertEqual([], conns)
+        self.pool.release()
+        thread.join()
+        self.assertEqual([conn], conns)
+        self.assertEqual(1, self.pool.get_stats()["open"])
+
+    def test_fork(self):
+        conn = self.pool.get("root", "", "scm")[0]
+        self.pool.pid = -1 # as if the process was forked
+        self.assertIsNot(conn, self.pool.get("root", "", "scm")[0])
+
+    def test_lost_connection(self):
+        self.assertTrue(ConnectionPool.is_lost_connection(Exception(2013, "Lost connection")))
+        self.assertFalse(ConnectionPool.is_lost_connection(Exception(1064, "Syntax error")))
+
+
+if __name__ == '__main__':
+    unittest.main()
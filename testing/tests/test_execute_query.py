@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the results of ExecuteQuery and ExecuteQueryColumnar"""
+
+import math
+import sys
+import unittest
+from decimal import Decimal
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from MySQLdb.constants import FIELD_TYPE
+from MySQLdb.cursors import SSCursor
+
+import vizgrimoire.GrimoireSQL as GrimoireSQL
+from vizgrimoire.metrics.query_builder import DSQuery
+
+
+def column(name, type_code, null_ok = False):
+    """ cursor.description entry of a column """
+    return (name, type_code, None, None, None, None, null_ok)
+
+
+class FakeCursor(object):
+    """ Cursor with the rows of a query result """
+
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = list(rows)
+        self.rowcount = len(rows)
+        self.fetches = 0
+        self.closed = False
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return tuple(rows)
+
+    def fetchone(self):
+        return self.rows.pop(0)
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        rows, self.rows = self.rows[0:size], self.rows[size:]
+        return tuple(rows)
+
+    def close(self):
+        self.closed = True
+
+
+class QueryTestCase(unittest.TestCase):
+    """ Queries executed in a fake cursor """
+
+    def setUp(self):
+        # Query builder not connected to a database
+        self.db = DSQuery.__new__(DSQuery)
+        self.db.database = "scm"
+        self.cursor = None
+        self.cursor_classes = []
+
+    def _execute(self, description, rows):
+        self.cursor = FakeCursor(description, rows)
+        def execute(sql, cursor_class = None):
+            self.cursor_classes.append(cursor_class)
+            return self.cursor
+        self.db._execute = execute
+
+
+class TestExecuteQuery(QueryTestCase):
+
+    def test_rows(self):
+        description = (column("name", FIELD_TYPE.VAR_STRING), column("commits", FIELD_TYPE.LONGLONG))
+        self._execute(description, [("a", 3L), ("b", 1L)])
+        self.assertEqual({"name": ["a", "b"], "commits": [3L, 1L]}, self.db.ExecuteQuery("SELECT 1"))
+
+    def test_one_row(self):
+        # One row results have values instead of lists
+        description = (column("name", FIELD_TYPE.VAR_STRING), column("commits", FIELD_TYPE.LONGLONG))
+        self._execute(description, [("a", 3L)])
+        self.assertEqual({"name": "a", "commits": 3L}, self.db.ExecuteQuery("SELECT 1"))
+
+    def test_no_rows(self):
+        self._execute((column("commits", FIELD_TYPE.LONGLONG),), [])
+        self.assertEqual({"commits": []}, self.db.ExecuteQuery("SELECT 1"))
+
+    def test_no_result(self):
+        self._execute(None, [])
+        self.assertEqual({}, self.db.ExecuteQuery("CREATE TABLE t (id INT)"))
+        self.assertEqual({}, self.db.ExecuteQuery(None))
+
+    def test_grimoire_sql(self):
+        channel = GrimoireSQL.channel
+        GrimoireSQL.channel = self.db
+        try:
+            self._execute((column("commits", FIELD_TYPE.LONGLONG),), [(3L,), (None,)])
+            self.assertEqual({"commits": [3L, None]}, GrimoireSQL.ExecuteQuery("SELECT 1"))
+            self._execute((column("commits", FIELD_TYPE.LONGLONG),), [(3L,)])
+            self.assertEqual({"commits": 3L}, GrimoireSQL.ExecuteQuery("SELECT 1"))
+        finally:
+            GrimoireSQL.channel = channel
+
+
+class TestExecuteQueryColumnar(QueryTestCase):
+
+    def test_dtypes(self):
+        self.assertEqual('int64', DSQuery._get_column_dtype(column("a", FIELD_TYPE.LONG)))
+        self.assertEqual('float64', DSQuery._get_column_dtype(column("a", FIELD_TYPE.LONG, True)))
+        self.assertEqual('float64', DSQuery._get_column_dtype(column("a", FIELD_TYPE.NEWDECIMAL)))
+        self.assertEqual('float64', DSQuery._get_column_dtype(column("a", FIELD_TYPE.DOUBLE, True)))
+        self.assertEqual('object', DSQuery._get_column_dtype(column("a", FIELD_TYPE.DATETIME)))
+        self.assertEqual('object', DSQuery._get_column_dtype(column("a", FIELD_TYPE.VAR_STRING)))
+
+    def test_columns(self):
+        description = (column("id", FIELD_TYPE.LONG), column("time", FIELD_TYPE.NEWDECIMAL, True),
+                       column("closed", FIELD_TYPE.LONGLONG, True), column("name", FIELD_TYPE.VAR_STRING))
+        rows = [(1L, Decimal("2.50"), 3L, "a"), (2L, None, None, "b"), (3L, Decimal("1"), 1L, None)]
+        self._execute(description, rows)
+        result = self.db.ExecuteQueryColumnar("SELECT 1", chunk_size = 2)
+        self.assertEqual([1, 2, 3], result["id"].tolist())
+        self.assertEqual('int64', result["id"].dtype)
+        self.assertEqual(2.5, result["time"][0])
+        self.assertTrue(math.isnan(result["time"][1]))
+        # NULL in integer columns
+        self.assertEqual('float64', result["closed"].dtype)
+        self.assertTrue(math.isnan(result["closed"][1]))
+        self.assertEqual(["a", "b", None], result["name"].tolist())
+        # Read in chunks from a server side cursor, closed at the end
+        self.assertEqual(3, self.cursor.fetches)
+        self.assertTrue(self.cursor.closed)
+        self.assertEqual([SSCursor], self.cursor_classes)
+
+    def test_one_row(self):
+        # Always arrays, also for one row
+        self._execute((column("commits", FIELD_TYPE.LONGLONG),), [(3L,)])
+        result = self.db.ExecuteQueryColumnar("SELECT 1")
+        self.assertEqual([3], result["commits"].tolist())
+
+    def test_no_rows(self):
+        self._execute((column("commits", FIELD_TYPE.LONGLONG), column("name", FIELD_TYPE.STRING)), [])
+        result = self.db.ExecuteQueryColumnar("SELECT 1")
+        self.assertEqual(0, len(result["commits"]))
+        self.assertEqual('int64', result["commits"].dtype)
+        self.assertEqual('object', result["name"].dtype)
+
+    def test_no_result(self):
+        self._execute(None, [])
+        self.assertEqual({}, self.db.ExecuteQueryColumnar("SELECT 1"))
+        self.assertTrue(self.cursor.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
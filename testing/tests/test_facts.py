@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the metrics computed from the facts tables"""
+
+import sys
+import unittest
+from datetime import date
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.facts import FactsTable
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.metrics.query_builder import DSQuery, SCMQuery, IRCQuery
+from vizgrimoire.metrics.scm_metrics import Authors, Commits
+
+
+class TestFacts(unittest.TestCase):
+
+    def setUp(self):
+        # Query builder not connected to a database
+        self.db = SCMQuery.__new__(SCMQuery)
+        self.db.database = "scm"
+        self.db.identities_db = "ids"
+        FactsTable._exists[("scm", "facts_scm")] = True
+        FactsTable._fresh[("scm", "facts_scm")] = True
+        DSQuery.facts = True
+
+    def tearDown(self):
+        DSQuery.facts = False
+        FactsTable._exists = {}
+        FactsTable._fresh = {}
+
+    def _get_metric(self, metric, type_analysis = None):
+        filters = MetricFilters("month", "'2013-01-01'", "'2014-01-01'", type_analysis)
+        return metric(self.db, filters)
+
+    def test_facts_table(self):
+        self.assertEqual("facts_scm", FactsTable.get_facts_table(self.db).name)
+        self.assertIsNone(FactsTable.get_facts_table(IRCQuery.__new__(IRCQuery)))
+
+    def test_global(self):
+        sql = self._get_metric(Commits)._get_query(False)
+        self.assertIn("SUM(f.commits) AS commits FROM facts_scm f", sql)
+        self.assertIn("f.repository = ''", sql)
+        self.assertIn("f.organization = ''", sql)
+
+    def test_all_items(self):
+        sql = self._get_metric(Authors, ["company", None])._get_query(True)
+        self.assertIn("f.organization AS name", sql)
+        self.assertIn("f.organization <> ''", sql)
+        self.assertIn("GROUP BY name", sql)
+
+    def test_fallback(self):
+        # Countries are not in the facts tables
+        sql = self._get_metric(Commits, ["country", "'Spain'"])._get_query(False)
+        self.assertNotIn("facts_scm", sql)
+        DSQuery.facts = False
+        self.assertNotIn("facts_scm", self._get_metric(Commits)._get_query(False))
+
+    def _check_fresh(self, until, after, identities = "1,2,3"):
+        """ Facts built with 10 commits until the end of 2014-03-01 """
+        del FactsTable._fresh[("scm", "facts_scm")]
+        facts = FactsTable.get_facts_table(self.db)
+        def execute(sql):
+            if "FROM facts_state" in sql: return [(date(2014, 3, 1), 10, "1,2,3")]
+            if "CHECKSUM TABLE" in sql:
+                return [(table, checksum) for (table, checksum) in
+                        zip(["people_uidentities", "ids.enrollments", "ids.organizations"],
+                            identities.split(","))]
+            if ">= '2014-03-01' + INTERVAL 1 DAY" in sql: return [(after,)]
+            if "< '2014-03-01' + INTERVAL 1 DAY" in sql: return [(until,)]
+            raise Exception("Unexpected query: " + sql)
+        facts._execute = execute
+        return facts.is_fresh()
+
+    def test_fresh(self):
+        self.assertTrue(self._check_fresh(10, 0))
+        self.assertIn("facts_scm", self._get_metric(Commits)._get_query(False))
+
+    def test_actions_added_before(self):
+        self.assertFalse(self._check_fresh(11, 0))
+        self.assertNotIn("facts_scm", self._get_metric(Commits)._get_query(False))
+
+    def test_actions_added_watermark_day(self):
+        # Commits of 2014-03-01 added after the build are also detected
+        self.assertFalse(self._check_fresh(12, 0))
+
+    def test_actions_added_after(self):
+        self.assertFalse(self._check_fresh(10, 3))
+        self.assertNotIn("facts_scm", self._get_metric(Commits)._get_query(False))
+
+    def test_identities_changed(self):
+        self.assertFalse(self._check_fresh(10, 0, "1,5,3"))
+        self.assertNotIn("facts_scm", self._get_metric(Commits)._get_query(False))
+
+    def test_set_state(self):
+        facts = FactsTable.get_facts_table(self.db)
+        queries = []
+        def execute(sql):
+            queries.append(sql)
+            if "INTERVAL 1 DAY" in sql: return [(12,)]
+            return [(10,)]
+        facts._execute = execute
+        facts._set_state("'2014-03-01'", "1,2,3")
+        self.assertIn("VALUES ('facts_scm', '2014-03-01', 12, 10, '1,2,3')", queries[-1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the GrimoireUtils helpers"""
+
+import sys
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.GrimoireUtils import completePeriodIds, fill_and_order_items
+from vizgrimoire.GrimoireUtils import medianAndAvgByGroup, medianAndAvgByGroupHistogram
+
+
+class TestCompletePeriodIds(unittest.TestCase):
+
+    def test_months(self):
+        ts = completePeriodIds({'month': [24170, 24172], 'commits': [3, float('nan')]},
+                               'month', "'2014-01-15'", "'2014-06-01'")
+        self.assertEqual([24169, 24170, 24171, 24172, 24173], ts['month'])
+        self.assertEqual([0, 3, 0, 0, 0], ts['commits'])
+        self.assertEqual(range(0, 5), ts['id'])
+        self.assertEqual("Jan 2014", ts['date'][0])
+        self.assertEqual(u"1388534400", ts['unixtime'][0])
+
+    def test_weeks(self):
+        ts = completePeriodIds({'week': [201403], 'commits': [3]},
+                               'week', "'2014-01-08'", "'2014-02-01'")
+        self.assertEqual([201402, 201403, 201404, 201405], ts['week'])
+        self.assertEqual([0, 3, 0, 0], ts['commits'])
+
+    def test_days(self):
+        ts = completePeriodIds({'unixtime': [1388620800], 'commits': [3]},
+                               'day', "'2014-01-01'", "'2014-01-04'")
+        self.assertEqual([u"1388534400", u"1388620800", u"1388707200"], ts['unixtime'])
+        self.assertEqual([0, 3, 0], ts['commits'])
+        self.assertEqual("02 Jan 2014", ts['date'][1])
+
+    def test_duplicated_periods(self):
+        # The first time point of a period wins
+        ts = completePeriodIds({'month': [24171, 24170, 24171, 24171], 'commits': [3, 1, 5, 7]},
+                               'month', "'2014-01-01'", "'2014-04-01'")
+        self.assertEqual([24169, 24170, 24171], ts['month'])
+        self.assertEqual([0, 1, 3], ts['commits'])
+
+
+class TestFillAndOrderItems(unittest.TestCase):
+
+    def test_agg(self):
+        data = {'name': ['b', 'x', 'a'], 'commits': [2, 5, 1]}
+        data = fill_and_order_items(['a', 'b', 'c'], data, 'name')
+        self.assertEqual({'name': ['a', 'b', 'c'], 'commits': [1, 2, 0]}, data)
+
+    def test_evol(self):
+        data = {'name': ['b'], 'commits': [[1, 2]], 'month': [24169, 24170]}
+        data = fill_and_order_items(['a', 'b'], data, 'name', True, 'month',
+                                    "'2014-01-01'", "'2014-03-01'")
+        self.assertEqual(['a', 'b'], data['name'])
+        self.assertEqual([[0, 0], [1, 2]], data['commits'])
+        self.assertEqual([24169, 24170], data['month'])
+
+
+class TestMedianAndAvgByGroup(unittest.TestCase):
+
+    def test_groups(self):
+        data = medianAndAvgByGroup([('a', 1), ('b', 1), ('a', 1), ('a', 2)], [3, 5, 1, 7])
+        self.assertEqual([('a', 1), ('b', 1), ('a', 2)], data['group'])
+        self.assertEqual([2, 1, 1], data['size'])
+        self.assertEqual([2.0, 5.0, 7.0], data['median'])
+        self.assertEqual([2.0, 5.0, 7.0], data['avg'])
+
+    def test_histogram(self):
+        data = medianAndAvgByGroupHistogram(['a', 'a', 'b'], [0, 2, 1], [1, 2, 1],
+                                            [0.25, 4.25, 1.0], 1.0)
+        self.assertEqual(['a', 'b'], data['group'])
+        self.assertEqual([3, 1], data['size'])
+        self.assertEqual([2.0, 1.0], data['median'])
+        self.assertEqual([1.5, 1.0], data['avg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
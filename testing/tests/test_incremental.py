@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the incremental time series"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.incremental import IncrementalTS
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+
+
+PRIOR = {"month": [24170, 24171, 24172], "commits": [5, 6, 1],
+         "unixtime": ["1388534400", "1391212800", "1393632000"],
+         "date": ["Jan 2014", "Feb 2014", "Mar 2014"], "id": [0, 1, 2]}
+
+TAIL = {"month": [24172, 24173], "commits": [7, 2],
+        "unixtime": ["1393632000", "1396310400"],
+        "date": ["Mar 2014", "Apr 2014"], "id": [0, 1]}
+
+
+class TestIncrementalTS(unittest.TestCase):
+
+    def test_splice(self):
+        ts = IncrementalTS.splice(PRIOR, TAIL, "month")
+        self.assertEqual([24170, 24171, 24172, 24173], ts["month"])
+        self.assertEqual([5, 6, 7, 2], ts["commits"])
+        self.assertEqual(["Jan 2014", "Feb 2014", "Mar 2014", "Apr 2014"], ts["date"])
+        self.assertEqual([0, 1, 2, 3], ts["id"])
+
+    def test_splice_items(self):
+        prior = dict(PRIOR)
+        prior["name"] = [u"org1", u"org2"]
+        prior["commits"] = [[5, 6, 1], [1, 1, 1]]
+        tail = dict(TAIL)
+        tail["name"] = ["org3", "org1"]
+        tail["commits"] = [[3, 3], [7, 2]]
+        ts = IncrementalTS.splice(prior, tail, "month", "name")
+        self.assertEqual(["org1", "org2", "org3"], ts["name"])
+        self.assertEqual([[5, 6, 7, 2], [1, 1, 0, 0], [0, 0, 3, 3]], ts["commits"])
+
+
+class FakeDB(object):
+    database = "scm"
+    source_tables = [("scmlog", "author_date")]
+
+    def __init__(self):
+        self.count = 100
+        self.counted = []
+        self.identities = "1,2,3"
+
+    def get_schema_fingerprint(self):
+        return "schema"
+
+    def get_identities_checksum(self):
+        return self.identities
+
+    def get_source_count(self, before):
+        self.counted.append(before)
+        return [self.count]
+
+
+class FakeMetric(object):
+    id = "commits"
+    incremental = True
+
+    def __init__(self, db):
+        self.db = db
+        self.filters = MetricFilters("month", "'2014-01-01'", "'2014-05-01'")
+        self.startdates = []
+
+    def get_ts(self):
+        self.startdates.append(self.filters.startdate)
+        if self.filters.startdate == "'2014-01-01'": return dict(PRIOR)
+        return dict(TAIL)
+
+
+class TestIncrementalGetTS(unittest.TestCase):
+
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp()
+        self.db = FakeDB()
+        self.metric = FakeMetric(self.db)
+
+    def tearDown(self):
+        shutil.rmtree(self.state_dir)
+
+    def _get_ts(self):
+        # A new run
+        incremental = IncrementalTS(self.state_dir, "config")
+        ts = incremental.get_ts(self.metric, "scm")
+        return (ts, incremental)
+
+    def test_incremental(self):
+        self._get_ts()
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(["'2014-01-01'", "'2014-03-01'"], self.metric.startdates)
+        self.assertEqual(1, incremental.incremental)
+        self.assertEqual([5, 6, 7, 2], ts["commits"])
+
+    def test_data_before_watermark(self):
+        self._get_ts()
+        # Rows dated before the watermark added after the last run
+        self.db.count += 1
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(["'2014-01-01'", "'2014-01-01'"], self.metric.startdates)
+        self.assertEqual(1, incremental.full)
+        # The new count is stored for the next run
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(1, incremental.incremental)
+
+    def test_identities_changed(self):
+        self._get_ts()
+        # Enrollments fixed after the last run
+        self.db.identities = "1,5,3"
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(["'2014-01-01'", "'2014-01-01'"], self.metric.startdates)
+        self.assertEqual(1, incremental.full)
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(1, incremental.incremental)
+
+    def test_no_source_tables(self):
+        self.db.source_tables = []
+        self._get_ts()
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(1, incremental.full)
+
+    def test_not_incremental(self):
+        self.metric.incremental = False
+        self._get_ts()
+        (ts, incremental) = self._get_ts()
+        self.assertEqual(["'2014-01-01'", "'2014-01-01'"], self.metric.startdates)
+        self.assertEqual(1, incremental.full)
+        self.assertEqual([], self.db.counted)
+
+
+if __name__ == '__main__':
+    unittest.main()
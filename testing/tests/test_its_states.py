@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the tickets states backlog"""
+
+import calendar
+import sys
+import unittest
+from datetime import datetime
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.analysis.its_states import TicketsStates
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.metrics.query_builder import ITSQuery
+
+
+STATES = ["NEW", "ASSIGNED", "RESOLVED"]
+
+day = lambda month, d: calendar.timegm(datetime(2014, month, d, 12).timetuple())
+
+# (item, issue, status, date) ordered by date. Issue 1 is in both items.
+LOG = [("tracker1", 1, "NEW", day(1, 5)),
+       ("tracker2", 1, "NEW", day(1, 5)),
+       ("tracker1", 2, "NEW", day(1, 20)),
+       ("tracker2", 3, "NEW", day(2, 1)),
+       ("tracker1", 1, "ASSIGNED", day(2, 10)),
+       ("tracker2", 1, "ASSIGNED", day(2, 10)),
+       ("tracker1", 2, "RESOLVED", day(3, 3)),
+       ("tracker2", 3, "UNKNOWN", day(3, 4)),
+       ("tracker2", 1, "RESOLVED", day(3, 20)),
+       ("tracker1", 1, "RESOLVED", day(3, 21))]
+
+
+class TestTicketsStates(unittest.TestCase):
+
+    def _get_states(self, log, all_items = None):
+        db = ITSQuery.__new__(ITSQuery)
+        db.identities_db = "ids"
+        def execute(sql):
+            if "DISTINCT(status)" in sql: return {"status": STATES}
+            res = {"issue_id": [row[1] for row in log],
+                   "status": [row[2] for row in log],
+                   "udate": [row[3] for row in log]}
+            if all_items is not None: res["item"] = [row[0] for row in log]
+            return res
+        db.ExecuteQuery = execute
+        type_analysis = None
+        if all_items is not None: type_analysis = [all_items, None]
+        filters = MetricFilters("month", "'2014-01-01'", "'2014-04-01'", type_analysis)
+        return TicketsStates(db, filters)
+
+    def test_backlog(self):
+        log = [row for row in LOG if row[0] == "tracker1"]
+        data = self._get_states(log).get_backlog(STATES, "bugzilla")
+        self.assertEqual([2, 1, 0], data["NEW"])
+        self.assertEqual([0, 1, 0], data["ASSIGNED"])
+        self.assertEqual([0, 0, 2], data["RESOLVED"])
+
+    def test_all_items(self):
+        # Same backlog for each item than for its log alone
+        data = self._get_states(LOG, "repository").get_backlog(STATES, "bugzilla", "repository")
+        self.assertEqual(["tracker1", "tracker2"], data["url"])
+        for i, item in enumerate(data["url"]):
+            log = [row for row in LOG if row[0] == item]
+            item_data = self._get_states(log).get_backlog(STATES, "bugzilla")
+            for state in STATES:
+                self.assertEqual(item_data[state], data[state][i])
+        self.assertEqual([1, 1, 0], data["NEW"][1])
+        self.assertEqual([0, 1, 0], data["ASSIGNED"][1])
+
+    def test_ts_all_items(self):
+        from vizgrimoire.ITS import ITS, Backend
+        backend = ITS._backend
+        ITS._backend = Backend("bugzilla")
+        try:
+            data = self._get_states(LOG, "repository").get_ts_all_items()
+        finally:
+            ITS._backend = backend
+        self.assertEqual(["tracker1", "tracker2"], data["url"])
+        self.assertEqual([[0, 0, 2], [0, 0, 1]], data["RESOLVED"])
+        self.assertEqual(3, len(data["month"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
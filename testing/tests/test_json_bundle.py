@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the filters items JSON bundles"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.json_bundle import JSONBundle, FilterItemsWriter
+from vizgrimoire.filter import Filter
+from vizgrimoire.SCM import SCM
+
+
+class TestJSONBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.items = {"Bitergia": {"commits": 10, "authors": 2},
+                      "Espana/Sur": {"commits": 1.23456, "authors": 1}}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        FilterItemsWriter.bundles = False
+
+    def _write(self, destdir):
+        filter_ = Filter("company", None)
+        writer = FilterItemsWriter(SCM(), filter_, destdir, "static")
+        for item in sorted(self.items):
+            writer.write(Filter("company", item), self.items[item])
+        writer.close()
+
+    def test_per_item_files(self):
+        self._write(self.tmp_dir)
+        self.assertEqual(sorted(["Bitergia-scm-com-static.json",
+                                 "Espana_Sur-scm-com-static.json"]),
+                         sorted(os.listdir(self.tmp_dir)))
+
+    def test_bundle(self):
+        FilterItemsWriter.bundles = True
+        self._write(self.tmp_dir)
+        self.assertEqual(["scm-com-static-bundle-index.json", "scm-com-static-bundle.jsonl"],
+                         sorted(os.listdir(self.tmp_dir)))
+
+        bundle = JSONBundle(os.path.join(self.tmp_dir, "scm-com-static-bundle"))
+        self.assertEqual(sorted(self.items.keys()), bundle.get_items())
+        self.assertEqual({"commits": 10, "authors": 2}, bundle.get("Bitergia"))
+        self.assertEqual('{"authors": 1, "commits": 1.23}', bundle.get_raw("Espana/Sur"))
+        self.assertEqual("Espana_Sur-scm-com-static.json",
+                         bundle.get_filename("Espana/Sur"))
+
+    def test_extract_same_as_per_item_files(self):
+        files_dir = os.path.join(self.tmp_dir, "files")
+        extract_dir = os.path.join(self.tmp_dir, "extract")
+        os.mkdir(files_dir)
+        os.mkdir(extract_dir)
+        self._write(files_dir)
+        FilterItemsWriter.bundles = True
+        self._write(self.tmp_dir)
+
+        bundle = JSONBundle(os.path.join(self.tmp_dir, "scm-com-static-bundle"))
+        self.assertEqual(2, bundle.extract(extract_dir))
+        self.assertEqual(sorted(os.listdir(files_dir)), sorted(os.listdir(extract_dir)))
+        for filename in os.listdir(files_dir):
+            with open(os.path.join(files_dir, filename)) as f1:
+                with open(os.path.join(extract_dir, filename)) as f2:
+                    self.assertEqual(f1.read(), f2.read())
+
+    def test_no_items_no_bundle(self):
+        FilterItemsWriter.bundles = True
+        FilterItemsWriter(SCM(), Filter("company", None), self.tmp_dir, "top").close()
+        self.assertEqual([], os.listdir(self.tmp_dir))
+
+if __name__ == '__main__':
+    unittest.main()
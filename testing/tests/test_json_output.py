@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the content addressed JSON output"""
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.json_output import OutputManifest
+from vizgrimoire.json_writer import JSONWriter
+
+
+class TestOutputManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "scm-static.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+        JSONWriter.manifest = None
+
+    def _run(self, data):
+        """ Write data as a report run, returns the manifest used """
+        JSONWriter.manifest = OutputManifest(["gz"])
+        JSONWriter().write(data, self.path)
+        JSONWriter.manifest.save()
+        return JSONWriter.manifest
+
+    def test_unchanged_not_written(self):
+        manifest = self._run({"commits": 1})
+        self.assertEqual((1, 0), (manifest.written, manifest.skipped))
+        os.utime(self.path, (0, 0))
+
+        manifest = self._run({"commits": 1})
+        self.assertEqual((0, 1), (manifest.written, manifest.skipped))
+        self.assertEqual(0, os.stat(self.path).st_mtime)
+
+        manifest = self._run({"commits": 2})
+        self.assertEqual((1, 0), (manifest.written, manifest.skipped))
+        self.assertNotEqual(0, os.stat(self.path).st_mtime)
+        self.assertEqual(sorted(["manifest.json", "scm-static.json", "scm-static.json.gz"]),
+                         sorted(os.listdir(self.tmp_dir)))
+
+    def test_run_not_saved(self):
+        # A run whose manifest was not saved (aborted) changed the file
+        self._run({"v": 1})
+        JSONWriter.manifest = OutputManifest(["gz"])
+        JSONWriter().write({"v": 2}, self.path)
+        manifest = self._run({"v": 1})
+        self.assertEqual((1, 0), (manifest.written, manifest.skipped))
+        with open(self.path) as f:
+            self.assertEqual('{"v": 1}', f.read())
+        gz = gzip.open(self.path + ".gz")
+        self.assertEqual('{"v": 1}', gz.read())
+        gz.close()
+
+    def test_manifest_and_gz(self):
+        self._run({"commits": 1})
+        with open(os.path.join(self.tmp_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        self.assertEqual(["scm-static.json"], manifest.keys())
+        self.assertEqual(len('{"commits": 1}'), manifest["scm-static.json"]["size"])
+        gz = gzip.open(self.path + ".gz")
+        self.assertEqual('{"commits": 1}', gz.read())
+        gz.close()
+
+    def test_entries_from_other_process(self):
+        worker = OutputManifest([])
+        JSONWriter.manifest = worker
+        JSONWriter().write({"commits": 1}, self.path)
+        main = OutputManifest([])
+        main.add_entries(worker.pop_entries())
+        self.assertEqual({}, worker.entries)
+        main.save()
+        with open(os.path.join(self.tmp_dir, "manifest.json")) as f:
+            self.assertEqual(["scm-static.json"], json.load(f).keys())
+
+if __name__ == '__main__':
+    unittest.main()
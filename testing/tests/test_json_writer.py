@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the JSON writer"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.json_writer import JSONWriter
+from vizgrimoire.GrimoireUtils import convertDatetime, roundDecimals, removeDecimals
+from vizgrimoire.GrimoireUtils import createJSON
+
+
+def old_dumps(data):
+    """ JSON created before JSONWriter """
+    data = convertDatetime(roundDecimals(removeDecimals(data)))
+    return json.dumps(data, sort_keys=True).replace('NaN','"NA"')
+
+def get_data():
+    return {'commits': [1, 2, 30000000000L], 'avg': 1.23456, 'ratio': [0.5, 1/3.0],
+            'first_date': datetime(2014, 1, 2, 3, 4, 5), 'none': None, 'ok': True,
+            'changes': Decimal('12.3456'), 'nan': float('nan'),
+            'name': [u'Jos\xe9', 'Jos\xc3\xa9', 'say "hi"\n'],
+            'scm': {'authors': 3, 'avg': 2.71828, 'nested': {'b': 1, 'a': [2.5]}}}
+
+
+class TestJSONWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_same_as_old_json(self):
+        self.assertEqual(old_dumps(get_data()), JSONWriter(2).dumps(get_data()))
+
+    def test_types(self):
+        writer = JSONWriter(1)
+        self.assertEqual('[1.2, "NA", 3, "2014-01-02 00:00:00", "a"]',
+                         writer.dumps((Decimal('1.24'), float('nan'), 3,
+                                       datetime(2014, 1, 2), 'a')))
+        self.assertEqual('{"1": [0.3], "b": {"a": null}}',
+                         writer.dumps({'b': {'a': None}, 1: [0.33]}))
+        self.assertEqual('[0, 1, 2]', writer.dumps(i for i in range(3)))
+        # MySQLdb integers are long
+        self.assertEqual(json.dumps({5L: 1, 2.5: 2}, sort_keys = True),
+                         writer.dumps({5L: 1, 2.5: 2}))
+        self.assertRaises(TypeError, writer.dumps, [object()])
+
+    def test_strings_with_nan(self):
+        self.assertEqual('["NaN rows", "NA"]', JSONWriter().dumps(["NaN rows", float('nan')]))
+
+    def test_streaming(self):
+        path = os.path.join(self.tmp_dir, "evol.json")
+        data = {'id': range(1000), 'commits': [i / 7.0 for i in range(1000)]}
+        JSONWriter(2, buffer_size = 10).write(data, path)
+        with open(path) as f:
+            self.assertEqual(JSONWriter(2).dumps(data), f.read())
+        self.assertEqual(["evol.json"], os.listdir(self.tmp_dir))
+
+    def test_write_error_keeps_file(self):
+        path = os.path.join(self.tmp_dir, "static.json")
+        JSONWriter().write({'commits': 1}, path)
+        self.assertRaises(TypeError, JSONWriter().write, {'commits': object()}, path)
+        with open(path) as f:
+            self.assertEqual('{"commits": 1}', f.read())
+        self.assertEqual(["static.json"], os.listdir(self.tmp_dir))
+
+    def test_create_json(self):
+        path = os.path.join(self.tmp_dir, "scm-static.json")
+        data = get_data()
+        createJSON(data, path)
+        with open(path) as f:
+            self.assertEqual(old_dumps(get_data()), f.read())
+        # Input data is not modified
+        self.assertEqual(1.23456, data['avg'])
+
+if __name__ == '__main__':
+    unittest.main()
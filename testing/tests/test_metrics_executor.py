@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the concurrent evaluation of metrics"""
+
+import sys
+import threading
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.metrics_executor import MetricsExecutor
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+
+
+class TestMetricsExecutor(unittest.TestCase):
+
+    def test_order(self):
+        executor = MetricsExecutor(4)
+        self.assertEqual([x * 2 for x in range(20)], executor.map(lambda x: x * 2, range(20)))
+
+    def test_in_flight(self):
+        # Each metric waits until the other one is running
+        arrived = []
+        both = threading.Event()
+        def wait_other(x):
+            arrived.append(x)
+            if len(arrived) == 2: both.set()
+            return both.wait(5)
+        executor = MetricsExecutor(2)
+        self.assertEqual([True, True], executor.map(wait_other, [1, 2]))
+
+    def test_sequential(self):
+        executor = MetricsExecutor(1)
+        names = executor.map(lambda x: threading.current_thread().name, [1, 2])
+        self.assertEqual([threading.current_thread().name] * 2, names)
+
+    def test_error(self):
+        def fail(x):
+            raise ValueError(x)
+        self.assertRaises(ValueError, MetricsExecutor(2).map, fail, [1, 2])
+
+
+class TestDelegatedMetrics(unittest.TestCase):
+    """ Metrics implemented with other metrics do not change registered ones """
+
+    def setUp(self):
+        from vizgrimoire.ITS import ITS, Backend
+        from vizgrimoire.SCR import SCR
+        self.saved = [(ds, ds.__dict__.get("_metrics_set")) for ds in [ITS, SCR]]
+        self.backend = ITS._backend
+        ITS._backend = Backend("bugzilla")
+        self.registered_filters = MetricFilters("month", "'2010-01-01'", "'2011-01-01'")
+        self.filters = MetricFilters("month", "'2013-01-01'", "'2014-01-01'")
+
+    def tearDown(self):
+        from vizgrimoire.ITS import ITS
+        ITS._backend = self.backend
+        for (ds, metrics_set) in self.saved:
+            if metrics_set is None: del ds._metrics_set
+            else: ds.set_metrics_set(ds, metrics_set)
+
+    def _get_db(self, query_class):
+        db = query_class.__new__(query_class)
+        db.ExecuteQuery = lambda sql: {}
+        return db
+
+    def test_closed(self):
+        from vizgrimoire.ITS import ITS
+        from vizgrimoire.metrics.its_metrics import Changed, Closed
+        from vizgrimoire.metrics.query_builder import ITSQuery
+
+        db = self._get_db(ITSQuery)
+        changed = Changed(db, self.registered_filters)
+        def not_shared(*args):
+            raise AssertionError("registered metric used")
+        changed._get_sql = not_shared
+        ITS.set_metrics_set(ITS, [changed])
+        sql = Closed(db, self.filters)._get_sql(False)
+        self.assertTrue("'2013-01-01'" in sql)
+        self.assertTrue(changed.filters is self.registered_filters)
+
+    def test_scr_pending(self):
+        from vizgrimoire.SCR import SCR
+        from vizgrimoire.metrics.scr_metrics import Submitted, Pending
+        from vizgrimoire.metrics.query_builder import SCRQuery
+
+        db = self._get_db(SCRQuery)
+        submitted = Submitted(db, self.registered_filters)
+        SCR.set_metrics_set(SCR, [submitted])
+        metrics = Pending(db, self.filters)._get_metrics_for_pending()
+        self.assertTrue(metrics["submitted"] is not submitted)
+        self.assertTrue(metrics["submitted"].filters is self.filters)
+        self.assertTrue(submitted.filters is self.registered_filters)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the migrations in the onion model study"""
+
+import sys
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.analysis.onion_transitions import OnionTransitions
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.SCM import SCM
+
+
+class FakeDB(object):
+    """ Result of the first query pattern found in each query """
+
+    def __init__(self, results):
+        self.results = results
+        self.queries = []
+
+    def ExecuteQuery(self, sql):
+        self.queries.append(sql)
+        for (pattern, result) in self.results:
+            if pattern in sql: return dict(result)
+        raise Exception("Unexpected query " + sql)
+
+
+class TestOnionTransitions(unittest.TestCase):
+
+    def setUp(self):
+        # current period: a core, b regular, c occasional
+        # past period: b and c core, d regular
+        self.db = FakeDB([
+            ("total_0", {"total_0": 100, "total_1": 100}),
+            ("commits_0", {"uid": ["a", "b", "c", "d"],
+                           "commits_0": [80, 15, 5, 0], "commits_1": [0, 50, 30, 20]}),
+            ("as commits", {"uid": ["a", "c"], "commits": [80, 5]}),
+            ("pup.uuid IN", {"uuid": ["a", "b", "b", "c"], "name": ["A", "B", "B2", "C"],
+                             "email": ["a@", "b@", "b2@", "c@"]})
+        ])
+        filters = MetricFilters("month", "'2014-01-01'", "'2015-01-01'", None)
+        self.study = OnionTransitions(self.db, filters)
+
+    def test_activity_groups_periods(self):
+        current, past = self.study._activity_groups_periods(
+            [("'2014-01-01'", "'2015-01-01'"), ("'2013-01-01'", "'2014-01-01'")], SCM)
+        self.assertEqual(2, len(self.db.queries))
+        self.assertEqual((set(["a"]), set(["b"]), set(["c"])),
+                         (current["core"], current["regular"], current["occasional"]))
+        self.assertEqual((set(["b", "c"]), set(["d"]), set()),
+                         (past["core"], past["regular"], past["occasional"]))
+
+    def test_result(self):
+        result = self.study.result(SCM)
+        self.assertEqual(4, len(self.db.queries))
+        self.assertTrue("IN ('a','b','c')" in self.db.queries[2])
+        self.assertEqual({"uuid": ["a"], "name": ["A"], "email": ["a@"], "commits": [80]},
+                         result["up_core"])
+        self.assertEqual({"uuid": ["b"], "name": ["B"], "email": ["b@"], "commits": [0]},
+                         result["down_reg"])
+        self.assertEqual(["c"], result["down_occ"]["uuid"])
+        self.assertEqual([], result["up_reg"]["uuid"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the people activity got in batches"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+import vizgrimoire.MLS as MLS
+import vizgrimoire.SCM as SCM
+from vizgrimoire.data_source import DataSource
+
+
+class FakeDS(DataSource):
+    """ Data source with the activity of each person queried alone """
+
+    def __init__(self):
+        self.people = []
+
+    @staticmethod
+    def get_name():
+        return "fake"
+
+    def get_top_people(self, startdate, enddate, identities_db, npeople):
+        return ["a", "b", "c"]
+
+    def get_person_evol(self, uuid, period, startdate, enddate, identities_db, type_analysis):
+        self.people.append(uuid)
+        return {"month": [24170], "commits": [len(uuid)]}
+
+    def get_person_agg(self, uuid, startdate, enddate, identities_db, type_analysis):
+        return {"commits": 1}
+
+
+class TestSplitPeopleData(unittest.TestCase):
+
+    def test_people_filter(self):
+        self.assertEqual("pup.uuid IN ('a','b')", DataSource.get_people_filter(["a", "b"]))
+
+    def test_agg(self):
+        data = {"uuid": ["a", "b"], "commits": [3, 4], "first_date": ["2014-01-02", "2013-05-01"]}
+        people = DataSource.split_people_data(data, ["a", "b", "c"])
+        self.assertEqual({"commits": 3, "first_date": "2014-01-02"}, people["a"])
+        self.assertEqual({"commits": 4, "first_date": "2013-05-01"}, people["b"])
+        # People without activity are not returned
+        self.assertNotIn("c", people)
+
+    def test_agg_one_row(self):
+        # ExecuteQuery returns scalars for one row
+        people = DataSource.split_people_data({"uuid": "a", "commits": 3}, ["a"])
+        self.assertEqual({"a": {"commits": 3}}, people)
+
+    def test_evol(self):
+        data = {"uuid": ["a", "b", "a", "x"], "month": [24170, 24170, 24172, 24171],
+                "commits": [1, 2, 3, 4]}
+        people = DataSource.split_people_data(data, ["a", "b", "c"], True, "month",
+                                              "'2014-02-01'", "'2014-05-01'")
+        self.assertEqual([24170, 24171, 24172], people["a"]["month"])
+        self.assertEqual([1, 0, 3], people["a"]["commits"])
+        self.assertEqual([2, 0, 0], people["b"]["commits"])
+        # All people get a time series, only the ones in the list
+        self.assertEqual([0, 0, 0], people["c"]["commits"])
+        self.assertNotIn("x", people)
+
+
+class TestPeopleBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.destdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.destdir)
+
+    def test_default_per_person(self):
+        ds = FakeDS()
+        evol = ds.get_people_evol(["a", "bb"], "month", "'2014-02-01'", "'2014-03-01'", "ids")
+        self.assertEqual(["a", "bb"], ds.people)
+        self.assertEqual([2], evol["bb"]["commits"])
+        self.assertEqual({"a": {"commits": 1}},
+                         ds.get_people_agg(["a"], "'2014-02-01'", "'2014-03-01'", "ids"))
+
+    def test_create_people_report(self):
+        ds = FakeDS()
+        ds.people_batch = 2
+        batches = []
+        get_people_evol = ds.get_people_evol
+        def get_people_evol_batch(people, *args):
+            batches.append(people)
+            return get_people_evol(people, *args)
+        ds.get_people_evol = get_people_evol_batch
+        ds.create_people_report("month", "'2014-02-01'", "'2014-03-01'", self.destdir, 10, "ids")
+        self.assertEqual([["a", "b"], ["c"]], batches)
+        for uuid in ["a", "b", "c"]:
+            with open(os.path.join(self.destdir, ds.get_person_agg_file(uuid))) as f:
+                self.assertEqual({"commits": 1}, json.load(f))
+
+    def _check_agg_fallback(self, module, ds, static_name):
+        # Only the people without activity in the batch query are queried alone
+        static = getattr(module, static_name)
+        queried = []
+        def get_static(people, startdate, enddate):
+            queried.append(people)
+            if isinstance(people, list):
+                return {"uuid": ["a", "b"], "sent": [3, 4]}
+            return {"sent": 0}
+        setattr(module, static_name, get_static)
+        try:
+            agg = ds.get_people_agg(["a", "b", "c"], "'2014-02-01'", "'2014-03-01'", "ids")
+        finally:
+            setattr(module, static_name, static)
+        self.assertEqual([["a", "b", "c"], "c"], queried)
+        self.assertEqual({"sent": 3}, agg["a"])
+        self.assertEqual({"sent": 0}, agg["c"])
+
+    def test_scm_agg_fallback(self):
+        self._check_agg_fallback(SCM, SCM.SCM, "GetStaticPeopleSCM")
+
+    def test_mls_agg_fallback(self):
+        self._check_agg_fallback(MLS, MLS.MLS, "GetStaticPeopleMLS")
+
+
+class TestPeopleQueries(unittest.TestCase):
+
+    def test_scm_grouped(self):
+        q = SCM.GetPeopleQuerySCM(["a", "b"], None, "'2014-01-01'", "'2014-02-01'", False)
+        self.assertTrue(q.startswith("SELECT pup.uuid, COUNT(distinct(s.id)) AS commits"))
+        where = q[q.index(" WHERE "):]
+        self.assertIn("pup.uuid IN ('a','b')", where)
+        self.assertTrue(where.endswith("s.author_date<'2014-02-01' AND " +
+                                       SCM.GetFiltersOwnUniqueIdsSCM() +
+                                       " AND pup.uuid IN ('a','b') GROUP BY pup.uuid"))
+
+    def test_scm_person(self):
+        q = SCM.GetPeopleQuerySCM("a", None, "'2014-01-01'", "'2014-02-01'", False)
+        self.assertNotIn("GROUP BY", q)
+        self.assertIn("pup.uuid='a'", q)
+
+    def test_mls_grouped(self):
+        q = MLS.GetQueryPeopleMLS(["a", "b"], None, "'2014-01-01'", "'2014-02-01'", False)
+        self.assertTrue(q.startswith("SELECT pup.uuid, COUNT(m.message_ID) AS sent"))
+        self.assertTrue(q.endswith("pup.uuid IN ('a','b') GROUP BY pup.uuid"))
+
+    def test_evol_grouped(self):
+        q = SCM.GetPeopleQuerySCM(["a", "b"], "month", "'2014-01-01'", "'2014-02-01'", True)
+        self.assertIn("pup.uuid", q[0:q.index(" FROM ")])
+        self.assertIn("GROUP BY pup.uuid, ", q)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the SQL built by the query builders"""
+
+import sys
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.connection_pool import ConnectionPool
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.metrics.query_builder import DSQuery, SCMQuery, QueryPlan
+
+
+WINDOWS = [("last_7", "'2014-03-15'", "'2014-03-22'"),
+           ("prev_7", "'2014-03-08'", "'2014-03-15'")]
+
+
+class TestTrendsQuery(unittest.TestCase):
+
+    def test_count_distinct(self):
+        sql = SCMQuery.GetSQLTrends("s.author_date", "count(distinct(s.rev)) as commits",
+                                    "scmlog s", "", WINDOWS)
+        expected = "SELECT count(DISTINCT CASE WHEN s.author_date>='2014-03-15' AND " + \
+                   "s.author_date<'2014-03-22' THEN (s.rev) END) AS last_7, " + \
+                   "count(DISTINCT CASE WHEN s.author_date>='2014-03-08' AND " + \
+                   "s.author_date<'2014-03-15' THEN (s.rev) END) AS prev_7 " + \
+                   "FROM scmlog s WHERE s.author_date>='2014-03-08' AND " + \
+                   "s.author_date<'2014-03-22'"
+        self.assertEqual(expected, sql)
+
+    def test_group_by(self):
+        sql = SCMQuery.GetSQLTrends("s.author_date", "count(distinct(s.rev)) as commits",
+                                    "scmlog s", "s.id = 1", WINDOWS, "company")
+        self.assertTrue(sql.startswith("SELECT org.name, "))
+        self.assertTrue(sql.endswith(" AND s.id = 1 GROUP BY org.name"))
+
+    def test_not_supported(self):
+        self.assertIsNone(SCMQuery.GetSQLTrends("s.author_date", "avg(s.id) as avg",
+                                                "scmlog s", "", WINDOWS))
+
+    def test_strict(self):
+        # End dates included, as in the strict queries of each window
+        sql = SCMQuery.GetSQLTrends("date", "SUM(downloads) as downloads",
+                                    "downloads_month", "", WINDOWS, strict = True)
+        self.assertIn("CASE WHEN date>='2014-03-15' AND date<='2014-03-22' THEN downloads END", sql)
+        self.assertIn("CASE WHEN date>='2014-03-08' AND date<='2014-03-15' THEN downloads END", sql)
+        self.assertTrue(sql.endswith("WHERE date>='2014-03-08' AND date<='2014-03-22'"))
+
+    def test_strict_metric(self):
+        from vizgrimoire.metrics.downloads_metrics import Downloads
+        from vizgrimoire.metrics.query_builder import DownloadsDSQuery
+
+        db = DownloadsDSQuery.__new__(DownloadsDSQuery)
+        queries = []
+        def execute(sql):
+            queries.append(sql)
+            return {"last_7": 5, "prev_7": 2}
+        db.ExecuteQuery = execute
+        downloads = Downloads(db, MetricFilters("month", "'2013-01-01'", "'2014-01-01'"))
+        data = downloads.get_trends_batch("'2014-01-01'", [7])
+        self.assertEqual(5, data["downloads_7"])
+        self.assertIn(" date <='2014-01-01'", queries[-1])
+        self.assertNotIn(" date <'2014-01-01'", queries[-1])
+
+
+class TestQueryPlan(unittest.TestCase):
+
+    def setUp(self):
+        # Query builder not connected to a database
+        self.db = SCMQuery.__new__(SCMQuery)
+        self.db.database = "scm"
+        self.db.identities_db = "ids"
+        self.queries = []
+        self.db.ExecuteQuery = self._execute
+
+    def _execute(self, sql):
+        self.queries.append(sql)
+        if "files" in sql:
+            return {"actions": 10, "files": 5, "branches": 1}
+        return {"commits": 3}
+
+    def _get_metrics(self, metrics):
+        filters = MetricFilters("month", "'2013-01-01'", "'2014-01-01'")
+        return [metric(self.db, filters) for metric in metrics]
+
+    def test_batch(self):
+        from vizgrimoire.metrics.scm_metrics import Actions, Branches, Commits, Files
+
+        plan = QueryPlan()
+        metrics = self._get_metrics([Actions, Files, Commits, Branches])
+        for metric in metrics:
+            self.assertTrue(metric.add_to_query_plan(plan, False))
+        plan.execute()
+        self.assertEqual(2, len(self.queries))
+        self.assertEqual({"actions": 10}, plan.get_result(metrics[0]))
+        self.assertEqual({"files": 5}, plan.get_result(metrics[1]))
+        self.assertEqual({"commits": 3}, plan.get_result(metrics[2]))
+
+    def test_same_sql(self):
+        # A metric alone in its group gets its usual query
+        from vizgrimoire.metrics.scm_metrics import Commits
+
+        commits = self._get_metrics([Commits])[0]
+        plan = QueryPlan()
+        commits.add_to_query_plan(plan, True)
+        plan.execute()
+        self.assertEqual(commits._get_query(True), self.queries[0])
+
+    def test_not_batched(self):
+        # Metrics not using the standard get_agg
+        from vizgrimoire.metrics.scm_metrics import InitialActivity
+
+        metric = self._get_metrics([InitialActivity])[0]
+        self.assertFalse(metric.add_to_query_plan(QueryPlan(), False))
+        self.assertIsNone(self.db.query_plan_args)
+
+
+class FakeCursor(object):
+    """ Cursor returning the indexes and tables of information_schema """
+
+    def execute(self, sql):
+        self.sql = sql
+
+    def fetchall(self):
+        if "information_schema.statistics" in self.sql:
+            return [("scmlog", "author", "author_id"), ("scmlog", "author", "author_date"),
+                    ("scmlog", "date", "date")]
+        return [("scmlog",), ("people_uidentities",)]
+
+
+class FakeConnection(object):
+
+    def __init__(self, **params):
+        pass
+
+    def cursor(self):
+        return FakeCursor()
+
+
+class TestTrendsDelegated(unittest.TestCase):
+    """ Trends of metrics whose SQL is built by other registered metric """
+
+    def setUp(self):
+        from vizgrimoire.ITS import ITS, Backend
+        from vizgrimoire.metrics.its_metrics import Changed
+        from vizgrimoire.metrics.query_builder import ITSQuery
+
+        self.queries = []
+        self.filters = MetricFilters("month", "'2013-01-01'", "'2014-01-01'")
+        self.backend = ITS._backend
+        ITS._backend = Backend("bugzilla")
+        # Registered metric with its own query builder
+        changed_db = ITSQuery.__new__(ITSQuery)
+        changed_db.ExecuteQuery = self._execute
+        self.metrics_set = ITS.__dict__.get("_metrics_set")
+        ITS.set_metrics_set(ITS, [Changed(changed_db, self.filters)])
+        self.db = ITSQuery.__new__(ITSQuery)
+        self.db.ExecuteQuery = self._execute
+
+    def tearDown(self):
+        from vizgrimoire.ITS import ITS
+        ITS._backend = self.backend
+        if self.metrics_set is None: del ITS._metrics_set
+        else: ITS.set_metrics_set(ITS, self.metrics_set)
+
+    def _execute(self, sql):
+        self.queries.append(sql)
+        if "last_7" in sql:
+            return {"last_7": 5, "prev_7": 2, "last_30": 20, "prev_30": 10}
+        return {"closed": 4}
+
+    def test_delegated(self):
+        from vizgrimoire.metrics.its_metrics import Closed
+
+        closed = Closed(self.db, self.filters)
+        data = closed.get_trends_batch("'2014-01-01'", [7, 30])
+        self.assertEqual(1, len([q for q in self.queries if "last_7" in q]))
+        self.assertEqual(5, data["closed_7"])
+        self.assertEqual(3, data["diff_netclosed_7"])
+        self.assertEqual(20, data["closed_30"])
+        self.assertEqual(10, data["diff_netclosed_30"])
+        self.assertIsNone(DSQuery.get_trends_windows())
+
+    def test_fallback(self):
+        # Window columns not in the result: trends computed with get_trends
+        from vizgrimoire.metrics.its_metrics import Closed
+
+        closed = Closed(self.db, self.filters)
+        self.db.ExecuteQuery = lambda sql: {"closed": 4}
+        data = closed.get_trends_batch("'2014-01-01'", [7])
+        self.assertEqual(4, data["closed_7"])
+        self.assertEqual(0, data["diff_netclosed_7"])
+
+
+class TestIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = DSQuery.connection_pool
+        DSQuery.connection_pool = ConnectionPool(connect = FakeConnection)
+
+    def tearDown(self):
+        DSQuery.connection_pool = self.pool
+
+    def test_report(self):
+        db = SCMQuery("root", "", "scm")
+        report = dict([((index["table"], tuple(index["columns"])), index["status"])
+                       for index in db.get_indexes_report()])
+        self.assertEqual("present", report[("scmlog", ("author_id", "author_date"))])
+        self.assertEqual("missing", report[("scmlog", ("author_date",))])
+        self.assertEqual("missing", report[("people_uidentities", ("people_id", "uuid"))])
+        self.assertEqual("no_table", report[("actions", ("commit_id",))])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the query results cache"""
+
+import shutil
+import sys
+import tempfile
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.query_builder import DSQuery, SCMQuery, IRCQuery
+from vizgrimoire.metrics.query_cache import QueryCache
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_normalized_key(self):
+        cache = QueryCache()
+        key1 = cache.get_key("SELECT  count(*)\n  FROM scmlog", "db", "f1")
+        key2 = cache.get_key("SELECT count(*) FROM scmlog", "db", "f1")
+        self.assertEqual(key1, key2)
+        self.assertNotEqual(key1, cache.get_key("SELECT count(*) FROM scmlog", "db2", "f1"))
+        self.assertNotEqual(key1, cache.get_key("SELECT count(*) FROM scmlog", "db", "f2"))
+        self.assertNotEqual(key1, cache.get_key("SELECT count(*) FROM scmlog", "db", "f1", "d1"))
+
+    def test_cacheable(self):
+        self.assertTrue(QueryCache.is_cacheable("  select * from scmlog"))
+        self.assertFalse(QueryCache.is_cacheable("CREATE INDEX a ON scmlog (id)"))
+        self.assertTrue(QueryCache.is_cacheable("SELECT pup.uuid FROM people_uidentities pup"))
+
+    def test_not_cacheable_time(self):
+        self.assertFalse(QueryCache.is_cacheable("SELECT * FROM scmlog WHERE date > NOW() - INTERVAL 1 YEAR"))
+        self.assertFalse(QueryCache.is_cacheable("SELECT * FROM scmlog WHERE date > curdate ()"))
+        self.assertFalse(QueryCache.is_cacheable("SELECT * FROM scmlog WHERE date > CURRENT_DATE"))
+        self.assertFalse(QueryCache.is_cacheable("SELECT UNIX_TIMESTAMP() AS now"))
+        self.assertTrue(QueryCache.is_cacheable("SELECT UNIX_TIMESTAMP(date) AS unixtime FROM scmlog"))
+
+    def test_lru(self):
+        cache = QueryCache(size = 2)
+        cache.set("a", {"commits": 1})
+        cache.set("b", {"commits": 2})
+        cache.get("a")
+        cache.set("c", {"commits": 3})
+        self.assertEqual({"commits": 1}, cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(2, cache.get_stats()["hits"])
+        self.assertEqual(1, cache.get_stats()["misses"])
+
+    def test_results_copied(self):
+        cache = QueryCache()
+        cache.set("a", {"commits": [1, 2]})
+        cache.get("a")["commits"].append(3)
+        self.assertEqual({"commits": [1, 2]}, cache.get("a"))
+
+    def test_disk(self):
+        cache_dir = tempfile.mkdtemp(prefix='query_cache_')
+        try:
+            QueryCache(10, cache_dir).set("a", {"commits": 1})
+            cache = QueryCache(10, cache_dir)
+            self.assertEqual({"commits": 1}, cache.get("a"))
+            self.assertEqual(1, cache.get_stats()["disk_hits"])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_not_persistent(self):
+        cache_dir = tempfile.mkdtemp(prefix='query_cache_')
+        try:
+            cache = QueryCache(10, cache_dir)
+            cache.set("a", {"commits": 1}, persistent = False)
+            self.assertEqual({"commits": 1}, cache.get("a"))
+            self.assertIsNone(QueryCache(10, cache_dir).get("a"))
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+class FakeCursor(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, sql):
+        self.queries.append(sql)
+        self.row = self.rows.pop(0)
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return self.row
+
+
+class TestDSQueryCache(unittest.TestCase):
+    """ Queries cached by DSQuery, not connected to a database """
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='query_cache_')
+        DSQuery.set_query_cache(QueryCache(10, self.cache_dir))
+
+    def tearDown(self):
+        DSQuery.set_query_cache(None)
+        DSQuery.schema_fingerprints = {}
+        DSQuery.data_fingerprints = {}
+        shutil.rmtree(self.cache_dir)
+
+    def _get_db(self, query, database, identities_db, rows):
+        db = query.__new__(query)
+        db.database, db.identities_db, db.projects_db = database, identities_db, None
+        cursor = FakeCursor(rows)
+        db._execute = lambda sql, cursor_class = None: (cursor.execute(sql), cursor)[1]
+        DSQuery.schema_fingerprints[(database, identities_db, None)] = "schema"
+        return (db, cursor)
+
+    def _execute(self, db, sql):
+        return db._ExecuteCached(sql, lambda: {"commits": 1})
+
+    def test_data_fingerprint(self):
+        # scmlog count and last date, then the identities checksum
+        (db, cursor) = self._get_db(SCMQuery, "scm", "ids", [(10, "2014-03-01"), [("t", 1)]])
+        self.assertEqual(({"commits": 1}, False), self._execute(db, "SELECT 1"))
+        self.assertEqual(({"commits": 1}, True), self._execute(db, "SELECT 1"))
+        self.assertEqual(2, len(cursor.queries))
+        # New run after a data load
+        DSQuery.set_query_cache(QueryCache(10, self.cache_dir))
+        DSQuery.data_fingerprints = {}
+        (db, cursor) = self._get_db(SCMQuery, "scm", "ids", [(10, "2014-03-01"), [("t", 1)]])
+        self.assertEqual(({"commits": 1}, True), self._execute(db, "SELECT 1"))
+        DSQuery.set_query_cache(QueryCache(10, self.cache_dir))
+        DSQuery.data_fingerprints = {}
+        (db, cursor) = self._get_db(SCMQuery, "scm", "ids", [(11, "2014-03-02"), [("t", 1)]])
+        self.assertEqual(({"commits": 1}, False), self._execute(db, "SELECT 1"))
+
+    def test_no_data_fingerprint(self):
+        (db, cursor) = self._get_db(IRCQuery, "irc", "ids", [])
+        self.assertEqual(({"commits": 1}, False), self._execute(db, "SELECT 1"))
+        self.assertEqual(({"commits": 1}, True), self._execute(db, "SELECT 1"))
+        DSQuery.set_query_cache(QueryCache(10, self.cache_dir))
+        self.assertEqual(({"commits": 1}, False), self._execute(db, "SELECT 1"))
+
+    def test_fingerprints_databases(self):
+        # Same data source database with other identities database
+        (db1, cursor) = self._get_db(SCMQuery, "scm", "ids1", [(10, "2014-03-01"), [("t", 1)]])
+        (db2, cursor) = self._get_db(SCMQuery, "scm", "ids2", [(10, "2014-03-01"), [("t", 2)]])
+        DSQuery.schema_fingerprints[("scm", "ids2", None)] = "schema2"
+        self.assertNotEqual(db1.get_schema_fingerprint(), db2.get_schema_fingerprint())
+        self.assertNotEqual(db1.get_data_fingerprint(), db2.get_data_fingerprint())
+
+
+if __name__ == '__main__':
+    unittest.main()
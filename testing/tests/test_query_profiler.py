@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the profile of the queries"""
+
+import sys
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.metrics import Metrics
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.metrics.query_builder import DSQuery
+from vizgrimoire.metrics.query_profiler import QueryProfiler
+import vizgrimoire.GrimoireSQL as GrimoireSQL
+
+
+class FakeQuery(object):
+    """ Query builder returning the EXPLAIN of the queries """
+
+    database = "scm"
+
+    def _ExecuteQuery(self, sql):
+        return {"type": "ALL", "sql": sql}
+
+
+class FakeMetric(Metrics):
+
+    id = "commits"
+
+    def get_agg(self):
+        self.db.profiler.record(self.db, "SELECT 1 FROM scmlog WHERE id = 3", 0.5, {"a": 1})
+
+
+class TestQueryProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.db = FakeQuery()
+        self.profiler = QueryProfiler(explain = 1)
+
+    def test_fingerprint(self):
+        self.assertEqual("SELECT * FROM scmlog WHERE id IN (?+) AND name = ?",
+                         QueryProfiler.normalize_sql("SELECT *  FROM scmlog\n" +
+                                                     "WHERE id IN (1, 2) AND name = 'x''s'"))
+        self.assertEqual(QueryProfiler.get_fingerprint("SELECT 1 WHERE a = 'x'"),
+                         QueryProfiler.get_fingerprint("SELECT 2 WHERE a = 'y'"))
+
+    def test_size(self):
+        self.assertEqual((2, 4), QueryProfiler.get_size({"a": [10, 20]}))
+        self.assertEqual((1, 2), QueryProfiler.get_size({"a": 10}))
+        self.assertEqual((0, 0), QueryProfiler.get_size({}))
+
+    def test_caller(self):
+        self.db.profiler = self.profiler
+        filters = MetricFilters("month", "'2013-01-01'", "'2014-01-01'", ["company", "'x'"])
+        FakeMetric(self.db, filters).get_agg()
+        record = self.profiler.records[0]
+        self.assertEqual("commits", record["metric"])
+        self.assertEqual("company:'x'", record["filter"])
+        self.assertIsNone(record["study"])
+
+    def test_profile(self):
+        self.profiler.record(self.db, "SELECT a FROM t WHERE id = 1", 0.1, {"a": [1, 2]})
+        self.profiler.record(self.db, "SELECT a FROM t WHERE id = 2", 0.2, {"a": [1]})
+        self.profiler.record(self.db, "SELECT b FROM t", 0.25, {"b": 1})
+        profile = self.profiler.get_profile()
+        self.assertEqual(3, profile["calls"])
+        first, second = profile["statements"]
+        self.assertEqual(2, first["calls"])
+        self.assertEqual(3, first["rows"])
+        self.assertEqual("SELECT a FROM t WHERE id = 2", first["sql"])
+        # Only the slowest query is explained
+        self.assertNotIn("explain", first)
+        self.assertEqual("EXPLAIN SELECT b FROM t", second["explain"]["sql"])
+
+    def test_records(self):
+        self.profiler.record(self.db, "SELECT a FROM t", 0.1, {"a": 1})
+        records = self.profiler.pop_records()
+        self.assertEqual(0, self.profiler.get_profile()["calls"])
+        self.profiler.add_records(records)
+        self.assertEqual(1, self.profiler.get_profile()["calls"])
+
+    def test_explain_all_processes(self):
+        # Records from workers explained in the main process
+        self.profiler.record(self.db, "SELECT a FROM t", 0.1, {"a": 1})
+        for (sql, seconds) in [("SELECT b FROM t", 0.3), ("SELECT c FROM t", 0.2)]:
+            worker = QueryProfiler(explain = 1)
+            worker.record(FakeQuery(), sql, seconds, {"a": 1})
+            records = worker.pop_records()
+            self.assertNotIn("explain", records[0][0])
+            self.profiler.add_records(records)
+        statements = self.profiler.get_profile()["statements"]
+        self.assertEqual("EXPLAIN SELECT b FROM t", statements[0]["explain"]["sql"])
+        for statement in statements[1:]:
+            self.assertNotIn("explain", statement)
+
+
+class FakeCursor(object):
+
+    rowcount = 1
+    description = (("commits",),)
+
+    def fetchone(self):
+        return (3,)
+
+
+class TestProfiledQueries(unittest.TestCase):
+    """ Queries not executed with DSQuery.ExecuteQuery are also profiled """
+
+    def setUp(self):
+        self.profiler = QueryProfiler()
+        DSQuery.query_profiler = self.profiler
+        self.db = DSQuery.__new__(DSQuery)
+        self.db.database = "scm"
+        self.queries = []
+        self.db._execute = lambda sql, cursor_class = None: (self.queries.append(sql), FakeCursor())[1]
+        self.channel = GrimoireSQL.channel
+
+    def tearDown(self):
+        DSQuery.query_profiler = None
+        GrimoireSQL.channel = self.channel
+
+    def test_grimoire_sql(self):
+        GrimoireSQL.channel = self.db
+        self.assertEqual({"commits": 3}, GrimoireSQL.ExecuteQuery("SELECT COUNT(*) AS commits FROM scmlog"))
+        self.assertEqual(1, len(self.profiler.records))
+        self.assertEqual("scm", self.profiler.records[0]["database"])
+        self.assertEqual(1, self.profiler.records[0]["rows"])
+
+    def test_view_query(self):
+        self.db.ExecuteViewQuery("CREATE VIEW v AS SELECT * FROM scmlog")
+        self.assertEqual(["CREATE VIEW v AS SELECT * FROM scmlog"], self.queries)
+        self.assertEqual("CREATE VIEW v AS SELECT * FROM scmlog", self.profiler.records[0]["sql"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the parallel report units of report_tool.py"""
+
+import logging
+import os
+import sys
+import unittest
+from StringIO import StringIO
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+# report_tool imports the utils module of vizGrimoireJS, not the tests one
+tests_utils = sys.modules.pop('utils', None)
+sys.path.insert(0, os.path.join('..', '..', 'vizGrimoireJS'))
+try:
+    import report_tool
+finally:
+    sys.path.pop(0)
+    sys.modules.pop('utils', None)
+    if tests_utils is not None: sys.modules['utils'] = tests_utils
+
+
+class FakeDS(object):
+    """ Data source recording the reports created """
+
+    def __init__(self, name, failing = []):
+        self.name = name
+        self.failing = failing
+
+    def get_name(self):
+        return self.name
+
+    def _create(self, kind):
+        if kind in self.failing: raise Exception(kind + " failed")
+        FakeReport.files.append((kind, self.name))
+
+    def create_evolutionary_report(self, *args):
+        self._create("evol")
+
+    def create_agg_report(self, *args):
+        self._create("agg")
+
+    def create_top_report(self, *args):
+        self._create("top")
+
+
+class FakeFilter(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+
+class FakeStudy(object):
+    id = "ages"
+
+
+class FakeReport(object):
+    """ Report with the data sources, filters and studies of a config """
+
+    data_sources = []
+    files = [] # files written in this process
+    manifest = [] # files added from the units results
+    saved = []
+
+    @staticmethod
+    def get_data_sources():
+        return FakeReport.data_sources
+
+    @staticmethod
+    def get_data_source(name):
+        return [ds for ds in FakeReport.data_sources if ds.get_name() == name][0]
+
+    @staticmethod
+    def get_filters():
+        return [FakeFilter("repository"), FakeFilter("company")]
+
+    @staticmethod
+    def get_filter(name):
+        return FakeFilter(name)
+
+    @staticmethod
+    def get_studies():
+        return [FakeStudy]
+
+    @staticmethod
+    def get_study_by_id(study_id):
+        return FakeStudy
+
+    @staticmethod
+    def connect_ds(ds):
+        pass
+
+    @staticmethod
+    def reconnect():
+        pass
+
+    @staticmethod
+    def pop_query_profile_records():
+        return ([], {})
+
+    @staticmethod
+    def add_query_profile_records(records):
+        pass
+
+    @staticmethod
+    def pop_json_manifest_entries():
+        files = list(FakeReport.files)
+        del FakeReport.files[:]
+        return files
+
+    @staticmethod
+    def add_json_manifest_entries(files):
+        FakeReport.manifest += files
+
+    @staticmethod
+    def save_json_manifest():
+        FakeReport.saved.append("manifest")
+
+    @staticmethod
+    def save_query_profile():
+        FakeReport.saved.append("profile")
+
+    @staticmethod
+    def log_query_cache_stats():
+        pass
+
+
+class FakeOptions(object):
+    destdir = "/tmp"
+    npeople = "10"
+    filter = None
+    study = None
+    metric = None
+    item = None
+    no_filters = False
+
+
+class TestReportUnits(unittest.TestCase):
+
+    def setUp(self):
+        FakeReport.data_sources = [FakeDS("scm"), FakeDS("its")]
+        FakeReport.files = []
+        FakeReport.manifest = []
+        FakeReport.saved = []
+        self.globals = {}
+        self.reports = []
+        fake_globals = {"Report": FakeReport, "opts": FakeOptions(), "period": "month",
+                        "startdate": "'2014-01-01'", "enddate": "'2015-01-01'",
+                        "identities_db": "ids", "automator": {"r": {"reports": ""}},
+                        "create_report_filter": self._create_report_filter,
+                        "create_report_study": self._create_report_study,
+                        "create_people_identifiers": lambda *args: self.reports.append("people"),
+                        "create_top_people_report": lambda *args: self.reports.append("top_people")}
+        for name in fake_globals:
+            self.globals[name] = getattr(report_tool, name, None)
+            setattr(report_tool, name, fake_globals[name])
+        # Tracebacks of the failed units
+        logging.disable(logging.CRITICAL)
+        self.stdout = sys.stdout
+        sys.stdout = StringIO()
+
+    def tearDown(self):
+        sys.stdout = self.stdout
+        logging.disable(logging.NOTSET)
+        for name in self.globals:
+            if self.globals[name] is None: delattr(report_tool, name)
+            else: setattr(report_tool, name, self.globals[name])
+
+    @staticmethod
+    def _create_report_filter(ds, filter_, *args):
+        FakeReport.files.append(("filter", ds.get_name(), filter_.get_name()))
+
+    @staticmethod
+    def _create_report_study(ds, study, *args):
+        FakeReport.files.append(("study", ds.get_name(), study.id))
+
+    def test_units(self):
+        self.assertEqual([("evol", "scm", None), ("evol", "its", None),
+                          ("agg", "scm", None), ("agg", "its", None)],
+                         report_tool.get_global_units(False))
+        self.assertEqual(6, len(report_tool.get_global_units(True)))
+        self.assertIn(("top", "its", None), report_tool.get_global_units(True))
+        self.assertEqual([("filter", "scm", "repository"), ("filter", "scm", "company"),
+                          ("filter", "its", "repository"), ("filter", "its", "company")],
+                         report_tool.get_filters_units())
+        self.assertEqual([("study", "scm", "ages"), ("study", "its", "ages")],
+                         report_tool.get_studies_units())
+
+    def test_unit(self):
+        (unit, ok, queries, files) = report_tool.run_report_unit(("filter", "scm", "company"))
+        self.assertTrue(ok)
+        self.assertEqual([("filter", "scm", "company")], files)
+        (unit, ok, queries, files) = report_tool.run_report_unit(("other", "scm", None))
+        self.assertFalse(ok)
+
+    def test_jobs_same_files(self):
+        # All the units run once whatever the number of jobs
+        units = report_tool.get_global_units(True) + report_tool.get_filters_units()
+        manifests = []
+        for jobs in [1, 3]:
+            FakeReport.manifest = []
+            self.assertTrue(report_tool.run_report_units(units, jobs))
+            manifests.append(sorted(FakeReport.manifest))
+        self.assertEqual(manifests[0], manifests[1])
+        self.assertEqual(len(units), len(manifests[0]))
+
+    def test_failed_unit(self):
+        # The other units are run and their files added to the manifest
+        FakeReport.data_sources[0].failing = ["agg"]
+        self.assertFalse(report_tool.create_reports_jobs(2))
+        self.assertNotIn(("agg", "scm"), FakeReport.manifest)
+        self.assertIn(("agg", "its"), FakeReport.manifest)
+        self.assertIn(("study", "scm", "ages"), FakeReport.manifest)
+        self.assertEqual(["people", "top_people"], self.reports)
+
+    def test_exit_code(self):
+        with self.assertRaises(SystemExit) as exit_:
+            report_tool.finish_report(False)
+        self.assertEqual(1, exit_.exception.code)
+        self.assertEqual(["manifest"], FakeReport.saved)
+        with self.assertRaises(SystemExit) as exit_:
+            report_tool.finish_report(True)
+        self.assertEqual(0, exit_.exception.code)
+        self.assertEqual(["manifest", "profile", "manifest"], FakeReport.saved)
+
+
+if __name__ == '__main__':
+    unittest.main()
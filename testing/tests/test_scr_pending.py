@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the time series of reviews waiting"""
+
+import sys
+import unittest
+from datetime import datetime
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.metrics.query_builder import SCRQuery
+from vizgrimoire.metrics.scr_metrics import ReviewsWaitingForReviewerTS
+
+
+# (review, submitted_on). Review 1 duplicated by the filters joins.
+REVIEWS = [(1, datetime(2014, 1, 5)), (1, datetime(2014, 1, 5)),
+           (2, datetime(2014, 1, 10)), (6, datetime(2014, 1, 20)),
+           (3, datetime(2014, 2, 3)), (4, datetime(2014, 3, 20)),
+           (5, datetime(2014, 4, 30, 10))]
+
+# Merged (1, 6) and abandoned (2) reviews
+CLOSED = {1: datetime(2014, 3, 10), 2: datetime(2014, 2, 5), 6: datetime(2014, 1, 25)}
+
+# (review, patchset, changed_on, reviewed with -1 or -2)
+CHANGES = [(1, 1, datetime(2014, 1, 5), 0), (2, 1, datetime(2014, 1, 10), 0),
+           (1, 1, datetime(2014, 1, 20), 1), (3, 1, datetime(2014, 2, 3), 0),
+           (1, 2, datetime(2014, 2, 15), 0), (4, 1, datetime(2014, 3, 20), 0),
+           (4, 1, datetime(2014, 3, 25), 1), (3, 1, datetime(2014, 4, 2), 1),
+           (4, 2, datetime(2014, 4, 10), 0)]
+
+
+class TestReviewsWaiting(unittest.TestCase):
+
+    def _get_metric(self, reviews, type_analysis = None):
+        db = SCRQuery.__new__(SCRQuery)
+        db.identities_db = "ids"
+        def execute(sql):
+            if "mod_date" in sql:
+                return {"issue_id": CLOSED.keys(), "mod_date": CLOSED.values()}
+            if "CAST(ch.old_value" in sql:
+                return {"issue_id": [c[0] for c in CHANGES], "patchset": [c[1] for c in CHANGES],
+                        "changed_on": [c[2] for c in CHANGES], "reviewed": [c[3] for c in CHANGES]}
+            return reviews
+        db.ExecuteQuery = execute
+        filters = MetricFilters("month", "'2014-01-01'", "'2014-05-01'", type_analysis)
+        return ReviewsWaitingForReviewerTS(db, filters)
+
+    def test_pending(self):
+        reviews = {"issue_id": [r[0] for r in REVIEWS], "submitted_on": [r[1] for r in REVIEWS]}
+        ts = self._get_metric(reviews)._get_pending_ts()
+        self.assertEqual([2014*12+month for month in range(1, 6)], ts["month"])
+        # Review 6 closed in its month, 5 submitted after the end of April
+        self.assertEqual([2, 2, 2, 2, 3], ts["ReviewsWaiting_ts"])
+        # Reviews 1, 3 and 4 waiting for the submitter after a -1 or -2
+        self.assertEqual([1, 1, 0, 1, 2], ts["ReviewsWaitingForReviewer_ts"])
+
+    def test_pending_all_items(self):
+        # Review 1 in two organizations, twice in org1
+        items = ["org1", "org1", "org1", "org2", "org2", "org2", "org2"]
+        reviews = {"name": items + ["org2"],
+                   "issue_id": [r[0] for r in REVIEWS] + [1],
+                   "submitted_on": [r[1] for r in REVIEWS] + [REVIEWS[0][1]]}
+        metric = self._get_metric(reviews, ["company", None])
+        ts = metric._get_pending_ts("company")
+        self.assertEqual(["org1", "org2"], sorted(ts["name"]))
+        org1 = ts["name"].index("org1")
+        org2 = ts["name"].index("org2")
+        self.assertEqual([2, 1, 0, 0, 0], ts["ReviewsWaiting_ts"][org1])
+        self.assertEqual([1, 1, 0, 0, 0], ts["ReviewsWaitingForReviewer_ts"][org1])
+        self.assertEqual([1, 2, 2, 2, 3], ts["ReviewsWaiting_ts"][org2])
+        self.assertEqual([0, 1, 0, 1, 2], ts["ReviewsWaitingForReviewer_ts"][org2])
+
+
+if __name__ == '__main__':
+    unittest.main()
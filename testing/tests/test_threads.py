@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the mailing lists threads study"""
+
+import sys
+import unittest
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+import vizgrimoire.analysis.threads
+from vizgrimoire.analysis.threads import Threads
+
+
+# (message_ID, is_response_of). m is a reply to a message not in the
+# analysis dates, and n a reply to it. f and i threads have the same
+# length and participants.
+MESSAGES = [("a", None), ("f", None), ("b", "a"), ("g", "f"), ("c", "b"),
+            ("i", None), ("m", "zz"), ("j", "i"), ("d", "b"), ("h", "f"),
+            ("n", "m"), ("e", "a"), ("k", "i"), ("l", None), ("o", None), ("p", "o")]
+
+SENDERS = {"a": "p1", "b": "p2", "c": "p1", "d": "p3", "e": "p2", "f": "p1",
+           "g": "p2", "h": "p2", "i": "p4", "j": "p5", "k": "p5", "l": "p1",
+           "m": "p6", "n": "p7", "o": "p1", "p": "p1"}
+
+
+def execute_query(sql):
+    if "is_response_of" in sql:
+        return {"message_ID": [m[0] for m in MESSAGES],
+                "is_response_of": [m[1] for m in MESSAGES]}
+    if "upeople_id" in sql:
+        return {"message_ID": SENDERS.keys(), "upeople_id": SENDERS.values()}
+    if "length(message_body)" in sql:
+        return {"message_ID": SENDERS.keys(), "length": [10] * len(SENDERS)}
+    # Email of a message
+    return {"subject": "s", "message_body": "b", "first_date": None,
+            "initiator_name": "n", "initiator_id": "u", "url": "l"}
+
+
+class TestThreads(unittest.TestCase):
+
+    def setUp(self):
+        self.execute_query = vizgrimoire.analysis.threads.ExecuteQuery
+        vizgrimoire.analysis.threads.ExecuteQuery = execute_query
+        self.threads = Threads("'2014-01-01'", "'2014-02-01'", "ids")
+
+    def tearDown(self):
+        vizgrimoire.analysis.threads.ExecuteQuery = self.execute_query
+
+    def test_threads(self):
+        # Nested replies in depth first order, orphans not in any thread
+        self.assertEqual(["a", "b", "c", "d", "e"], self.threads.threads["a"])
+        self.assertEqual(["f", "g", "h"], self.threads.threads["f"])
+        self.assertEqual(["l"], self.threads.threads["l"])
+        self.assertEqual(sorted(["a", "f", "i", "l", "o"]), sorted(self.threads.threads.keys()))
+        self.assertEqual(5, self.threads.numThreads())
+        self.assertEqual(5, self.threads.lenThread("a"))
+
+    def test_top_longest(self):
+        # Same order, ties included, than sorting the threads by length
+        roots = [thread[0] for thread in
+                 sorted(self.threads.threads.values(), key = len, reverse = True)]
+        for top in [1, 2, 3, 5, 10]:
+            emails = self.threads.topLongestThread(top)
+            self.assertEqual(roots[0:top], [email.message_id for email in emails])
+        self.assertEqual("a", self.threads.longestThread().message_id)
+
+    def test_top_crowded(self):
+        people = lambda root: len(set([SENDERS[m] for m in self.threads.threads[root]]))
+        roots = sorted(self.threads.threads.keys(), key = people, reverse = True)
+        top = self.threads.topCrowdedThread(4)
+        self.assertEqual(roots[0:4], [email.message_id for (email, n) in top])
+        self.assertEqual([3, 2, 2, 1], [n for (email, n) in top])
+        self.assertEqual("a", self.threads.crowdedThread().message_id)
+
+    def test_verbose(self):
+        self.assertEqual("a", self.threads.verboseThread().message_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
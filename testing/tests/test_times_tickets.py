@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#         Alvaro del Castillo <acs@bitergia.com>
+#
+
+"""Tests for the time opened of the tickets"""
+
+import sys
+import unittest
+from datetime import datetime
+
+import numpy
+
+if not '..' in sys.path:
+    sys.path.insert(0, '../..')
+
+from vizgrimoire.analysis.times_tickets import TimesTickets
+from vizgrimoire.metrics.metrics_filter import MetricFilters
+
+
+START = datetime(2014, 1, 1)
+CLOSED = ["RESOLVED"]
+
+# id, issue_id, date, status, priority. Ids are not always in dates order.
+LOG = [(1, 1, datetime(2014, 1, 3), "NEW", "High"),
+       (2, 2, datetime(2014, 1, 10), "NEW", "High"),
+       (3, 4, datetime(2014, 1, 15), "NEW", "Low"),
+       (4, 3, datetime(2014, 2, 2), "NEW", "Low"),
+       (5, 1, datetime(2014, 2, 10), "ASSIGNED", "Low"),
+       (6, 2, datetime(2014, 2, 20), "RESOLVED", "High"),
+       (7, 5, datetime(2014, 3, 25), "NEW", "Low"),
+       (8, 1, datetime(2014, 3, 15), "RESOLVED", "Low"),
+       (9, 2, datetime(2014, 3, 5), "NEW", "High"),
+       (10, 5, datetime(2014, 3, 20), "NEW", "High")]
+
+SUBMITTED = {1: datetime(2014, 1, 3), 2: datetime(2014, 1, 10), 3: datetime(2014, 2, 2),
+             4: datetime(2013, 12, 2), 5: datetime(2014, 3, 20)}
+FIRST_ACTION = {1: datetime(2014, 2, 10), 4: datetime(2014, 1, 16)}
+FIRST_COMMENT = {1: datetime(2014, 1, 20), 2: datetime(2014, 3, 10)}
+
+# Jan, Feb and Mar 2014, analyzed at the start of the next month
+DATES = [2014*12+1, 2014*12+2, 2014*12+3, 2014*12+4]
+BOUNDARIES = [datetime(2014, 2, 1), datetime(2014, 3, 1), datetime(2014, 4, 1)]
+
+
+class FakeQuery(object):
+    """ Query builder returning the synthetic issues log """
+
+    def ExecuteQuery(self, sql):
+        if "AS closed" in sql:
+            return {"issue_id": [row[1] for row in LOG], "id": [row[0] for row in LOG],
+                    "date": [row[2] for row in LOG],
+                    "closed": [int(row[3] in CLOSED) for row in LOG],
+                    "priority": [row[4] for row in LOG]}
+        if "first_action_per_issue" in sql: dates = FIRST_ACTION
+        elif "first_comment_per_issue" in sql: dates = FIRST_COMMENT
+        else: dates = SUBMITTED
+        return {"issue_id": dates.keys(), "date": dates.values()}
+
+
+def get_ages_per_month(boundary, result_type, priority = None):
+    """ Ages in days of the opened tickets at boundary, as the per month queries did """
+    ages = []
+    for issue_id in SUBMITTED:
+        rows = [row for row in LOG if row[1] == issue_id and START <= row[2] < boundary]
+        if len(rows) == 0: continue
+        last = max(rows)
+        if last[3] in CLOSED: continue
+        if priority is not None and last[4] != priority: continue
+        first = {"action": FIRST_ACTION, "comment": FIRST_COMMENT}.get(result_type, {})
+        if issue_id in first and START <= first[issue_id] < boundary: continue
+        age = boundary - SUBMITTED[issue_id]
+        ages.append((age.days * 24 * 3600 + age.seconds) / (24 * 3600.0))
+    return ages
+
+
+class TestTimesTickets(unittest.TestCase):
+
+    def test_time_opened(self):
+        filters = MetricFilters("month", "'2014-01-01'", "'2014-04-01'")
+        times = TimesTickets(FakeQuery(), filters)
+        evol = times.getTicketsTimeOpened("month", DATES, "status = 'RESOLVED'",
+                                          [("priority", ["High", "Low"])])
+        self.assertEqual(DATES[0:3], evol["month"])
+
+        for (result_type, alias) in [("open", "topened"), ("action", "topened_tfa"),
+                                     ("comment", "topened_tfc")]:
+            for priority in [None, "High", "Low"]:
+                name = alias
+                if priority is not None: name += "_" + priority
+                for i, boundary in enumerate(BOUNDARIES):
+                    ages = get_ages_per_month(boundary, result_type, priority)
+                    self.assertEqual(len(ages), evol["size_" + name][i], name)
+                    if len(ages) == 0:
+                        self.assertTrue(numpy.isnan(evol["median_" + name][i]))
+                        self.assertTrue(numpy.isnan(evol["avg_" + name][i]))
+                        continue
+                    self.assertAlmostEqual(numpy.median(ages), evol["median_" + name][i])
+                    self.assertAlmostEqual(numpy.mean(ages), evol["avg_" + name][i])
+
+    def test_sizes(self):
+        filters = MetricFilters("month", "'2014-01-01'", "'2014-04-01'")
+        evol = TimesTickets(FakeQuery(), filters).getTicketsTimeOpened(
+            "month", DATES, "status = 'RESOLVED'", [("priority", ["High", "Low"])])
+        self.assertEqual([3, 3, 4], evol["size_topened"])
+        # Issue 5 state is its last log entry (MAX(id)), not the last dated
+        self.assertEqual([2, 0, 2], evol["size_topened_High"])
+        self.assertEqual([2, 1, 3], evol["size_topened_tfa"])
+
+
+if __name__ == '__main__':
+    unittest.main()
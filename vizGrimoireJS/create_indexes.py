@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+""" Create the indexes needed by the metrics in the data sources databases """
+
+import logging
+from optparse import OptionParser
+
+def get_options():
+    parser = OptionParser(usage='Usage: %prog [options]',
+                          description='Create the indexes needed by the metrics',
+                          version='0.1')
+    parser.add_option("-c", "--config-file",
+                      action="store",
+                      dest="config_file",
+                      default = "../../../conf/main.conf",
+                      help="Automator config file")
+    parser.add_option("--data-source",
+                      action="store",
+                      dest="data_source",
+                      help="data source to be indexed")
+    parser.add_option("--report",
+                      action="store_true",
+                      dest="report",
+                      default=False,
+                      help="Only report the indexes and the queries using them")
+
+    (opts, args) = parser.parse_args()
+
+    if len(args) != 0:
+        parser.error("Wrong number of arguments")
+
+    return opts
+
+if __name__ == '__main__':
+    from vizgrimoire.report import Report
+
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    opts = get_options()
+
+    Report.init(opts.config_file)
+
+    dbuser = Report.get_config()['generic']['db_user']
+    dbpass = Report.get_config()['generic']['db_password']
+    db_identities = Report.get_config()['generic']['db_identities']
+
+    dss = Report.get_data_sources()
+    if opts.data_source:
+        dss = [ds for ds in dss if ds.get_name() == opts.data_source]
+        if len(dss) == 0:
+            logging.error("Data source not found " + opts.data_source)
+
+    for ds in dss:
+        dbname = Report.get_config()['generic'][ds.get_db_name()]
+        dbcon = ds.get_query_builder()(dbuser, dbpass, dbname, db_identities)
+        if opts.report:
+            print("\n" + ds.get_name() + " (" + dbname + ")")
+            for index in dbcon.get_indexes_report():
+                print("  %-8s %s (%s): %s" % (index["status"], index["table"],
+                                              ",".join(index["columns"]), index["used_by"]))
+        else:
+            dbcon.create_indexes()
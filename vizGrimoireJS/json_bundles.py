@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+""" List, show or extract to per item JSON files the filters JSON bundles """
+
+import glob
+import logging
+import os
+from optparse import OptionParser
+
+def get_options():
+    parser = OptionParser(usage='Usage: %prog [options] [bundle ...]',
+                          description='Read the JSON bundles created with json_bundles',
+                          version='0.1')
+    parser.add_option("-d", "--dir",
+                      action="store",
+                      dest="json_dir",
+                      default=".",
+                      help="Directory with the JSON bundles (all used if no bundle is given)")
+    parser.add_option("-o", "--destdir",
+                      action="store",
+                      dest="destdir",
+                      help="Extract the per item JSON files to this directory")
+    parser.add_option("--item",
+                      action="store",
+                      dest="item",
+                      help="Show the JSON of this item")
+
+    (opts, args) = parser.parse_args()
+
+    return (opts, args)
+
+if __name__ == '__main__':
+    from vizgrimoire.json_bundle import JSONBundle
+
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    (opts, bundles) = get_options()
+
+    if len(bundles) == 0:
+        index_files = glob.glob(os.path.join(opts.json_dir, "*-bundle-index.json"))
+        bundles = [f[:-len("-index.json")] for f in sorted(index_files)]
+
+    for path in bundles:
+        if path.endswith(".jsonl"): path = path[:-len(".jsonl")]
+        bundle = JSONBundle(path)
+        if opts.item is not None:
+            if opts.item in bundle.index: print(bundle.get_raw(opts.item))
+        elif opts.destdir is not None:
+            extracted = bundle.extract(opts.destdir)
+            logging.info("%i files extracted from %s" % (extracted, path))
+        else:
+            print(path + ": " + str(len(bundle.get_items())) + " items")
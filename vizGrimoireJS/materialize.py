@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+# Copyright (C) 2014 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# This file is a part of GrimoireLib
+#  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+#
+# Authors:
+#   Alvaro del Castillo <acs@bitergia.com>
+#
+
+""" Build the daily facts tables used by report_tool.py when facts is on """
+
+import logging
+from optparse import OptionParser
+
+def get_options():
+    parser = OptionParser(usage='Usage: %prog [options]',
+                          description='Build the materialized facts tables',
+                          version='0.1')
+    parser.add_option("-c", "--config-file",
+                      action="store",
+                      dest="config_file",
+                      default = "../../../conf/main.conf",
+                      help="Automator config file")
+    parser.add_option("--data-source",
+                      action="store",
+                      dest="data_source",
+                      help="data source to be materialized")
+    parser.add_option("--full",
+                      action="store_true",
+                      dest="full",
+                      default=False,
+                      help="Build the facts tables from scratch")
+
+    (opts, args) = parser.parse_args()
+
+    if len(args) != 0:
+        parser.error("Wrong number of arguments")
+
+    return opts
+
+if __name__ == '__main__':
+    from vizgrimoire.report import Report
+    from vizgrimoire.metrics.facts import FactsTable
+
+    logging.basicConfig(level=logging.INFO,format='%(asctime)s %(message)s')
+    opts = get_options()
+
+    Report.init(opts.config_file)
+
+    dbuser = Report.get_config()['generic']['db_user']
+    dbpass = Report.get_config()['generic']['db_password']
+    db_identities = Report.get_config()['generic']['db_identities']
+
+    dss = Report.get_data_sources()
+    if opts.data_source:
+        dss = [ds for ds in dss if ds.get_name() == opts.data_source]
+        if len(dss) == 0:
+            logging.error("Data source not found " + opts.data_source)
+
+    for ds in dss:
+        dbname = Report.get_config()['generic'][ds.get_db_name()]
+        dbcon = ds.get_query_builder()(dbuser, dbpass, dbname, db_identities)
+        facts = FactsTable.get_facts_table(dbcon)
+        if facts is None: continue
+        logging.info("Materializing " + facts.name + " for " + ds.get_name())
+        facts.materialize(opts.full)
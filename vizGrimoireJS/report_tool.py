@@ -72,51 +72,55 @@ def create_top_report(startdate, enddate, destdir, npeople, identities_db):
         Report.connect_ds(ds)
         ds.create_top_report (startdate, enddate, destdir, npeople, identities_db)
 
+def create_report_filter(ds, filter_, period, startdate, enddate, destdir, npeople, identities_db):
+    logging.info("-> " + filter_.get_name())
+    # Tested in all this filters the group by
+    supported_all = {
+                 "scm":["people2","company","country","repository","domain","company+country","company+project"],
+                 "its":["people2","company","country","repository","domain","company+country","company+project"],
+                 "its_1":["people2"],
+                 "mls":["people2","company","country","repository","domain"],
+                 "scr":["people2","company","country","repository"],
+                 "mediawiki":["people2","company"],
+                 "irc":["people2"],
+                 "downloads":["people2"],
+                 "qaforums":["people2"],
+                 "releases":["people2"],
+                 "dockerhub":["people2"],
+                 "pullpo":["people2"],
+                 "eventizer":[]
+                 }
+    supported_on = {
+                 "scm":["people2","company","country","repository","domain","project","company+country","company+project"],
+                 "its":["people2","company","country","repository","domain","project","company+country","company+project"],
+                 "its_1":["people2"],
+                 "mls":["people2","company","country","repository","domain","project"],
+                 "scr":["people2","company","country","repository","project"],
+                 "mediawiki":["people2","company"],
+                 "irc":["people2"],
+                 "downloads":["people2"],
+                 "qaforums":["people2"],
+                 "releases":["people2"],
+                 "dockerhub":["people2"],
+                 "pullpo":["people2"],
+                 "eventizer":[]
+                 }
+
+    if filter_.get_name() in supported_on[ds.get_name()]:
+    # if filter_.get_name() in ["people2","company+country","repository","company"]:
+        logging.info("---> Using new filter API")
+        ds.create_filter_report_all(filter_, period, startdate, enddate,
+                                    destdir, npeople, identities_db)
+    else:
+        ds.create_filter_report(filter_, period, startdate, enddate, destdir, npeople, identities_db)
+
 def create_reports_filters(period, startdate, enddate, destdir, npeople, identities_db):
     for ds in Report.get_data_sources():
         Report.connect_ds(ds)
         logging.info("Creating filter reports for " + ds.get_name())
         for filter_ in Report.get_filters():
-            logging.info("-> " + filter_.get_name())
-            # Tested in all this filters the group by
-            supported_all = {
-                         "scm":["people2","company","country","repository","domain","company+country","company+project"],
-                         "its":["people2","company","country","repository","domain","company+country","company+project"],
-                         "its_1":["people2"],
-                         "mls":["people2","company","country","repository","domain"],
-                         "scr":["people2","company","country","repository"],
-                         "mediawiki":["people2","company"],
-                         "irc":["people2"],
-                         "downloads":["people2"],
-                         "qaforums":["people2"],
-                         "releases":["people2"],
-                         "dockerhub":["people2"],
-                         "pullpo":["people2"],
-                         "eventizer":[]
-                         }
-            supported_on = {
-                         "scm":["people2","company","country","repository","domain","project","company+country","company+project"],
-                         "its":["people2","company","country","repository","domain","project","company+country","company+project"],
-                         "its_1":["people2"],
-                         "mls":["people2","company","country","repository","domain","project"],
-                         "scr":["people2","company","country","repository","project"],
-                         "mediawiki":["people2","company"],
-                         "irc":["people2"],
-                         "downloads":["people2"],
-                         "qaforums":["people2"],
-                         "releases":["people2"],
-                         "dockerhub":["people2"],
-                         "pullpo":["people2"],
-                         "eventizer":[]
-                         }
-
-            if filter_.get_name() in supported_on[ds.get_name()]:
-            # if filter_.get_name() in ["people2","company+country","repository","company"]:
-                logging.info("---> Using new filter API")
-                ds.create_filter_report_all(filter_, period, startdate, enddate,
-                                            destdir, npeople, identities_db)
-            else:
-                ds.create_filter_report(filter_, period, startdate, enddate, destdir, npeople, identities_db)
+            create_report_filter(ds, filter_, period, startdate, enddate,
+                                 destdir, npeople, identities_db)
 
 def create_report_people(startdate, enddate, destdir, npeople, identities_db, people_ids=None):
     for ds in Report.get_data_sources():
@@ -235,33 +239,155 @@ def create_people_identifiers(startdate, enddate, destdir, npeople, identities_d
 
     return people_ids
 
-def create_reports_studies(period, startdate, enddate, destdir):
+def create_report_study(ds, study, period, startdate, enddate, destdir):
     from vizgrimoire.metrics.metrics_filter import MetricFilters
 
     db_identities= Report.get_config()['generic']['db_identities']
     dbuser = Report.get_config()['generic']['db_user']
     dbpass = Report.get_config()['generic']['db_password']
 
-    studies = Report.get_studies()
-
     metric_filters = MetricFilters(period, startdate, enddate, [])
 
+    ds_dbname = ds.get_db_name()
+    dbname = Report.get_config()['generic'][ds_dbname]
+    dsquery = ds.get_query_builder()
+    dbcon = dsquery(dbuser, dbpass, dbname, db_identities)
+    logging.info("Creating report for " + study.id + " for " + ds.get_name())
+    try:
+        obj = study(dbcon, metric_filters)
+        obj.create_report(ds, destdir)
+    except TypeError:
+        import traceback
+        logging.info(study.id + " does no support standard API. Not used.")
+        traceback.print_exc(file=sys.stdout)
+
+def create_reports_studies(period, startdate, enddate, destdir):
+    studies = Report.get_studies()
+
     for ds in Report.get_data_sources():
-        ds_dbname = ds.get_db_name()
-        dbname = Report.get_config()['generic'][ds_dbname]
-        dsquery = ds.get_query_builder()
-        dbcon = dsquery(dbuser, dbpass, dbname, db_identities)
         # logging.info(ds.get_name() + " studies active " + str(studies))
         for study in studies:
-            logging.info("Creating report for " + study.id + " for " + ds.get_name())
-            try:
-                obj = study(dbcon, metric_filters)
-                obj.create_report(ds, destdir)
-            except TypeError:
-                import traceback
-                logging.info(study.id + " does no support standard API. Not used.")
-                traceback.print_exc(file=sys.stdout)
-                continue
+            create_report_study(ds, study, period, startdate, enddate, destdir)
+
+def init_report_worker():
+    """ Each worker process uses its own db connections """
+    Report.reconnect()
+
+def run_report_unit(unit):
+    """ Execute one independent unit of work of the report
+
+        unit: (kind, data source name, filter name or study id)
+        Returns (unit, True, queries, files) if the unit was generated OK, (unit,
+        False, queries, files) if not. queries are the profile records of the
+        unit queries and files the manifest entries of the JSON files written.
+    """
+    kind, ds_name, name = unit
+    try:
+        ds = Report.get_data_source(ds_name)
+        Report.connect_ds(ds)
+        logging.info("[%s] %s %s" % (kind, ds_name, name or ''))
+        if kind == "evol":
+            ds.create_evolutionary_report(period, startdate, enddate, opts.destdir, identities_db)
+        elif kind == "agg":
+            ds.create_agg_report(period, startdate, enddate, opts.destdir, identities_db)
+        elif kind == "top":
+            ds.create_top_report(startdate, enddate, opts.destdir, opts.npeople, identities_db)
+        elif kind == "filter":
+            filter_ = Report.get_filter(name)
+            create_report_filter(ds, filter_, period, startdate, enddate,
+                                 opts.destdir, opts.npeople, identities_db)
+        elif kind == "study":
+            study = Report.get_study_by_id(name)
+            create_report_study(ds, study, period, startdate, enddate, opts.destdir)
+        else:
+            raise Exception("Unknown report unit " + kind)
+    except Exception:
+        import traceback
+        logging.error("Error creating %s %s %s" % (kind, ds_name, name or ''))
+        traceback.print_exc(file=sys.stdout)
+        return (unit, False, Report.pop_query_profile_records(),
+                Report.pop_json_manifest_entries())
+    return (unit, True, Report.pop_query_profile_records(),
+            Report.pop_json_manifest_entries())
+
+def run_report_units(units, jobs):
+    """ Run the report units in a pool of jobs processes. All of them write
+        their JSON files directly in destdir, so no merge is needed. """
+    from multiprocessing import Pool
+
+    if len(units) == 0: return True
+    logging.info("Running %i report units with %i jobs" % (len(units), jobs))
+    pool = Pool(jobs, init_report_worker)
+    failed = []
+    try:
+        for unit, ok, queries, files in pool.imap_unordered(run_report_unit, units):
+            Report.add_query_profile_records(queries)
+            Report.add_json_manifest_entries(files)
+            if not ok: failed.append(unit)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+    for unit in failed:
+        logging.error("Report unit failed: " + str(unit))
+    return len(failed) == 0
+
+def get_global_units(with_top):
+    units = []
+    for kind in ["evol", "agg"]:
+        units += [(kind, ds.get_name(), None) for ds in Report.get_data_sources()]
+    if with_top:
+        units += [("top", ds.get_name(), None) for ds in Report.get_data_sources()]
+    return units
+
+def get_filters_units():
+    units = []
+    for ds in Report.get_data_sources():
+        for filter_ in Report.get_filters():
+            units.append(("filter", ds.get_name(), filter_.get_name()))
+    return units
+
+def get_studies_units():
+    units = []
+    for ds in Report.get_data_sources():
+        for study in Report.get_studies():
+            units.append(("study", ds.get_name(), study.id))
+    return units
+
+def create_reports_jobs(jobs):
+    """ Create the reports running its independent units in jobs processes.
+        Returns False if any unit failed, after running all of them. """
+    ok = True
+    if not opts.filter and not opts.study:
+        logging.info("Creating global evolution, aggregated and top metrics...")
+        ok &= run_report_units(get_global_units(not opts.metric), jobs)
+        if not opts.metric:
+            people_ids = create_people_identifiers(startdate, enddate, opts.destdir, opts.npeople, identities_db)
+            if (automator['r']['reports'].find('people')>-1):
+                create_report_people(startdate, enddate, opts.destdir, opts.npeople, identities_db, people_ids)
+            create_top_people_report(startdate, enddate, opts.destdir, identities_db)
+    units = []
+    if not opts.study and not opts.no_filters and not opts.metric:
+        units += get_filters_units()
+    if not opts.filter and not opts.metric and not opts.item:
+        units += get_studies_units()
+    ok &= run_report_units(units, jobs)
+    return ok
+
+def finish_report(ok):
+    """ Save the results of the run and exit, with status 1 if not ok """
+    if not ok:
+        logging.error("Report data source analysis with errors")
+        # Entries of the files written by the units that worked
+        Report.save_json_manifest()
+        sys.exit(1)
+    Report.log_query_cache_stats()
+    Report.save_query_profile()
+    Report.save_json_manifest()
+    logging.info("Report data source analysis OK")
+    sys.exit(0)
 
 def create_events(startdate, enddate, destdir):
     for ds in Report.get_data_sources():
@@ -377,9 +503,13 @@ if __name__ == '__main__':
         set_study(opts.study)
     if (opts.events):
         create_events(startdate, enddate, opts.destdir)
+        Report.save_json_manifest()
         logging.info("Events generated OK")
         sys.exit(0)
 
+    if opts.jobs > 1:
+        finish_report(create_reports_jobs(opts.jobs))
+
     if not opts.filter and not opts.study:
         logging.info("Creating global evolution metrics...")
         evol = create_evol_report(startdate, enddate, opts.destdir, identities_db)
@@ -400,4 +530,4 @@ if __name__ == '__main__':
     if not opts.filter and not opts.metric and not opts.item:
         create_reports_studies(period, startdate, enddate, opts.destdir)
 
-    logging.info("Report data source analysis OK")
+    finish_report(True)
@@ -117,6 +117,12 @@ def read_options():
                       action="store_true",
                       dest="events",
                       help="Generate events.")
+    parser.add_option("-j", "--jobs",
+                      action="store",
+                      type="int",
+                      dest="jobs",
+                      default=1,
+                      help="Number of processes used to generate the report units in parallel")
 
     (opts, args) = parser.parse_args()
 
@@ -132,4 +138,6 @@ def read_options():
         parser.error("--metric need also --data-source.")
     if opts.item and opts.filter is None:
         parser.error("--item need also --filter.")
+    if opts.jobs < 1:
+        parser.error("--jobs must be at least 1.")
     return opts
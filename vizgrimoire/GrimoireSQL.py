@@ -21,16 +21,13 @@
 
 # SQL utilities
 
-import MySQLdb
 import logging
 import re, sys
 from vizgrimoire.metrics.query_builder import DSQuery
 
 
-# global vars to be moved to specific classes
-cursor = None
-# one connection per database
-dbpool = {}
+# DSQuery used by ExecuteQuery, its connection is from DSQuery.connection_pool
+channel = None
 
 ##
 ## METAQUERIES
@@ -69,40 +66,10 @@ def BuildQuery (period, startdate, enddate, date_field, fields, tables, filters,
 
 def SetDBChannel (user=None, password=None, database=None,
                   host="127.0.0.1", port=3306, group=None):
-    global cursor
-    global dbpool
+    global channel
 
-    db = None
-
-    if database in dbpool:
-        db = dbpool[database]
-    else:
-        if (group == None):
-            db = MySQLdb.connect(user=user, passwd=password,
-                                 db=database, host=host, port=port)
-        else:
-            db = MySQLdb.connect(read_default_group=group, db=database)
-        dbpool[database] = db
-
-    cursor = db.cursor()
-    cursor.execute("SET NAMES 'utf8'")
+    channel = DSQuery(user, password, database, host=host, port=port, group=group)
 
 def ExecuteQuery (sql):
-    result = {}
-    cursor.execute(sql)
-    rows = cursor.rowcount
-    columns = cursor.description
-
-    if columns is None: return result
-
-    for column in columns:
-        result[column[0]] = []
-    if rows > 1:
-        for value in cursor.fetchall():
-            for (index,column) in enumerate(value):
-                result[columns[index][0]].append(column)
-    elif rows == 1:
-        value = cursor.fetchone()
-        for i in range (0, len(columns)):
-            result[columns[i][0]] = value[i]
-    return result 
+    # Not cached: these queries also change the data and create views
+    return channel._ExecuteTimed(sql, lambda: (channel._ExecuteQuery(sql), False))
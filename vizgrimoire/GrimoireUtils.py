@@ -37,6 +37,7 @@ import math
 import rpy2.rinterface as rinterface
 from rpy2.robjects.vectors import StrVector
 import os,sys
+import numpy
 from numpy import average, median
 
 def valRtoPython(val):
@@ -80,71 +81,18 @@ def cleanNaN(ts_data):
     return ts_data
 
 
-def completePeriodIdsYears(ts_data, start, end):
-    data_vars = ts_data.keys()
-    new_ts_data =  createTimeSeries(ts_data)
-    checkListArray(ts_data)
-
-    start_year = start.year * 12
-    years = end.year - start.year
-
-
-    for i in range(0, years+1):
-        if (start_year+(i*12) in ts_data['year']) is False:
-            # Add new time point with all vars to zero
-            for key in (data_vars):
-                new_ts_data[key].append(0)
-            new_ts_data['year'].pop()
-            new_ts_data['year'].append(start_year+(i*12))
-        else:
-            # Add already existing data for the time point
-            index = ts_data['year'].index(start_year+(i*12))
-            for key in (data_vars):
-                new_ts_data[key].append(ts_data[key][index])
-
-        current =  start + relativedelta(years=i)
-        timestamp = calendar.timegm(current.timetuple())
-        new_ts_data['unixtime'].append(unicode(timestamp))
-        new_ts_data['id'].append(i)
-        new_ts_data['date'].append(datetime.strftime(current, "%b %Y"))
+# English month names independent of the locale
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
 
-    return new_ts_data
-
-
-def completePeriodIdsMonths(ts_data, start, end):
-    data_vars = ts_data.keys()
-    new_ts_data =  createTimeSeries(ts_data)
-    checkListArray(ts_data)
+# Periods axes already built: (period, start, end) -> axis
+_period_axes = {}
 
-    start_month = start.year*12 + start.month
-    end_month = end.year*12 + end.month
-    months = end_month - start_month
-
-    # All data is from the complete month
-    start = start - timedelta(days=(start.day-1))
-
-    for i in range(0, months+1):
-        if (start_month+i in ts_data['month']) is False:
-            # Add new time point with all vars to zero
-            for key in (data_vars):
-                new_ts_data[key].append(0)
-            new_ts_data['month'].pop()
-            new_ts_data['month'].append(start_month+i)
-        else:
-            # Add already existing data for the time point
-            index = ts_data['month'].index(start_month+i)
-            for key in (data_vars):
-                new_ts_data[key].append(ts_data[key][index])
-
-        current =  start + relativedelta(months=i)
-        timestamp = calendar.timegm(current.timetuple())
-        new_ts_data['unixtime'].append(unicode(timestamp))
-        new_ts_data['id'].append(i)
-        import locale
-        locale.setlocale(locale.LC_ALL, "en_US.UTF-8")
-        new_ts_data['date'].append(datetime.strftime(current, "%b %Y"))
-
-    return new_ts_data
+def _date_label(date, period):
+    label = MONTH_NAMES[date.month-1] + " " + str(date.year)
+    if period == "day":
+        label = "%02d %s" % (date.day, label)
+    return label
 
 def date2Week(date):
     # isocalendar: year weeknumber weekday
@@ -152,41 +100,106 @@ def date2Week(date):
     week  += "%02d" % date.isocalendar()[1]
     return week
 
-def completePeriodIdsWeeks(ts_data, start, end):
-    data_vars = ts_data.keys()
-    new_ts_data =  createTimeSeries(ts_data)
-    checkListArray(ts_data)
+def getPeriodAxis(period, start, end):
+    """ Periods ids, unixtime and date labels from start to end (included)
 
-    # Start of the week
-    dayweek = start.isocalendar()[2]
-    new_week = start - relativedelta(days=dayweek-1)
-    i = 0 # for ids in time series
-
-    while (new_week <= end):
-        new_week_txt = date2Week(new_week)
-        if (int(new_week_txt) in ts_data['week']) is False:
-            # Add new time point with all vars to zero
-            for key in (data_vars):
-                new_ts_data[key].append(0)
-            new_ts_data['week'].pop()
-            new_ts_data['week'].append(int(new_week_txt))
-        else:
-            # Add already existing data for the time point
-            index = ts_data['week'].index(int(new_week_txt))
-            for key in (data_vars):
-                new_ts_data[key].append(ts_data[key][index])
-            new_ts_data['week'].pop()
-            new_ts_data['week'].append(ts_data['week'][index])
-
-        timestamp = calendar.timegm(new_week.timetuple())
-        new_ts_data['unixtime'].append(unicode(timestamp))
-        new_ts_data['id'].append(i)
-        i += 1
-        new_ts_data['date'].append(datetime.strftime(new_week, "%b %Y"))
-        new_week = new_week + relativedelta(weeks=1)
+        Periods ids are the ones returned by DSQuery.GetSQLPeriod: year*12 for
+        years, year*12+month for months, YEARWEEK for weeks and unixtime for
+        days. The axis is built once and cached for the next time series.
+    """
+    key = (period, start, end)
+    if key in _period_axes: return _period_axes[key]
+
+    ids = []
+    dates = []
+    if period == "year":
+        for i in range(0, end.year - start.year + 1):
+            ids.append(start.year*12 + i*12)
+            dates.append(start + relativedelta(years=i))
+    elif period == "month":
+        # All data is from the complete month
+        first = start - timedelta(days=(start.day-1))
+        start_month = start.year*12 + start.month
+        for i in range(0, end.year*12 + end.month - start_month + 1):
+            ids.append(start_month+i)
+            dates.append(first + relativedelta(months=i))
+    elif period == "week":
+        # Start of the week
+        current = start - timedelta(days=start.isocalendar()[2]-1)
+        while (current <= end):
+            ids.append(int(date2Week(current)))
+            dates.append(current)
+            current = current + timedelta(weeks=1)
+    elif period == "day":
+        current = start
+        while (current <= end):
+            ids.append(calendar.timegm(current.timetuple()))
+            dates.append(current)
+            current = current + timedelta(days=1)
+    else:
+        logging.error("PERIOD: "+period+" not supported")
+        return None
+
+    axis = {}
+    axis['ids'] = numpy.array(ids, dtype=numpy.int64)
+    axis['unixtime'] = [unicode(calendar.timegm(d.timetuple())) for d in dates]
+    axis['date'] = [_date_label(d, period) for d in dates]
+    _period_axes[key] = axis
+    return axis
+
+def completePeriodIdsAxis(ts_data, period, start, end):
+    """ Time series with all the periods in the axis, filling with zeros """
+    axis = getPeriodAxis(period, start, end)
+    if axis is None: return ts_data
+    # For days the period id is the unixtime
+    id_field = period
+    if period == "day": id_field = "unixtime"
+    checkListArray(ts_data)
+    if id_field not in ts_data: ts_data[id_field] = []
+
+    periods = len(axis['ids'])
+    # Position in the axis for each time point in ts_data
+    ids = []
+    for i in ts_data[id_field]:
+        # Not valid periods ids are not found in the axis
+        try: ids.append(int(i))
+        except (TypeError, ValueError): ids.append(-1)
+    ids = numpy.array(ids, dtype=numpy.int64)
+    pos = numpy.searchsorted(axis['ids'], ids)
+    pos[pos == periods] = 0
+    found = axis['ids'][pos] == ids if periods > 0 else numpy.zeros(len(ids), dtype=bool)
+    rows = numpy.nonzero(found)[0]
+    # The first time point wins if a period is duplicated
+    pos, first = numpy.unique(pos[found], return_index=True)
+    rows = rows[first]
 
+    new_ts_data = {}
+    for key in ts_data:
+        if key in (id_field, 'id', 'unixtime', 'date'): continue
+        values = numpy.empty(len(ts_data[key]), dtype=object)
+        values[:] = ts_data[key]
+        new_values = numpy.zeros(periods, dtype=object)
+        new_values[pos] = values[rows]
+        new_ts_data[key] = new_values.tolist()
+    new_ts_data['unixtime'] = list(axis['unixtime'])
+    new_ts_data['date'] = list(axis['date'])
+    new_ts_data['id'] = range(0, periods)
+    if period != "day":
+        new_ts_data[period] = axis['ids'].tolist()
     return new_ts_data
 
+def completePeriodIdsYears(ts_data, start, end):
+    return completePeriodIdsAxis(ts_data, "year", start, end)
+
+def completePeriodIdsMonths(ts_data, start, end):
+    return completePeriodIdsAxis(ts_data, "month", start, end)
+
+def completePeriodIdsWeeks(ts_data, start, end):
+    return completePeriodIdsAxis(ts_data, "week", start, end)
+
+def completePeriodIdsDays(ts_data, start, end):
+    return completePeriodIdsAxis(ts_data, "day", start, end)
+
 def completePeriodIds(ts_data, period, startdate, enddate):
     # If already complete, return
     if "id" in ts_data: return ts_data
@@ -203,12 +216,8 @@ def completePeriodIds(ts_data, period, startdate, enddate):
     # For this reason, a day is substracted from the end date
     end = end - timedelta(days=1)
 
-    if period == "week":
-        new_ts_data = completePeriodIdsWeeks(ts_data, start, end)
-    elif period == "month":
-        new_ts_data = completePeriodIdsMonths(ts_data, start, end)
-    elif period == "year":
-        new_ts_data = completePeriodIdsYears(ts_data, start, end)
+    if period in ["day", "week", "month", "year"]:
+        new_ts_data = completePeriodIdsAxis(ts_data, period, start, end)
 
     return cleanNaN(new_ts_data)
 
@@ -343,20 +352,21 @@ def convertCombinedFiltersName(data):
 
 # Until we use VizPy we will create JSON python files with _py
 def createJSON(data, filepath, check=False, skip_fields = []):
+    from vizgrimoire.json_writer import JSONWriter
+    from vizgrimoire.metrics.metrics import Metrics
+
     check = False # for production mode
     filepath_tokens = filepath.split(".json")
     filepath_py = filepath_tokens[0]+"_py.json"
     filepath_r = filepath_tokens[0]+"_r.json"
 
-    checked_data = convertDatetime(roundDecimals(removeDecimals(data)))
-    checked_data = convertCombinedFiltersName(checked_data)
-    json_data = json.dumps(checked_data, sort_keys=True)
-    json_data = json_data.replace('NaN','"NA"')
+    # Decimals, floats, NaN and datetimes are converted while writing
+    checked_data = convertCombinedFiltersName(data)
+    writer = JSONWriter(Metrics.max_decimals)
     if check == False: #forget about R JSON checking
-        jsonfile = open(filepath, 'w')
-        jsonfile.write(json_data)
-        jsonfile.close()
+        writer.write(checked_data, filepath)
         return
+    json_data = writer.dumps(checked_data)
 
     # NA as value is not decoded with Python JSON
     # JSON R has "NA" and not NaN
@@ -624,6 +634,68 @@ def medianAndAvgByPeriod(period, dates, values):
             result['avg'].append(get_avg(period_values))                        # Accumulated values
     return result
 
+def medianAndAvgByGroup(groups, values):
+    """ Size, median and average of the values of each group in one pass
+
+        groups contains the group key (item, period ...) of each value.
+        Values are sorted once by group and value, so each group is a
+        slice of them. Groups are returned in order of first appearance.
+    """
+    result = {'group' : [], 'size' : [], 'median' : [], 'avg' : []}
+    if len(values) == 0: return result
+
+    codes_pos = {}
+    codes = numpy.empty(len(groups), dtype=numpy.int64)
+    for i, group in enumerate(groups):
+        if group not in codes_pos:
+            codes_pos[group] = len(result['group'])
+            result['group'].append(group)
+        codes[i] = codes_pos[group]
+    values = numpy.array(removeDecimals(list(values)), dtype=numpy.float64)
+
+    order = numpy.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    starts = numpy.flatnonzero(numpy.r_[True, codes[1:] != codes[:-1]])
+    sizes = numpy.diff(numpy.r_[starts, len(values)])
+    medians = (values[starts + (sizes - 1) // 2] + values[starts + sizes // 2]) / 2
+    avgs = numpy.add.reduceat(values, starts) / sizes
+
+    result['size'] = sizes.tolist()
+    result['median'] = medians.tolist()
+    result['avg'] = avgs.tolist()
+    return result
+
+def medianAndAvgByGroupHistogram(groups, buckets, counts, totals, bucket_size):
+    """ Size, median and average of each group from its values histogram
+
+        The histogram (DSQuery.GetSQLHistogram) has the number of values
+        (counts) and their sum (totals) in each bucket of bucket_size. The
+        average is exact and the median is the center of its bucket.
+    """
+    result = {'group' : [], 'size' : [], 'median' : [], 'avg' : []}
+    histograms = {}
+    for i, group in enumerate(groups):
+        if group not in histograms:
+            histograms[group] = []
+            result['group'].append(group)
+        histograms[group].append((float(buckets[i]), int(counts[i]), float(totals[i])))
+
+    for group in result['group']:
+        histogram = sorted(histograms[group])
+        size = sum([count for (bucket, count, total) in histogram])
+        # Buckets with the two middle values
+        middle = [(size - 1) // 2, size // 2]
+        centers = []
+        seen = 0
+        for (bucket, count, total) in histogram:
+            for pos in middle[len(centers):]:
+                if pos < seen + count: centers.append(bucket * bucket_size)
+            seen += count
+        result['size'].append(size)
+        result['median'].append(sum(centers) / 2)
+        result['avg'].append(sum([total for (bucket, count, total) in histogram]) / size)
+    return result
+
 def check_array_value(data):
         if not isinstance(data, list): data = [data]
         return data
@@ -633,83 +705,108 @@ def check_array_values(data):
         data[item] = check_array_value(data[item])
     return data
 
+class ItemsAlignment(object):
+    """ Align GROUP BY results to a list of items
+
+    The position of each item is indexed once so all the metrics of a
+    filter can be filled and ordered using the same alignment in linear
+    time. Not existing items are filled with 0 (or a time series of 0s).
+    """
+
+    def __init__(self, items, evol = False, period = None,
+                 startdate = None, enddate = None):
+        self.items = check_array_value(items)
+        self.evol = evol
+        self.period = period
+        self.startdate = startdate
+        self.enddate = enddate
+        self.zero_ts = None
+
+    def _get_zero_ts(self):
+        if self.zero_ts is None:
+            self.zero_ts = completePeriodIds({'zero':[],self.period:[]}, self.period,
+                                             self.startdate, self.enddate)['zero']
+        return self.zero_ts
+
+    @staticmethod
+    def get_index(values):
+        """ Position of the first appearance of each value """
+        index = {}
+        for pos in range(len(values)-1, -1, -1):
+            index[values[pos]] = pos
+        return index
+
+    def align(self, data, id_field):
+        """ Data values for the items, in the items order """
+        if id_field not in data:
+            logging.info("[fill_items] " + id_field + " not found in " + ",".join(data))
+            return data
+        data = check_array_values(data)
+        index = ItemsAlignment.get_index(data[id_field])
+
+        aligned = {id_field: list(self.items)}
+        fields = [field for field in data if field != id_field]
+        if self.evol:
+            # This fields should not be modified
+            for field in [self.period, 'id', 'unixtime', 'date']:
+                if field in fields:
+                    fields.remove(field)
+                    aligned[field] = data[field]
+
+        positions = [index.get(item) for item in self.items]
+        for field in fields:
+            values = data[field]
+            if self.evol:
+                zero_ts = self._get_zero_ts()
+                aligned[field] = [values[pos] if pos is not None else list(zero_ts)
+                                  for pos in positions]
+            else:
+                aligned[field] = [values[pos] if pos is not None else 0
+                                  for pos in positions]
+        return aligned
+
 def fill_items(items, data, id_field, evol = False,
                period = None, startdate = None, enddate = None):
     """ Complete data dict items filling with 0 not existing items """
-    from vizgrimoire.GrimoireUtils import completePeriodIds
-
     # This fields should not be modified
     ts_fields = [period, 'unixtime', 'date','id']
 
-    if evol:
-        zero_ts = completePeriodIds({id_field:[],period:[]},
-                                    period, startdate, enddate)[id_field]
     fields = data.keys()
     if id_field not in fields:
         logging.info("[fill_items] " + id_field + " not found in " + ",".join(data))
         return data
     fields.remove(id_field)
+    data = check_array_values(data)
 
-    if not isinstance(items, list):
-        items_ids = [items]
-    else:
-        items_ids = items
-
-    if type(data[id_field]) != list:
-        data[id_field] = [data[id_field]]
-
-    for id in items_ids:
-        if id not in data[id_field]:
-            data[id_field].append(id)
-            for field in fields:
-                if type(data[field]) != list:
-                    data[field] = [data[field]]
-
-                if field in ts_fields: continue
-                if not evol:
-                    data[field].append(0)
-                if evol:
-                    data[field].append(zero_ts)
+    alignment = ItemsAlignment(items, evol, period, startdate, enddate)
+    index = ItemsAlignment.get_index(data[id_field])
+    for id in alignment.items:
+        if id in index: continue
+        index[id] = len(data[id_field])
+        data[id_field].append(id)
+        for field in fields:
+            if field in ts_fields: continue
+            if not evol:
+                data[field].append(0)
+            if evol:
+                data[field].append(list(alignment._get_zero_ts()))
     return data
 
 
 def order_items(items, data, id_field, evol = False, period = None):
     """ Reorder data identities using items ordering """
     data = check_array_values(data)
-    items = check_array_value(items)
-    fields = data.keys()
-    if id_field not in fields: return data
-    data_ordered = {}
-    for field in fields:
-        data_ordered[field] = []
-
-    fields.remove(id_field)
-
-    if evol:
-        evol_fields = [period, 'id', 'unixtime','date']
-        for evol_field in evol_fields:
-            if evol_field in fields:
-                fields.remove(evol_field)
-                data_ordered[evol_field] = data[evol_field]
-
-    for id in items:
-        data_ordered[id_field].append(id)
-        try:
-            pos = data[id_field].index(id)
-        except:
-            print items
-            print data[id_field]
-            raise
-        for field in fields:
-            data_ordered[field].append(data[field][pos])
-
-    return data_ordered
+    if id_field not in data: return data
+    index = ItemsAlignment.get_index(data[id_field])
+    for id in check_array_value(items):
+        if id not in index:
+            raise ValueError(str(id) + " not found in " + id_field)
+    return ItemsAlignment(items, evol, period).align(data, id_field)
 
 def fill_and_order_items(items, data, id_field, evol = False,
-                         period = None, startdate = None, enddate = None):
-    # Only items will appear for a filter
-    if not evol: # evol is already filled (complete data) for a company, but not all organizations
-        data = fill_items(items, data, id_field)
-    if evol: data = fill_items(items, data, id_field,
-                               evol, period, startdate, enddate)
-    return order_items(items, data, id_field, evol, period)
+                         period = None, startdate = None, enddate = None,
+                         alignment = None):
+    """ Only items will appear for a filter, in the items order """
+    if alignment is None:
+        alignment = ItemsAlignment(items, evol, period, startdate, enddate)
+    return alignment.align(data, id_field)
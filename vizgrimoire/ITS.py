@@ -35,6 +35,7 @@ from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.metrics.query_builder import ITSQuery
 from vizgrimoire.data_source import DataSource
 from vizgrimoire.filter import Filter
+from vizgrimoire.json_bundle import FilterItemsWriter
 
 
 class ITS(DataSource):
@@ -86,11 +87,36 @@ class ITS(DataSource):
         closed_condition = cls._get_closed_condition()
 
         metrics = cls.get_metrics_data(period, startdate, enddate, identities_db, filter_, True)
-        if filter_ is not None: studies = {}
+        if filter_ is not None:
+            studies = cls._get_filter_studies_data(period, startdate, enddate, identities_db, filter_)
         else:
             studies = DataSource.get_studies_data(cls, period, startdate, enddate, True)
         return dict(metrics.items()+studies.items())
 
+    @classmethod
+    def _get_filter_studies_data(cls, period, startdate, enddate, identities_db, filter_):
+        """ Tickets states backlog of all the items of a filter, in one query """
+        from vizgrimoire.report import Report
+        from vizgrimoire.analysis.its_states import TicketsStates
+        from vizgrimoire.GrimoireUtils import fill_and_order_items
+
+        type_analysis = filter_.get_type_analysis()
+        if type_analysis is None or type_analysis[1] is not None: return {}
+        if type_analysis[0] not in TicketsStates.filters_all_items: return {}
+        if TicketsStates not in Report.get_studies(): return {}
+
+        items = cls.get_filter_items(filter_, startdate, enddate, identities_db)
+        if items is None: return {}
+
+        automator = Report.get_config()
+        dbcon = ITSQuery(automator['generic']['db_user'], automator['generic']['db_password'],
+                         automator['generic'][cls.get_db_name()], identities_db)
+        mfilter = MetricFilters(period, startdate, enddate, type_analysis)
+        data = TicketsStates(dbcon, mfilter).get_ts_all_items()
+        return fill_and_order_items(items['name'], data,
+                                    dbcon.get_group_field_alias(type_analysis[0]),
+                                    True, period, startdate, enddate)
+
     @classmethod
     def create_evolutionary_report (cls, period, startdate, enddate, destdir, i_db, filter_ = None):
         data =  cls.get_evolutionary_data (period, startdate, enddate, i_db, filter_)
@@ -259,18 +285,19 @@ class ITS(DataSource):
         else:
             items_list = items
 
+        evol_writer = FilterItemsWriter(cls(), filter_, destdir, "evolutionary")
+        agg_writer = FilterItemsWriter(cls(), filter_, destdir, "static")
+        top_writer = FilterItemsWriter(cls(), filter_, destdir, "top")
         for item in items :
             item_name = "'"+ item+ "'"
             logging.info (item_name)
             filter_item = Filter(filter_name, item)
 
             evol_data = cls.get_evolutionary_data(period, startdate, enddate, identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_evolutionary_filename(cls()))
-            createJSON(evol_data, fn)
+            evol_writer.write(filter_item, evol_data)
 
             agg = cls.get_agg_data(period, startdate, enddate, identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_static_filename(cls()))
-            createJSON(agg, fn)
+            agg_writer.write(filter_item, agg)
 
             if filter_name in ["domain", "company", "repository"]:
                 items_list['name'].append(item.replace('/', '_'))
@@ -279,8 +306,10 @@ class ITS(DataSource):
 
             if filter_name in ["company","domain","repository"]:
                 top = cls.get_top_data(startdate, enddate, identities_db, filter_item, npeople)
-                fn = os.path.join(destdir, filter_item.get_top_filename(cls()))
-                createJSON(top, fn)
+                top_writer.write(filter_item, top)
+        evol_writer.close()
+        agg_writer.close()
+        top_writer.close()
 
         fn = os.path.join(destdir, filter_.get_filename(cls()))
         createJSON(items_list, fn)
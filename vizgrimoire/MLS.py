@@ -36,6 +36,7 @@ from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.analysis.threads import Threads
 from vizgrimoire.data_source import DataSource
 from vizgrimoire.filter import Filter
+from vizgrimoire.json_bundle import FilterItemsWriter
 
 
 class MLS(DataSource):
@@ -233,6 +234,9 @@ class MLS(DataSource):
         else:
             items_list = items
 
+        evol_writer = FilterItemsWriter(MLS(), filter_, destdir, "evolutionary")
+        agg_writer = FilterItemsWriter(MLS(), filter_, destdir, "static")
+        top_writer = FilterItemsWriter(MLS(), filter_, destdir, "top")
         for item in items :
             item = item.replace("'", "\\'")
             item_name = "'"+ item+ "'"
@@ -241,12 +245,10 @@ class MLS(DataSource):
 
             evol_data = MLS.get_evolutionary_data(period, startdate, enddate, 
                                                   identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_evolutionary_filename(MLS()))
-            createJSON(evol_data, fn)
+            evol_writer.write(filter_item, evol_data)
 
             agg = MLS.get_agg_data(period, startdate, enddate, identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_static_filename(MLS()))
-            createJSON(agg, fn)
+            agg_writer.write(filter_item, agg)
 
             if filter_name in ("domain", "company", "repository"):
                 items_list['name'].append(item.replace('/', '_').replace("<","__").replace(">","___"))
@@ -254,7 +256,10 @@ class MLS(DataSource):
                 items_list['senders_365'].append(agg['senders_365'])
 
             top_senders = MLS.get_top_data(startdate, enddate, identities_db, filter_item, npeople, False)
-            createJSON(top_senders, destdir+"/"+filter_item.get_top_filename(MLS()))
+            top_writer.write(filter_item, top_senders)
+        evol_writer.close()
+        agg_writer.close()
+        top_writer.close()
 
         fn = os.path.join(destdir, filter_.get_filename(MLS()))
         createJSON(items_list, fn)
@@ -323,6 +328,21 @@ class MLS(DataSource):
     def get_person_agg(uuid, startdate, enddate, identities_db, type_analysis):
         return GetStaticPeopleMLS(uuid, startdate, enddate)
 
+    @staticmethod
+    def get_people_evol(people, period, startdate, enddate, identities_db):
+        evol = GetEvolPeopleMLS(people, period, startdate, enddate)
+        return DataSource.split_people_data(evol, people, True, period, startdate, enddate)
+
+    @staticmethod
+    def get_people_agg(people, startdate, enddate, identities_db):
+        agg = GetStaticPeopleMLS(people, startdate, enddate)
+        agg = DataSource.split_people_data(agg, people)
+        for uuid in people:
+            # People without activity
+            if uuid not in agg:
+                agg[uuid] = MLS.get_person_agg(uuid, startdate, enddate, identities_db, None)
+        return agg
+
     @staticmethod
     def create_r_reports(vizr, enddate, destdir):
         unique_ids = True
@@ -585,19 +605,28 @@ def GetListPeopleMLS (startdate, enddate) :
     return (data)
 
 def GetQueryPeopleMLS (developer_id, period, startdate, enddate, evol) :
+    # developer_id could be a list of uuids: activity grouped by uuid
     fields = "COUNT(m.message_ID) AS sent"
     tables = GetTablesOwnUniqueIdsMLS()
-    filters = GetFiltersOwnUniqueIdsMLS() + "AND pup.uuid = '" + str(developer_id) + "'"
+    type_analysis = None
+    if isinstance(developer_id, list):
+        filters = GetFiltersOwnUniqueIdsMLS() + " AND " + DataSource.get_people_filter(developer_id)
+        type_analysis = ['uuid', None]
+    else:
+        filters = GetFiltersOwnUniqueIdsMLS() + "AND pup.uuid = '" + str(developer_id) + "'"
 
     if (evol) :
         q = GetSQLPeriod(period,'first_date', fields, tables, filters,
-                startdate, enddate)
+                startdate, enddate, type_analysis)
     else:
         fields = fields +\
                 ",DATE_FORMAT (min(first_date),'%Y-%m-%d') as first_date, "+\
                 "DATE_FORMAT (max(first_date),'%Y-%m-%d') as last_date"
+        if type_analysis is not None: fields = "pup.uuid, " + fields
         q = GetSQLGlobal('first_date', fields, tables, filters,
                 startdate, enddate)
+        # Activity of each person in the list
+        if type_analysis is not None: q += " GROUP BY pup.uuid"
     return (q)
 
 
@@ -32,6 +32,7 @@ from vizgrimoire.GrimoireUtils import GetPercentageDiff, GetDates, completePerio
 from vizgrimoire.GrimoireUtils import createJSON, getPeriod
 from vizgrimoire.data_source import DataSource
 from vizgrimoire.filter import Filter
+from vizgrimoire.json_bundle import FilterItemsWriter
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.metrics.query_builder import DSQuery
 
@@ -251,6 +252,7 @@ class SCM(DataSource):
         fn = os.path.join(destdir, filter_.get_filename(SCM()))
         createJSON(items, fn)
 
+        top_writer = FilterItemsWriter(SCM(), filter_, destdir, "top")
         for item in items :
             item_name = "'"+ item+ "'"
             logging.info (item_name)
@@ -258,8 +260,8 @@ class SCM(DataSource):
 
             if filter_name in ("company","project","repository"):
                 top_authors = SCM.get_top_data(startdate, enddate, identities_db, filter_item, npeople)
-                fn = os.path.join(destdir, filter_item.get_top_filename(SCM()))
-                createJSON(top_authors, fn)
+                top_writer.write(filter_item, top_authors)
+        top_writer.close()
 
     @staticmethod
     def create_filter_report(filter_, period, startdate, enddate, destdir, npeople, identities_db):
@@ -283,23 +285,25 @@ class SCM(DataSource):
         else:
             items_list = items
 
+        evol_writer = FilterItemsWriter(SCM(), filter_, destdir, "evolutionary")
+        agg_writer = FilterItemsWriter(SCM(), filter_, destdir, "static")
         for item in items :
             item_name = "'"+ item+ "'"
             logging.info (item_name)
             filter_item = Filter(filter_name, item)
 
             evol_data = SCM.get_evolutionary_data(period, startdate, enddate, identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_evolutionary_filename(SCM()))
-            createJSON(evol_data, fn)
+            evol_writer.write(filter_item, evol_data)
 
             agg = SCM.get_agg_data(period, startdate, enddate, identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_static_filename(SCM()))
-            createJSON(agg, fn)
+            agg_writer.write(filter_item, agg)
 
             if filter_name in ("domain", "company", "repository"):
                 items_list['name'].append(item.replace('/', '_'))
                 items_list['commits_365'].append(agg['commits_365'])
                 items_list['authors_365'].append(agg['authors_365'])
+        evol_writer.close()
+        agg_writer.close()
 
         SCM.create_filter_report_top(filter_, period, startdate, enddate, destdir, npeople, identities_db)
 
@@ -420,6 +424,21 @@ class SCM(DataSource):
         agg = GetStaticPeopleSCM(uuid,  startdate, enddate)
         return agg
 
+    @staticmethod
+    def get_people_evol(people, period, startdate, enddate, identities_db):
+        evol = GetEvolPeopleSCM(people, period, startdate, enddate)
+        return DataSource.split_people_data(evol, people, True, period, startdate, enddate)
+
+    @staticmethod
+    def get_people_agg(people, startdate, enddate, identities_db):
+        agg = GetStaticPeopleSCM(people, startdate, enddate)
+        agg = DataSource.split_people_data(agg, people)
+        for uuid in people:
+            # People without activity
+            if uuid not in agg:
+                agg[uuid] = SCM.get_person_agg(uuid, startdate, enddate, identities_db, None)
+        return agg
+
     # Studies implemented in R
     @staticmethod
     def create_r_reports(vizr, enddate, destdir):
@@ -561,18 +580,27 @@ def GetPeopleListSCM (startdate, enddate) :
     return (data)
 
 def GetPeopleQuerySCM (developer_id, period, startdate, enddate, evol) :
+    # developer_id could be a list of uuids: activity grouped by uuid
     fields ='COUNT(distinct(s.id)) AS commits'
     tables = GetTablesOwnUniqueIdsSCM()
     filters = GetFiltersOwnUniqueIdsSCM()
-    filters +=" AND pup.uuid='"+str(developer_id)+"'"
+    type_analysis = None
+    if isinstance(developer_id, list):
+        filters +=" AND " + DataSource.get_people_filter(developer_id)
+        type_analysis = ['uuid', None]
+    else:
+        filters +=" AND pup.uuid='"+str(developer_id)+"'"
     if (evol) :
         q = GetSQLPeriod(period,'s.author_date', fields, tables, filters,
-                startdate, enddate)
+                startdate, enddate, type_analysis)
     else :
         fields += ",DATE_FORMAT (min(s.author_date),'%Y-%m-%d') as first_date, "+\
                   "DATE_FORMAT (max(s.author_date),'%Y-%m-%d') as last_date"
+        if type_analysis is not None: fields = "pup.uuid, " + fields
         q = GetSQLGlobal('s.author_date', fields, tables, filters, 
                 startdate, enddate)
+        # Activity of each person in the list
+        if type_analysis is not None: q += " GROUP BY pup.uuid"
 
     return (q)
 
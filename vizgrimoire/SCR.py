@@ -41,6 +41,7 @@ from vizgrimoire.metrics.query_builder import SCRQuery
 
 from vizgrimoire.data_source import DataSource
 from vizgrimoire.filter import Filter
+from vizgrimoire.json_bundle import FilterItemsWriter
 
 
 class SCR(DataSource):
@@ -335,6 +336,7 @@ class SCR(DataSource):
         fn = os.path.join(destdir, filter_.get_filename(SCR()))
         createJSON(items, fn)
 
+        top_writer = FilterItemsWriter(SCR(), filter_, destdir, "top")
         for item in items :
             item_name = "'"+ item+ "'"
             logging.info (item_name)
@@ -342,8 +344,8 @@ class SCR(DataSource):
 
             if filter_name in ("company","project","repository"):
                 top_mergers = SCR.get_top_data(startdate, enddate, identities_db, filter_item, npeople)
-                fn = os.path.join(destdir, filter_item.get_top_filename(SCR()))
-                createJSON(top_mergers, fn)
+                top_writer.write(filter_item, top_mergers)
+        top_writer.close()
 
     @staticmethod
     def create_filter_report(filter_, period, startdate, enddate, destdir, npeople, identities_db):
@@ -362,6 +364,8 @@ class SCR(DataSource):
         # Include metrics to sort in javascript.
         items_list = {"name":[],"review_time_days_median":[],"submitted":[]}
 
+        evol_writer = FilterItemsWriter(SCR(), filter_, destdir, "evolutionary")
+        agg_writer = FilterItemsWriter(SCR(), filter_, destdir, "static")
         for item in items :
             item_file = item.replace("/","_")
             items_list["name"].append(item_file)
@@ -371,13 +375,11 @@ class SCR(DataSource):
 
             evol = SCR.get_evolutionary_data(period, startdate, enddate,
                                                identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_evolutionary_filename(SCR()))
-            createJSON(evol, fn)
+            evol_writer.write(filter_item, evol)
 
             # Static
             agg = SCR.get_agg_data(period, startdate, enddate, identities_db, filter_item)
-            fn = os.path.join(destdir, filter_item.get_static_filename(SCR()))
-            createJSON(agg, fn)
+            agg_writer.write(filter_item, agg)
 
             if 'submitted' in agg:
                 items_list["submitted"].append(agg["submitted"])
@@ -385,6 +387,8 @@ class SCR(DataSource):
             if 'review_time_days_median' in agg:
                 items_list["review_time_days_median"].append(agg['review_time_days_median'])
             else: items_list["review_time_days_median"].append("NA")
+        evol_writer.close()
+        agg_writer.close()
 
         fn = os.path.join(destdir, filter_.get_filename(SCR()))
         createJSON(items_list, fn)
@@ -80,42 +80,49 @@ class CompaniesActivity(Analyses):
         """ % (field, identities_db, identities_db)
         return from_
 
-    def get_sql_commits(self, year = None):
+    def _get_year_group(self, date_field, by_year):
+        """ (select, group by) fields to add to group by year if by_year """
+        if not by_year: return ("", "")
+        return (", YEAR(%s) as year" % (date_field), ", year")
+
+    def get_sql_commits(self, year = None, by_year = False):
         where = ""
         field = "commits"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where = " WHERE YEAR(s.author_date) = " + str(year)
             field = field + "_" + str(year)
         sql = """
-            select org.name, count(distinct(s.id)) as %s
+            select org.name%s, count(distinct(s.id)) as %s
             %s %s
-            group by org.id
+            group by org.id%s
             order by %s desc, org.name
-        """ % (field, from_, where, field)
+        """ % (year_select, field, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_authors(self, year = None):
+    def get_sql_authors(self, year = None, by_year = False):
         where = ""
         field = "authors"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where = " WHERE YEAR(s.author_date) = " + str(year)
             field = field + "_" + str(year)
         sql = """
-            select org.name, count(distinct(s.author_id)) as %s
+            select org.name%s, count(distinct(s.author_id)) as %s
             %s %s
-            group by org.id
+            group by org.id%s
             order by %s desc, org.name
-        """ % (field, from_, where, field)
+        """ % (year_select, field, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_committers(self, year = None, active = False):
-        if year is not None and active:
+    def get_sql_committers(self, year = None, active = False, by_year = False):
+        if (year is not None or by_year) and active:
             logging.error("Active committers is not valid for past years.")
             return None
         # An active committers has done a commit in last 90 days
@@ -124,6 +131,7 @@ class CompaniesActivity(Analyses):
         field = "committers"
         if active: field = "committers_active"
         from_ =  self.get_scm_from_organizations(True)
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where = " WHERE YEAR(s.author_date) = " + str(year)
@@ -133,38 +141,40 @@ class CompaniesActivity(Analyses):
   	    else: where += " AND "
             where += " DATEDIFF(NOW(), s.author_date) < " + active_max_days
         sql = """
-            select org.name, count(distinct(s.committer_id)) as %s
+            select org.name%s, count(distinct(s.committer_id)) as %s
             %s %s
-            group by org.id
+            group by org.id%s
             order by %s desc, org.name
-        """ % (field, from_, where, field)
+        """ % (year_select, field, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_actions(self, year = None):
+    def get_sql_actions(self, year = None, by_year = False):
         where = ""
         field = "actions"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where = " WHERE YEAR(s.author_date) = " + str(year)
             field = field + "_" + str(year)
         sql = """
-            select org.name, count(a.id) as %s
+            select org.name%s, count(a.id) as %s
             %s
               JOIN actions a ON a.commit_id = s.id
             %s
-            group by org.id
+            group by org.id%s
             order by %s desc, org.name
-        """ % (field, from_, where, field)
+        """ % (year_select, field, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_sloc(self, year = None):
+    def get_sql_sloc(self, year = None, by_year = False):
         """ Metric not used. Use lines_added and lines_removed """
         where = ""
         field = "sloc"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         # Remove commits from cvs2svn migration with removed lines issues
         where = "WHERE  message NOT LIKE '%cvs2svn%'"
@@ -173,14 +183,14 @@ class CompaniesActivity(Analyses):
             field = field + "_" + str(year)
 
         sql = """
-            select name, added-removed as %s FROM (
-              select org.name, SUM(removed) as removed, SUM(added) as added
+            select name%s, added-removed as %s FROM (
+              select org.name%s, SUM(removed) as removed, SUM(added) as added
               %s JOIN commits_lines cl ON cl.commit_id = s.id
               %s
-              group by org.id
+              group by org.id%s
             ) t
             order by %s desc, name
-        """ % (field, from_, where, field)
+        """ % (year_group, field, year_select, from_, where, year_group, field)
 
         return (sql)
 
@@ -190,72 +200,76 @@ class CompaniesActivity(Analyses):
         where = "WHERE  message NOT LIKE '%cvs2svn%'"
         return where
 
-    def get_sql_lines_added(self, year = None):
+    def get_sql_lines_added(self, year = None, by_year = False):
         where = self.get_lines_filters()
         field = "lines_added"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where += " AND YEAR(s.author_date) = " + str(year)
             field = field + "_" + str(year)
 
         sql = """
-            select name, added as %s FROM (
-              select org.name, SUM(added) as added
+            select name%s, added as %s FROM (
+              select org.name%s, SUM(added) as added
               %s JOIN commits_lines cl ON cl.commit_id = s.id
               %s
-              group by org.id
+              group by org.id%s
             ) t
             order by %s desc, name
-        """ % (field, from_, where, field)
+        """ % (year_group, field, year_select, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_lines_removed(self, year = None):
+    def get_sql_lines_removed(self, year = None, by_year = False):
         where = self.get_lines_filters()
         field = "lines_removed"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where += " AND YEAR(s.author_date) = " + str(year)
             field = field + "_" + str(year)
 
         sql = """
-            select name, removed as %s FROM (
-              select org.name, SUM(removed) as removed
+            select name%s, removed as %s FROM (
+              select org.name%s, SUM(removed) as removed
               %s JOIN commits_lines cl ON cl.commit_id = s.id
               %s
-              group by org.id
+              group by org.id%s
             ) t
             order by %s desc, name
-        """ % (field, from_, where, field)
+        """ % (year_group, field, year_select, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_lines_total(self, year = None):
+    def get_sql_lines_total(self, year = None, by_year = False):
         where = self.get_lines_filters()
         field = "lines_total"
         from_ =  self.get_scm_from_organizations()
+        year_select, year_group = self._get_year_group("s.author_date", by_year)
 
         if year is not None:
             where += " AND YEAR(s.author_date) = " + str(year)
             field = field + "_" + str(year)
 
         sql = """
-            select name, (added+removed) as %s FROM (
-              select org.name, SUM(removed) as removed, SUM(added) as added
+            select name%s, (added+removed) as %s FROM (
+              select org.name%s, SUM(removed) as removed, SUM(added) as added
               %s JOIN commits_lines cl ON cl.commit_id = s.id
               %s
-              group by org.id
+              group by org.id%s
             ) t
             order by %s desc, name
-        """ % (field, from_, where, field)
+        """ % (year_group, field, year_select, from_, where, year_group, field)
 
         return (sql)
 
-    def get_sql_tickets(self, field = None, year = None):
+    def get_sql_tickets(self, field = None, year = None, by_year = False):
         where = "WHERE"
         from_ =  self.get_its_from_organizations()
+        year_select, year_group = self._get_year_group("i.submitted_on", by_year)
         if field == "opened":
             if year is None: where = ""
         elif field == "closed":
@@ -269,70 +283,74 @@ class CompaniesActivity(Analyses):
             where += " YEAR(i.submitted_on) = " + str(year)
             field = field + "_" + str(year)
         sql = """
-            select org.name, count(distinct(i.id)) as %s
+            select org.name%s, count(distinct(i.id)) as %s
             %s %s
-            group by org.id
+            group by org.id%s
             order by %s desc, org.name
-        """ % (field, from_, where, field)
+        """ % (year_select, field, from_, where, year_group, field)
         return (sql)
 
-    def get_sql_opened(self, year = None):
-        return self.get_sql_tickets("opened", year)
+    def get_sql_opened(self, year = None, by_year = False):
+        return self.get_sql_tickets("opened", year, by_year)
 
-    def get_sql_closed(self, year = None):
-        return self.get_sql_tickets("closed", year)
+    def get_sql_closed(self, year = None, by_year = False):
+        return self.get_sql_tickets("closed", year, by_year)
 
-    def get_sql_pending(self, year = None):
-        return self.get_sql_tickets("pending", year)
+    def get_sql_pending(self, year = None, by_year = False):
+        return self.get_sql_tickets("pending", year, by_year)
 
-    def get_sql_sent(self, year = None):
+    def get_sql_sent(self, year = None, by_year = False):
         where = ""
         field = "sent"
         from_ =  self.get_mls_from_organizations()
+        year_select, year_group = self._get_year_group("m.first_date", by_year)
 
         if year is not None:
             where = " WHERE YEAR(m.first_date) = " + str(year)
             field = field + "_" + str(year)
 
         sql = """
-            select org.name, count(distinct(m.message_ID)) as %s
+            select org.name%s, count(distinct(m.message_ID)) as %s
             %s %s
-            group by org.id
+            group by org.id%s
             order by %s desc, org.name
-        """ % (field, from_, where, field)
+        """ % (year_select, field, from_, where, year_group, field)
         return (sql)
 
     def create_report(self, data_source, destdir):
         if data_source != SCM: return
         self.result(data_source, destdir)
 
+    def _add_organizations(self, activity, names):
+        """ Add the organizations in names not in activity, with zero values """
+        known = set(activity['name'])
+        for item in names:
+            if item not in known:
+                known.add(item)
+                activity['name'].append(item)
+                for metric in activity:
+                    if metric == "name": continue
+                    activity[metric].append(0)
+
     def add_organizations_data (self, activity, data):
         """ Add organizations data in an already existing complete organizations activity dictionary """
-        new_activity = []
         field = None
 
+        self.check_array_values(data)
         # Check all data names are already in activity. If not add it with zero value.
-        for item in data['name']:
-            if item not in activity['name']:
-                activity['name'].append(item)
-                for metric in activity:
-                    if metric == "name": continue
-                    activity[metric].append(0)
+        self._add_organizations(activity, data['name'])
 
         # Find the name of the field to be uses to get values
         for key in data.keys():
             if key != "name":
                 field = key
                 break
-        for company in activity['name']:
-            if company in data['name']:
-                index = data['name'].index(company)
-                value = data[field][index]
-                new_activity.append(value)
-            else:
-                new_activity.append(0)
+        # First value of each company, as results are sorted by value
+        values = {}
+        for i in range(0, len(data['name'])):
+            values.setdefault(data['name'][i], data[field][i])
 
-        activity[field] = new_activity
+        activity[field] = [values.get(company, 0) for company in activity['name']]
         return activity
 
     def check_array_values(self, data):
@@ -340,40 +358,42 @@ class CompaniesActivity(Analyses):
             if not isinstance(data[item], list): data[item] = [data[item]]
 
     def add_metric_years(self, metric, activity, start, end):
-        metrics = ['commits','authors','committers','actions','sloc',
-                   'lines-total','lines-added','lines-removed','opened','closed','sent']
+        """ Add metric_YYYY for each year from start to end with one query """
+        metrics = {'commits': self.get_sql_commits,
+                   'authors': self.get_sql_authors,
+                   'committers': self.get_sql_committers,
+                   'actions': self.get_sql_actions,
+                   'sloc': self.get_sql_sloc,
+                   'lines-total': self.get_sql_lines_total,
+                   'lines-added': self.get_sql_lines_added,
+                   'lines-removed': self.get_sql_lines_removed,
+                   'opened': self.get_sql_opened,
+                   'closed': self.get_sql_closed,
+                   'sent': self.get_sql_sent}
         if metric not in metrics:
             logging.error(metric + " not supported in organizations activity.")
             return
-        for i in range(start, end+1):
-            if metric == "commits":
-                data = self.db.ExecuteQuery(self.get_sql_commits(i))
-            elif metric == "authors":
-                data = self.db.ExecuteQuery(self.get_sql_authors(i))
-            elif metric == "committers":
-                data = self.db.ExecuteQuery(self.get_sql_committers(i))
-            elif metric == "actions":
-                data = self.db.ExecuteQuery(self.get_sql_actions(i))
-            elif metric == "sloc":
-                data = self.db.ExecuteQuery(self.get_sql_sloc(i))
-            elif metric == "lines-added":
-                data = self.db.ExecuteQuery(self.get_sql_lines_added(i))
-                data = self._convert_dict_field(data, "lines_added","lines-added")
-            elif metric == "lines-removed":
-                data = self.db.ExecuteQuery(self.get_sql_lines_removed(i))
-                data = self._convert_dict_field(data, "lines_removed","lines-removed")
-            elif metric == "lines-total":
-                data = self.db.ExecuteQuery(self.get_sql_lines_total(i))
-                data = self._convert_dict_field(data, "lines_total","lines-total")
-            elif metric == "opened":
-                data = self.db.ExecuteQuery(self.get_sql_opened(i))
-            elif metric == "closed":
-                data = self.db.ExecuteQuery(self.get_sql_closed(i))
-            elif metric == "sent":
-                data = self.db.ExecuteQuery(self.get_sql_sent(i))
-            self.check_array_values(data)
-            activity = self.add_organizations_data (activity, data)
-
+        data = self.db.ExecuteQuery(metrics[metric](by_year = True))
+        self.check_array_values(data)
+        field = metric.replace("-", "_")
+
+        # Pivot (organization, year) rows to a metric_YYYY list per year
+        years = {}
+        for year in range(start, end+1): years[year] = []
+        for i in range(0, len(data['name'])):
+            if data['year'][i] in years:
+                years[data['year'][i]].append((data['name'][i], data[field][i]))
+        for year in range(start, end+1):
+            self._add_organizations(activity, [company for (company, value) in years[year]])
+        positions = {}
+        for i in range(0, len(activity['name'])):
+            positions[activity['name'][i]] = i
+        for year in range(start, end+1):
+            values = [0] * len(activity['name'])
+            # First value of each company, as results are sorted by value
+            for (company, value) in reversed(years[year]):
+                values[positions[company]] = value
+            activity[metric + "_" + str(year)] = values
 
     def _convert_dict_field(self, dict, str_old, str_new):
         """ Change field dict names replacing str_old with str_new in the field names"""
@@ -28,9 +28,14 @@
 #    Santiago Dueñas <sduenas@bitergia.com>
 #
 
+import numpy
+
+from sets import Set
+
 from vizgrimoire.analysis.analyses import Analyses
 
-from vizgrimoire.GrimoireUtils import completePeriodIds
+from vizgrimoire.GrimoireUtils import completePeriodIds, check_array_values
+from vizgrimoire.metrics.metrics_filter import MetricFilters
 
 
 class TicketsStates(Analyses):
@@ -39,16 +44,33 @@ class TicketsStates(Analyses):
     id = "tickets_states"
     name = "Tickets states"
     desc = "Analysis of issues states"
+    filters_all_items = ["repository", "company"] # backlog for all items at once
 
-    def __get_sql_issues_states__(self, backend_type):
-        """Returns the log of states"""
+    def __get_sql_issues_states__(self, backend_type, all_items = None):
+        """Returns the log of states, with the item of each issue if all_items"""
 
         if backend_type == "lp": backend_type = "launchpad" # openstack
 
-        q = """SELECT issue_id, status, UNIX_TIMESTAMP(date) udate
-               FROM issues_log_%s
-               WHERE date >= %s AND date < %s
-               ORDER BY udate""" % (backend_type, self.filters.startdate, self.filters.enddate)
+        fields = "log.issue_id, log.status, UNIX_TIMESTAMP(log.date) udate"
+        tables = "issues_log_%s log" % (backend_type)
+        filters = ""
+        if all_items is not None:
+            # Group field for all items (repository, company ...) of the issue
+            mfilters = MetricFilters(self.filters.period, self.filters.startdate,
+                                     self.filters.enddate, [all_items, None])
+            fields = self.db.get_group_field(all_items) + " AS item, " + fields
+            tables_set = Set(["issues i"])
+            tables_set.union_update(self.db.GetSQLReportFrom(mfilters))
+            tables += ", " + self.db._get_tables_query(tables_set)
+            filters_set = self.db.GetSQLReportWhere(mfilters, "issues")
+            filters_set.add("log.issue_id = i.id")
+            filters = " AND " + self.db._get_filters_query(filters_set)
+
+        q = """SELECT %s
+               FROM %s
+               WHERE log.date >= %s AND log.date < %s %s
+               ORDER BY udate""" % (fields, tables, self.filters.startdate,
+                                    self.filters.enddate, filters)
         return q
 
     def __get_sql_current__(self, state, evolutionary):
@@ -72,79 +94,85 @@ class TicketsStates(Analyses):
                FROM issues_log_%s""" % backend_type
         return q
 
-    def get_backlog(self, states, backend_type):
+    def get_backlog(self, states, backend_type, all_items = None):
+        """Number of tickets in each state at the end of each period
+
+        The state of each ticket is the last one in the issues log. Sorting
+        the log by ticket and date, each change of state is a -1 for the old
+        state and a +1 for the new one in the period it happens. The backlog
+        is the cumulative sum of these deltas. If all_items (repository,
+        company ...) is given, the backlog for all items is computed at once.
+        """
         import datetime
         import time
 
-        def update_backlog_count(current_count, backlog_count):
-            for state, count in current_count.items():
-                backlog_count[state].append(count)
-
         # Dict to store the results
-        data = {self.filters.period : [self.filters.startdate, self.filters.enddate]}
+        data = {self.filters.period : []}
         data = completePeriodIds(data, self.filters.period,
                                  self.filters.startdate, self.filters.enddate)
 
-        tickets_states = {}
-        current_status = {}
-
-        # Initialize structures
-        for state in states:
-            current_status[state] = 0
-            data[state] = []
-
         # Request issues log
-        query = self.__get_sql_issues_states__(backend_type)
-        issues_log = self.db.ExecuteQuery(query)
-
-        periods = list(data['unixtime'][1:])
+        query = self.__get_sql_issues_states__(backend_type, all_items)
+        issues_log = check_array_values(self.db.ExecuteQuery(query))
 
-        # Add a one period more to avoid problems with
-        # data from this period
+        # End of each period. Add a one period more to avoid problems
+        # with data from this period
         last_date = int(time.mktime(datetime.datetime.strptime(
                         self.filters.enddate, "'%Y-%m-%d'").timetuple()))
-        periods.append(last_date)
-
-        end_period = int(periods.pop(0))
-
-        for i in range(len(issues_log['issue_id'])):
-            issue_id = issues_log['issue_id'][i]
-            issue_state = issues_log['status'][i]
-            issue_date = int(issues_log['udate'][i])
-
-            # Fill periods without changes on issues states
-            while issue_date >= end_period:
-                end_period = int(periods.pop(0))
-                update_backlog_count(current_status, data)
-
-            if issue_id not in tickets_states:
-                # Add ticket to the status dict
-                tickets_states[issue_id] = issue_state
-            elif tickets_states[issue_id] != issue_state:
-                # Decrease the count of tickets with the old state
-                # only for predefined states
-                old_state = tickets_states[issue_id]
-                if old_state in states:
-                    current_status[old_state] -= 1
-
-                # Set new status
-                tickets_states[issue_id] = issue_state
-            else:
-                continue # Ignore equal states
-
-            # Increase the count of tickets with issue_state
-            # only for predefined states
-            if issue_state in states:
-                current_status[issue_state] += 1
-
-        # End of the loop. Add the last period values to the backlog count
-        update_backlog_count(current_status, data)
-
-        # Fill remaining periods without changes on issues states
-        while periods:
-            periods.pop(0)
+        periods = [int(unixtime) for unixtime in data['unixtime'][1:]]
+        periods = numpy.array(periods + [last_date], dtype=numpy.int64)
+        nperiods = len(periods)
+
+        # Tickets, states and items as indexes
+        states_pos = dict([(state, i) for i, state in enumerate(states)])
+        issues = numpy.array(issues_log.get('issue_id', []))
+        udates = numpy.array([int(udate) for udate in issues_log.get('udate', [])],
+                             dtype=numpy.int64)
+        # Not predefined states are not counted
+        codes = numpy.array([states_pos.get(status, -1) for status in issues_log.get('status', [])],
+                            dtype=numpy.int64)
+        items_list = []
+        items = numpy.zeros(len(issues), dtype=numpy.int64)
+        if all_items is not None:
+            items_pos = {}
+            for i, item in enumerate(issues_log.get('item', [])):
+                if item not in items_pos:
+                    items_pos[item] = len(items_list)
+                    items_list.append(item)
+                items[i] = items_pos[item]
+        nitems = max(len(items_list), 1)
+
+        # Sort by item, ticket and date, keeping the log order for equal dates.
+        # A ticket could be in the log of several items (i.e. companies).
+        order = numpy.lexsort((numpy.arange(len(issues)), udates, issues, items))
+        issues, udates, codes, items = issues[order], udates[order], codes[order], items[order]
+
+        # The old state is the previous one in the log of the same item and ticket
+        first = numpy.ones(len(issues), dtype=bool)
+        first[1:] = (issues[1:] != issues[:-1]) | (items[1:] != items[:-1])
+        old_codes = numpy.roll(codes, 1)
+
+        # Period in which each change is counted
+        changes_period = numpy.searchsorted(periods, udates, side='right')
+
+        cells = nitems * len(states) * (nperiods + 1)
+        cell = lambda item, code: (item * len(states) + code) * (nperiods + 1) + changes_period
+        new_state = codes >= 0
+        old_state = (~first) & (old_codes >= 0)
+        deltas = numpy.bincount(cell(items, codes)[new_state], minlength = cells)
+        deltas -= numpy.bincount(cell(items, old_codes)[old_state], minlength = cells)
+        backlog = numpy.cumsum(deltas.reshape(nitems, len(states), nperiods + 1), axis=2)
+        backlog = backlog[:, :, 0:nperiods]
+
+        if all_items is None:
             for state in states:
-                data[state].append(data[state][-1])
+                data[state] = backlog[0][states_pos[state]].tolist()
+        else:
+            id_field = self.db.get_group_field_alias(all_items)
+            data[id_field] = items_list
+            for state in states:
+                data[state] = [backlog[item][states_pos[state]].tolist()
+                               for item in range(0, len(items_list))]
 
         return data
 
@@ -172,25 +200,44 @@ class TicketsStates(Analyses):
         if data_source is not None and data_source != ITS: return {}
         return self.result()
 
-    def result(self, data_source = None):
+    def _get_backend_type(self):
         # FIXME: this import is needed to get the list of
         # states available on the tracker. This should be moved
         # to configuration file to let the user choose among states.
         from vizgrimoire.ITS import ITS
-        if data_source is not None and data_source != ITS: return None
         backend = ITS._get_backend()
 
         if backend.its_type == 'bg':
             backend_type = 'bugzilla'
         else:
             backend_type = backend.its_type
+        return backend_type
+
+    def get_ts_all_items(self):
+        """Backlog of all the items of the filter in self.filters, at once"""
+        backend_type = self._get_backend_type()
+        states = self.get_state_types(backend_type)
+        all_items = self.filters.type_analysis[0]
+        backlog = self.get_backlog(states, backend_type, all_items)
+        id_field = self.db.get_group_field_alias(all_items)
+        items = backlog.pop(id_field)
+        data = self._prepare_data(backlog)
+        data[id_field] = items
+        return data
+
+    def result(self, data_source = None):
+        from vizgrimoire.ITS import ITS
+        if data_source is not None and data_source != ITS: return None
+        backend_type = self._get_backend_type()
 
         states = self.get_state_types(backend_type)
 
         backlog = self.get_backlog(states, backend_type)
         current_states = self.get_current_states(states)
         data = dict(backlog.items() + current_states.items())
+        return self._prepare_data(data)
 
+    def _prepare_data(self, data):
         prep_data = {}
 
         # Capitalize first letter to avoid collision with other metrics
@@ -55,33 +55,36 @@ class OnionTransitions(Analyses):
             data = self.result(data_source)
         return data
 
-    def _get_person_info(self, upeople_id, from_date, to_date, data_source = None):
-        # gets the person info in two queries, first it obtains the name and later
-        # the number of ocurrences if any. If not, it sets ocurrences = 0
-        person_data = {}
+    IN_LIST_SIZE = 1000 # max number of people in each IN list
+
+    def _get_in_lists(self, people, quote = True):
+        """ SQL IN lists with all people, IN_LIST_SIZE in each one """
+        people = sorted(people)
+        if quote: people = ["'" + str(person) + "'" for person in people]
+        else: people = [str(person) for person in people]
+        return ["(" + ",".join(people[i:i+self.IN_LIST_SIZE]) + ")"
+                for i in range(0, len(people), self.IN_LIST_SIZE)]
+
+    def _execute_in_lists(self, sql, people, quote = True):
+        """ Results of sql for all people, with %s replaced by each IN list """
+        result = {}
+        for in_list in self._get_in_lists(people, quote):
+            aux = self.db.ExecuteQuery(sql % (in_list))
+            for field in aux:
+                if not isinstance(aux[field], list): aux[field] = [aux[field]]
+                result.setdefault(field, []).extend(aux[field])
+        return result
+
+    def _get_people_info(self, people, from_date, to_date, data_source = None):
+        # gets the info of all people in two queries, first it obtains the names
+        # and later the number of ocurrences if any. If not, it sets ocurrences = 0
+        people_data = {}
         if (data_source.get_name() == "scm"):
             logging.info("Warning: current queries are counting merges")
-            # q = " select pup.uuid as uid, p.name, p.email, "+\
-            #     "        (count(distinct(s.id))) as commits "+\
-            #     " from scmlog s, "+\
-            #     "      actions a, "+\
-            #     "      people_uidentities pup, "+\
-            #     "      people p "+\
-            #     " where s.id = a.commit_id and "+\
-            #     "       s.date>="+ from_date+" and "+\
-            #     "       s.date<="+ to_date+" and "+\
-            #     "       s.author_id = pup.people_id and "+\
-            #     "       s.author_id = p.id and "+\
-            #     "       p.email <> '%gerrit@%' and "+\
-            #     "       p.email <> '%jenkins@%' and "+\
-            #     "       pup.uuid = " + str(upeople_id) +\
-            #     " group by pup.uuid "+\
-            #     " order by commits desc; "
             q0 = "select uuid, name, email from people, people_uidentities pup "+\
-                "where people.id = pup.people_id and pup.uuid = '" + str(upeople_id) + "' "+\
-                " LIMIT 1"
-            
-            q1 = " select pup.uuid as uid, p.name, p.email, "+\
+                "where people.id = pup.people_id and pup.uuid IN %s"
+
+            q1 = " select pup.uuid as uid, "+\
                 "        (count(distinct(s.id))) as commits "+\
                 " from scmlog s, "+\
                 "      people_uidentities pup, "+\
@@ -90,50 +93,53 @@ class OnionTransitions(Analyses):
                 "       s.author_date<"+ to_date+" and "+\
                 "       s.author_id = pup.people_id and "+\
                 "       s.author_id = p.id and "+\
-                "       p.email <> '%gerrit@%' and "+\
-                "       p.email <> '%jenkins@%' and "+\
-                "       pup.uuid = '" + str(upeople_id) + "' " +\
-                " group by pup.uuid "+\
-                " order by commits desc; "
-
-            aux = self.db.ExecuteQuery(q0)
-            person_data["name"] = aux["name"]
-            person_data["email"] = aux["email"]
-            person_data["uuid"] = aux["uuid"]
-            aux = self.db.ExecuteQuery(q1)
-            if (type(aux["commits"]) == list):
-                person_data["commits"] = 0
-            else:
-                person_data["commits"] = aux["commits"]
+                "       p.email <> '%%gerrit@%%' and "+\
+                "       p.email <> '%%jenkins@%%' and "+\
+                "       pup.uuid IN %s " +\
+                " group by pup.uuid "
+
+            for person in people:
+                people_data[person] = {"name": [], "email": [], "uuid": [], "commits": 0}
+            aux = self._execute_in_lists(q0, people)
+            for i in range(len(aux.get("uuid", [])) - 1, -1, -1):
+                # first identity of each person
+                person_data = people_data[aux["uuid"][i]]
+                person_data["name"] = aux["name"][i]
+                person_data["email"] = aux["email"][i]
+                person_data["uuid"] = aux["uuid"][i]
+            aux = self._execute_in_lists(q1, people)
+            for i in range(0, len(aux.get("uid", []))):
+                people_data[aux["uid"][i]]["commits"] = aux["commits"][i]
 
         elif (data_source.get_name() == "qaforums"):
             logging.info("Warning: qaforums is not using matched identities")
-            q0 = "SELECT username as name from people where identifier = " + str(upeople_id)+ " "+\
-                " LIMIT 1"
-            
-            q1 = "SELECT identifier, username as name, COUNT(*) as messages from ("+\
-                "(select p.identifier as identifier, p.username, q.added_at as date"+\
+            q0 = "SELECT identifier, username as name from people where identifier IN %s"
+
+            q1 = "SELECT identifier, COUNT(*) as messages from ("+\
+                "(select p.identifier as identifier, q.added_at as date"+\
                 "  from questions q, people p"+\
                 "  where q.author_identifier=p.identifier)"+\
                 "union"+\
-                "(select p.identifier as identifier, p.username, a.submitted_on as date"+\
+                "(select p.identifier as identifier, a.submitted_on as date"+\
                 "  from answers a, people p"+\
                 "  where a.user_identifier=p.identifier)"+\
                 "union"+\
-                "(select p.identifier as identifier, p.username, c.submitted_on as date"+\
+                "(select p.identifier as identifier, c.submitted_on as date"+\
                 "  from comments c, people p"+\
                 "  where c.user_identifier=p.identifier)) t "+\
                 "WHERE date>="+ from_date +" AND date<" + to_date +" "+\
-                " AND identifier = "+ str(upeople_id) + " "+\
+                " AND identifier IN %s "+\
                 "group by identifier"
-            aux = self.db.ExecuteQuery(q0)
-            person_data["name"] = aux["name"]
-            aux = self.db.ExecuteQuery(q1)
-            if (type(aux["messages"]) == list):
-                person_data["messages"] = 0
-            else:
-                person_data["messages"] = aux["messages"]
-        return(person_data)
+
+            for person in people:
+                people_data[person] = {"name": [], "messages": 0}
+            aux = self._execute_in_lists(q0, people, False)
+            for i in range(len(aux.get("identifier", [])) - 1, -1, -1):
+                people_data[aux["identifier"][i]]["name"] = aux["name"][i]
+            aux = self._execute_in_lists(q1, people, False)
+            for i in range(0, len(aux.get("identifier", []))):
+                people_data[aux["identifier"][i]]["messages"] = aux["messages"][i]
+        return(people_data)
 
     def result(self, data_source = None, offset_days = None):
         if data_source.get_name() != "scm" \
@@ -163,14 +169,14 @@ class OnionTransitions(Analyses):
             new_startdate = dt_start - timedelta
             past_from_date = "'" + new_startdate.strftime("%Y-%m-%d") + "'"
         
-        # getting the data
+        # getting the data of both periods
         #print("current %s - %s" % (cur_from_date, cur_to_date))
-        current_groups = self._activity_groups(cur_from_date, cur_to_date, data_source)
-        cur_core = current_groups["core"]        
+        #print("past %s - %s" % (past_from_date, past_to_date))
+        current_groups, past_groups = self._activity_groups_periods(
+            [(cur_from_date, cur_to_date), (past_from_date, past_to_date)], data_source)
+        cur_core = current_groups["core"]
         cur_regular = current_groups["regular"]
         cur_occasional = current_groups["occasional"]
-        #print("past %s - %s" % (past_from_date, past_to_date))
-        past_groups = self._activity_groups(past_from_date, past_to_date, data_source)
         past_core = past_groups["core"]
         past_regular = past_groups["regular"]
         past_occasional = past_groups["occasional"]
@@ -187,6 +193,12 @@ class OnionTransitions(Analyses):
         groups = {"core":cur_core, "up_core":up_core, "up_reg":up_reg,
                   "down_reg":down_reg, "down_occ":down_occ}
 
+        # and .. we get the data of all people at once
+        all_people = set()
+        for g in groups: all_people |= groups[g]
+        people_data = self._get_people_info(all_people, self.filters.startdate,
+                                            self.filters.enddate, data_source)
+
         result = {}
         for g in groups:
             #here we define what we export in each group
@@ -195,82 +207,43 @@ class OnionTransitions(Analyses):
             elif (data_source.get_name() == "qaforums"):
                 result[g] = {"name":[],"messages":[]}
 
-            # and .. we get the data
             for person in groups[g]:
-                user_data = self._get_person_info(person, self.filters.startdate, self.filters.enddate, data_source)
+                user_data = people_data[person]
                 result[g]["name"].append(user_data["name"])
                 if (data_source.get_name() == "scm"):
                     result[g]["uuid"].append(user_data["uuid"])
                     result[g]["email"].append(user_data["email"])
                     result[g]["commits"].append(user_data["commits"])
                 elif (data_source.get_name() == "qaforums"):
-                    #print(user_data)
                     result[g]["messages"].append(user_data["messages"])
-                #print user_data
-                #print " --> "+ str(person)
-                #result[g]["uid"].append(user_data["uid"])
-        
-        # print("core VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV")
-        # c_set = []
-        # a_set = []
-        # for c in cur_core:
-        #      aux = self._get_person_info(c, cur_from_date, cur_to_date, data_source)
-        #      c_set.append(aux["commits"])
-        # c_set.sort()
-        # print c_set
-        # print("regular ***********************************************")
-        # for a in cur_regular:
-        #      aux2 = self._get_person_info(a, cur_from_date, cur_to_date, data_source)
-        #      a_set.append(aux2["commits"])
-        # a_set.sort()
-        # print a_set
-
-        # print("core 22222222222222 VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV")
-        # c_set = []
-        # a_set = []
-        # for c in cur_core:
-        #      aux = self._get_person_info(c, self.filters.startdate, self.filters.enddate, data_source)
-        #      c_set.append(aux["commits"])
-        # c_set.sort()
-        # print c_set
-        # print("regular 2222222222222 ***********************************************")
-        # for a in cur_regular:
-        #      aux2 = self._get_person_info(a, self.filters.startdate, self.filters.enddate, data_source)
-        #      a_set.append(aux2["commits"])
-        # a_set.sort()
-        # print a_set
-        
 
         return (result)
 
-        # print("PAST core VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV")
-        # c_set = []
-        # a_set = []
-        # for c in past_core:
-        #     aux = self.get_person_info(c, new_startdate, self.filters.startdate, data_source)
-        #     c_set.append(aux["commits"])
-        # c_set.sort()
-        # print c_set
-        # print("PAST regular ***********************************************")
-        # for a in past_regular:
-        #     aux2 = self.get_person_info(a, new_startdate, self.filters.startdate, data_source)
-        #     a_set.append(aux2["commits"])
-        # a_set.sort()
-        # print a_set
-
-    def _get_total_messages_query(self, from_date, to_date):
-        q = "SELECT "+\
-        "(select COUNT(*) from questions WHERE "+\
-        " added_at>="+ from_date +" AND added_at<" + to_date + ") + "+\
-        "(select COUNT(*) from comments WHERE "+\
-        " submitted_on>="+ from_date +" AND submitted_on<" + to_date + ") + "+\
-        "(SELECT COUNT(*) FROM answers WHERE "+\
-        " submitted_on>="+ from_date +" AND submitted_on<" + to_date + ")"+\
-        "as total;"
+    def _get_period_condition(self, field, period):
+        from_date, to_date = period
+        return "("+ field + ">=" + from_date + " AND " + field + "<" + to_date + ")"
+
+    def _get_periods_condition(self, field, periods):
+        return "(" + " OR ".join([self._get_period_condition(field, period)
+                                  for period in periods]) + ")"
+
+    def _get_total_messages_query(self, periods):
+        totals = []
+        for i in range(0, len(periods)):
+            totals.append("(select COUNT(*) from questions WHERE "+\
+            self._get_period_condition("added_at", periods[i]) + ") + "+\
+            "(select COUNT(*) from comments WHERE "+\
+            self._get_period_condition("submitted_on", periods[i]) + ") + "+\
+            "(SELECT COUNT(*) FROM answers WHERE "+\
+            self._get_period_condition("submitted_on", periods[i]) + ")"+\
+            " as total_" + str(i))
+        q = "SELECT " + ", ".join(totals) + ";"
         return(q)
         
-    def _get_personal_messages_query(self, from_date, to_date):
-        q = "SELECT identifier, COUNT(*) as messages from ("+\
+    def _get_personal_messages_query(self, periods):
+        messages = ["SUM(" + self._get_period_condition("date", periods[i]) + ")"+\
+                    " as messages_" + str(i) for i in range(0, len(periods))]
+        q = "SELECT identifier, " + ", ".join(messages) + " from ("+\
         "(select p.identifier as identifier, q.added_at as date"+\
         "  from questions q, people p"+\
         "  where q.author_identifier=p.identifier)"+\
@@ -282,98 +255,81 @@ class OnionTransitions(Analyses):
         "(select p.identifier as identifier, c.submitted_on as date"+\
         "  from comments c, people p"+\
         "  where c.user_identifier=p.identifier)) t "+\
-        "WHERE date>="+ from_date +" AND date<" + to_date +" "+\
-        "group by identifier order by messages desc"
+        "WHERE " + self._get_periods_condition("date", periods) + " "+\
+        "group by identifier"
         return(q)
     
-    def _get_total_commits_query(self, from_date, to_date):
+    def _get_total_commits_query(self, periods):
         logging.info("Warning: current queries are counting merges")
-        # uncomment this query in order to remove the queries
-        # q = "select count(distinct(s.id)) as total "+\
-        #      "from scmlog s, people p, actions a "+\
-        #      "where s.author_id = p.id and "+\
-        #      "      p.email <> '%gerrit@%' and "+\
-        #      "      p.email <> '%jenkins@%' and "+\
-        #      "      s.id = a.commit_id and "+\
-        #      "      s.date>="+ from_date +" and "+\
-        #      "      s.date<="+ to_date+";"
-        q = "select count(distinct(s.id)) as total "+\
+        totals = ["count(distinct(case when " +\
+                  self._get_period_condition("s.author_date", periods[i]) +\
+                  " then s.id end)) as total_" + str(i) for i in range(0, len(periods))]
+        q = "select " + ", ".join(totals) + " "+\
              "from scmlog s, people p "+\
              "where s.author_id = p.id and "+\
              "      p.email <> '%gerrit@%' and "+\
              "      p.email <> '%jenkins@%' and "+\
-             "      s.author_date>="+ from_date +" and "+\
-             "      s.author_date<"+ to_date+";"
+             "      " + self._get_periods_condition("s.author_date", periods) + ";"
         return(q)
 
-    def _get_personal_commits_query(self, from_date, to_date):
+    def _get_personal_commits_query(self, periods):
         logging.info("Warning: current queries are counting merges")
-        # uncomment this query in order to remove the queries
-        # q = " select pup.uuid as uid, p.name, p.email, "+\
-        #     "        (count(distinct(s.id))) as commits "+\
-        #     " from scmlog s, "+\
-        #     "      actions a, "+\
-        #     "      people_uidentities pup, "+\
-        #     "      people p "+\
-        #     " where s.id = a.commit_id and "+\
-        #     "       s.date>="+ from_date+" and "+\
-        #     "       s.date<="+ to_date+" and "+\
-        #     "       s.author_id = pup.people_id and "+\
-        #     "       s.author_id = p.id and "+\
-        #     "       p.email <> '%gerrit@%' and "+\
-        #     "       p.email <> '%jenkins@%' "+\
-        #     " group by pup.uuid "+\
-        #     " order by commits desc; "
-        # Database access: developer, %commits
-        q = " select pup.uuid as uid, p.name, p.email, "+\
-            "        (count(distinct(s.id))) as commits "+\
+        # Database access: developer, commits in each period
+        commits = ["count(distinct(case when " +\
+                   self._get_period_condition("s.author_date", periods[i]) +\
+                   " then s.id end)) as commits_" + str(i) for i in range(0, len(periods))]
+        q = " select pup.uuid as uid, " + ", ".join(commits) +\
             " from scmlog s, "+\
             "      people_uidentities pup, "+\
             "      people p "+\
-            " where s.author_date>="+ from_date+" and "+\
-            "       s.author_date<"+ to_date+" and "+\
+            " where " + self._get_periods_condition("s.author_date", periods) + " and "+\
             "       s.author_id = pup.people_id and "+\
             "       s.author_id = p.id and "+\
             "       p.email <> '%gerrit@%' and "+\
             "       p.email <> '%jenkins@%' "+\
-            " group by pup.uuid "+\
-            " order by commits desc; "
+            " group by pup.uuid "
         return(q)
 
     def _activity_groups(self, from_date, to_date, data_source = None):
         if data_source.get_name() != "scm" and \
           data_source.get_name() != "qaforums": return None
+        return self._activity_groups_periods([(from_date, to_date)], data_source)[0]
 
-        groups = {}
+    def _activity_groups_periods(self, periods, data_source = None):
+        """ Groups of people in each (from_date, to_date) period, using one
+            query for the totals and one for the people activity """
+        if data_source.get_name() != "scm" and \
+          data_source.get_name() != "qaforums": return None
 
-        # Init of structure to be returned
-        community = {}
-        community['core'] = None
-        community['regular'] = None
-        community['occasional'] = None
-
-        if data_source.get_name() == "scm":        
-            q = self._get_total_commits_query(from_date, to_date)
-            total = self.db.ExecuteQuery(q)
-            total_commits = float(total['total'])
-            q = self._get_personal_commits_query(from_date, to_date)
-            people = self.db.ExecuteQuery(q)
-            if not isinstance(people['commits'], list):
-                people['commits'] = [people['commits']]
-            # this is a list. Operate over the list
-            people['commits'] = [((commits / total_commits) * 100) for commits in people['commits']]
+        if data_source.get_name() == "scm":
+            field = 'commits'
+            ident = 'uid'
+            total = self.db.ExecuteQuery(self._get_total_commits_query(periods))
+            people = self.db.ExecuteQuery(self._get_personal_commits_query(periods))
         elif data_source.get_name() == "qaforums":
-            q = self._get_total_messages_query(from_date, to_date)
-            total = self.db.ExecuteQuery(q)
-            total_messages = float(total['total'])
-            q = self._get_personal_messages_query(from_date, to_date)
-            people = self.db.ExecuteQuery(q)
-            if not isinstance(people['messages'], list):
-                people['messages'] = [people['messages']]
+            field = 'messages'
+            ident = 'identifier'
+            total = self.db.ExecuteQuery(self._get_total_messages_query(periods))
+            people = self.db.ExecuteQuery(self._get_personal_messages_query(periods))
+        for key in people:
+            if not isinstance(people[key], list): people[key] = [people[key]]
+
+        groups_periods = []
+        for i in range(0, len(periods)):
+            # people with activity in the period, more active first
+            activity = [(people[field + "_" + str(i)][j], people[ident][j])
+                        for j in range(0, len(people[ident]))
+                        if people[field + "_" + str(i)][j] > 0]
+            activity.sort(key = lambda item: item[0], reverse = True)
+            total_activity = float(total['total_' + str(i)])
             # this is a list. Operate over the list
-            people['messages'] = [((messages / total_messages) * 100) for messages in people['messages']]
+            values = [((float(value) / total_activity) * 100) for (value, person) in activity]
+            groups_periods.append(self._get_groups(values, [person for (value, person) in activity]))
+        return groups_periods
 
-        #print(people)
+    def _get_groups(self, values, people):
+        """ Core, regular and occasional groups of people sorted by activity """
+        groups = {}
 
         # Calculating number of core, regular and occasional developers
         cont = 0
@@ -388,19 +344,10 @@ class OnionTransitions(Analyses):
         occ_group = set()
         array_cont = 0        
 
-        # field used to browse people dict()
-        if data_source.get_name() == "scm":
-            field = 'commits'
-            ident = 'uid'
-        elif data_source.get_name() == "qaforums":
-            field = 'messages'
-            ident = 'identifier'
-        
-        #for p in people:
-        for value in people[field]:
+        for value in values:
             cont = cont + value
             ndevs = ndevs + 1
-            dev_email = people[ident][array_cont]
+            dev_email = people[array_cont]
 
             if (core_f):
                 core_group.add(dev_email)
@@ -418,20 +365,6 @@ class OnionTransitions(Analyses):
 
             array_cont += 1
 
-        noccasional = ndevs - nregular
-        nregular = nregular - ncore
-
-        # print("core_group len = %s" % len(core_group))
-        # print("reg_group len = %s" % len(reg_group))
-        # print("occ_group len = %s" % len(occ_group))
-
-        # inserting values in variable
-        community['core'] = ncore
-        community['regular'] = nregular
-        community['occasional'] = noccasional
-
-        #print(community)
-
         groups["core"]= core_group
         groups["regular"]=reg_group
         groups["occasional"]=occ_group
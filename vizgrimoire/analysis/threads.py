@@ -22,6 +22,8 @@
 
 # Mailing lists main topics study
 
+import heapq
+
 import vizgrimoire.GrimoireUtils
 import vizgrimoire.GrimoireSQL
 from vizgrimoire.GrimoireSQL import ExecuteQuery
@@ -90,8 +92,12 @@ class Threads(object):
         self.i_db = i_db # identities database
         self.list_message_id = [] # list of messages id
         self.list_is_response_of = [] #list of 'father' messages
+        self.children = {} # 'father' message_id -> list of sons message_id
         self.threads = {} # General structure, keys = root message_id,
                           # values = list of messages in that thread
+        self.lengths = {} # root message_id -> number of messages
+        self.participants = None # root message_id -> number of people
+        self.verbosity = None # root message_id -> length of all bodies
         self.crowded = None # the thread with most people participating
         self.longest = None # the thread with the longest queue of emails
         self.verbose = None # the thread with the most verbose emails.
@@ -99,25 +105,19 @@ class Threads(object):
         self._init_threads()
 
     def _build_threads (self, message_id):
-        # Constructor of threads.
+        # Constructor of threads: sons of message_id in depth first order.
+        # The tree is walked iteratively so deep threads don't reach the
+        # recursion limit. Already visited messages are ignored.
 
-        sons = []
         messages = []
-        if message_id not in self.list_is_response_of:
-            # this a leaf of the tree!
-            return []
-
-        else:
-            cont = 0
-            for msg in self.list_is_response_of:
-                #Retrieving all of the sons of a given msg
-                if msg == message_id:
-                    sons.append(self.list_message_id[cont])
-                cont = cont + 1
-            for msg in sons:
-                messages.extend([msg])
-                messages.extend(self._build_threads(msg))
-
+        visited = set([message_id])
+        pending = list(reversed(self.children.get(message_id, [])))
+        while pending:
+            msg = pending.pop()
+            if msg in visited: continue
+            visited.add(msg)
+            messages.append(msg)
+            pending.extend(reversed(self.children.get(msg, [])))
 
         return messages
 
@@ -137,19 +137,77 @@ class Threads(object):
         self.list_message_id = to_list(list_messages["message_ID"])
         self.list_is_response_of = to_list(list_messages["is_response_of"])
 
-        messages = {}
-        for message_id in self.list_message_id:
-            # Looking for messages in the thread
-            index = self.list_message_id.index(message_id)
+        # Sons of each message and 'father' of the first appearance
+        # of each message, all in one pass
+        self.children = {}
+        father = {}
+        for message_id, response_of in zip(self.list_message_id, self.list_is_response_of):
+            if response_of is not None:
+                self.children.setdefault(response_of, []).append(message_id)
+            if message_id not in father:
+                father[message_id] = response_of
 
+        messages = {}
+        for message_id in father:
             # Only analyzing those whose is_response_of is None,
             # those are the message 'root' of each thread.
-            if self.list_is_response_of[index] is None:
+            if father[message_id] is None:
                 messages[message_id] = self._build_threads(message_id)
                 # Adding the root message to the list in first place
                 messages[message_id].insert(0, message_id)
 
         self.threads = messages
+        self.lengths = dict([(root, len(thread)) for root, thread in messages.items()])
+
+    def _get_messages_field(self, query, field):
+        # Values of field for each message_id in the analysis dates
+        result = ExecuteQuery(query % (self.initdate, self.enddate))
+        to_list = lambda x: [x] if type(x) not in (list, dict) else x
+        values = {}
+        for message_id, value in zip(to_list(result.get("message_ID", [])),
+                                     to_list(result.get(field, []))):
+            values.setdefault(message_id, []).append(value)
+        return values
+
+    def _init_participants(self):
+        # Number of different people in each thread, using one query
+        # for all of the messages
+        if self.participants is not None: return
+        query = """
+                select distinct m.message_ID, pup.uuid as upeople_id
+                from messages m,
+                     messages_people mp,
+                     people_uidentities pup
+                where m.message_ID = mp.message_id and
+                      mp.type_of_recipient = 'From' and
+                      mp.email_address = pup.people_id and
+                      m.first_date >= %s and m.first_date < %s
+                """
+        senders = self._get_messages_field(query, "upeople_id")
+        self.participants = {}
+        for root, thread in self.threads.items():
+            people = set([])
+            for message in thread:
+                people.update(senders.get(message, []))
+            self.participants[root] = len(people)
+
+    def _init_verbosity(self):
+        # Length of all of the body messages in each thread, using one query
+        # for all of the messages
+        if self.verbosity is not None: return
+        query = """
+                select message_ID, length(message_body) as length
+                from messages
+                where first_date >= %s and first_date < %s
+                """
+        lengths = self._get_messages_field(query, "length")
+        self.verbosity = {}
+        for root, thread in self.threads.items():
+            total_len_bodies = 0
+            for message in thread:
+                if message in lengths:
+                    total_len_bodies += int(lengths[message][0] or 0)
+            self.verbosity[root] = total_len_bodies
 
     def crowdedThread (self):
         # Returns the most crowded thread.
@@ -157,86 +215,41 @@ class Threads(object):
         # participants
         if self.crowded == None:
             # variable was not initialize
-            pass
+            self._init_participants()
+            # Ties in the order of self.threads, as sorted did
+            top = heapq.nlargest(1, self.threads, key = self.participants.get)
+            if len(top) == 0: return None
+            self.crowded = top[0]
+        return Email(self.crowded, self.i_db)
 
     def topCrowdedThread(self, numTop):
-        # Returns list ordered by the longest thread
-
-        top_threads = [] # [(message_id, number of different upeople_id), (...,...), ...]
-
-        for thread in self.threads.values():
-            # this loop counts number of different people
-            # in each of the threads and provides a
-            # dictionary with root message_id as each of the keys
-            # and a list of upeople_id as the value.
-            # Sets were considered as an option, but it implies that
-            # we may find with a higher probability equal sets, what
-            # would provide incorrect sets to their correspondant message_id
-            # when ordering them (at least using this algorithm).
-            # So, not using sets, and manual order of the lists is done
-            people = set([])
-            for message in thread:
-                query = """
-                        select distinct pup.uuid as upeople_id
-                        from messages m,
-                             messages_people mp,
-                             people_uidentities pup
-                        where m.message_ID = '%s' and
-                              m.message_ID = mp.message_id and
-                              mp.type_of_recipient = 'From' and
-                              mp.email_address = pup.people_id
-                        """ % (message)
-                result = ExecuteQuery(query)
-                upeople_id = result["upeople_id"]
-                people.add(upeople_id)
-            top_threads.append((message, len(people)))
-
-        sorted_threads = sorted(top_threads, key=lambda thread: thread[1], reverse = True)
+        # Returns list ordered by the most crowded threads
+        self._init_participants()
+        top = heapq.nlargest(int(numTop), self.threads, key = self.participants.get)
 
         top_threads_emails = []
-        for top in sorted_threads[:numTop]:
+        for message_id in top:
             # Create a list of emails
-            message_id = top[0]
             email = Email(message_id, self.i_db)
-            top_threads_emails.append((email, top[1]))
+            top_threads_emails.append((email, self.participants[message_id]))
         return top_threads_emails
 
     def longestThread (self):
         # Returns the longest thread
         if self.longest == None:
             # variable was not initialize
-            self.longest = ""
-            longest = 0
-            for message_id in self.threads.keys():
-                if len(self.threads[message_id]) > longest:
-                    longest = len(self.threads[message_id])
-                    self.longest = message_id
+            top = heapq.nlargest(1, self.threads, key = self.lengths.get)
+            self.longest = top[0] if len(top) > 0 else ""
 
         return Email(self.longest, self.i_db)
 
     def topLongestThread(self, numTop):
-        numTop = int(numTop)
         # Returns list ordered by the longest threads
-        top_threads = []
-        top_root_msgs = []
-        top_threads_emails = []
-
-        # Retrieving the lists of threads
-        values = self.threads.values()
-        # sorted(values, lambda x,y: 1 if len(x)>len(y) else -1 if len(x)<len(y) else 0)
-        values = sorted(values, key = len, reverse = True)
-
-        # Checks if numTop is higher than len of the list
-        if numTop > len(values):
-            top_threads = values
-        else:
-            top_threads = values[0:numTop]
-
-        for thread in top_threads:
-            # the root message is the first of the list
-            # (the rest of them are not ordered)
-            top_root_msgs.append(thread[0])
+        # the root message is the key of each thread
+        # Ties in the order of self.threads, as sorted did
+        top_root_msgs = heapq.nlargest(int(numTop), self.threads, key = self.lengths.get)
 
+        top_threads_emails = []
         for message_id in top_root_msgs:
             # Create a list of emails
             email = Email(message_id, self.i_db)
@@ -245,30 +258,12 @@ class Threads(object):
         return top_threads_emails
 
     def verboseThread (self):
-        # TODO: at some point these numbers should be calculated when
-        # retrieving the initial list of message_id, is_response_of values
         # Returns the most verbose thread (the biggest emails)
         if self.verbose == None:
             # variable was not initialize
-            self.verbose = ""
-            current_len = 0
-            # iterating through the root messages
-            for message_id in self.threads.keys():
-                total_len_bodies = 0 # len of all of the body messages
-                # iterating through each of the messages of the thread
-                for msg in self.threads[message_id]:
-                    query = """
-                            select length(message_body) as length
-                            from messages
-                            where message_ID = '%s'
-                            """ % (msg)
-                    result = ExecuteQuery(query)
-                    length = int(result["length"])
-                    total_len_bodies = total_len_bodies + length
-                    if total_len_bodies > current_len:
-                        # New bigger thread found
-                        self.verbose = message_id
-                        current_len = total_len_bodies
+            self._init_verbosity()
+            top = heapq.nlargest(1, self.threads, key = self.verbosity.get)
+            self.verbose = top[0] if len(top) > 0 else ""
         return Email(self.verbose, self.i_db)
 
     def threads (self):
@@ -283,7 +278,7 @@ class Threads(object):
         # Returns the number of message in a given thread
         # Each thread is identified by the message_id of the
         # root message
-        return len(self.threads[message_id])
+        return self.lengths[message_id]
 
 if __name__ == '__main__':
     GrimoireSQL.SetDBChannel (database = "openstack_mls", user="root", password="")
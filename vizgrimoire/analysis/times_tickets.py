@@ -24,8 +24,12 @@
 
 """ People and Companies evolution per quarters """
 
+import bisect
+import calendar
+from datetime import datetime
+
 from vizgrimoire.analysis.analyses import Analyses
-from vizgrimoire.GrimoireUtils import completePeriodIds, medianAndAvgByPeriod, get_median, get_avg
+from vizgrimoire.GrimoireUtils import completePeriodIds, medianAndAvgByPeriod, check_array_values
 from vizgrimoire.metrics.query_builder import DSQuery
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 
@@ -133,78 +137,6 @@ class TimesTickets(Analyses):
         data = self.db.ExecuteQuery(query)
         return (data)
 
-    def GetIssuesOpenedAtQuery (self, startdate, enddate, closed_condition, ext_condition=None):
-        q = """SELECT issue_id
-               FROM issues_log_bugzilla log,
-                 (SELECT MAX(id) id
-                  FROM issues_log_bugzilla
-                  WHERE date >= %(startdate)s AND date < %(enddate)s
-                  GROUP BY issue_id) g
-               WHERE log.id = g.id  AND NOT """
-        q += closed_condition
-
-        if ext_condition:
-            q += ext_condition
-
-        q += """ ORDER BY issue_id """
-
-        params = {'startdate' : startdate,
-                  'enddate' : enddate}
-        query = q % params
-        return query
-
-    def GetIssuesWithoutFirstActionAt (self, period, startdate, enddate, closed_condition, ext_condition=None, alias=None):
-        q = """SELECT i.id issue_id, TIMESTAMPDIFF(SECOND, submitted_on, %(enddate)s)/(24*3600) AS %(alias)s
-               FROM issues i, ("""
-        q += self.GetIssuesOpenedAtQuery(startdate, enddate, closed_condition, ext_condition)
-        q += """ ) log
-                WHERE i.id = log.issue_id AND i.id NOT IN
-                (SELECT issue_id
-                 FROM first_action_per_issue
-                 WHERE date >= %(startdate)s AND date < %(enddate)s)"""
-
-        params = {'alias' : alias or 'time_opened',
-                  'startdate' : startdate,
-                  'enddate' : enddate}
-        query = q % params
-
-        data = self.db.ExecuteQuery(query)
-        return (data)
-
-    def GetIssuesWithoutFirstCommentAt (self, period, startdate, enddate, closed_condition, ext_condition=None, alias=None):
-        q = """SELECT i.id issue_id, TIMESTAMPDIFF(SECOND, submitted_on, %(enddate)s)/(24*3600) AS %(alias)s
-               FROM issues i, ("""
-        q += self.GetIssuesOpenedAtQuery(startdate, enddate, closed_condition, ext_condition)
-        q += """ ) log
-                WHERE i.id = log.issue_id AND i.id NOT IN
-                (SELECT issue_id
-                 FROM first_comment_per_issue
-                 WHERE date >= %(startdate)s AND date < %(enddate)s)"""
-
-        params = {'alias' : alias or 'time_opened',
-                  'startdate' : startdate,
-                  'enddate' : enddate}
-        query = q % params
-
-        data = self.db.ExecuteQuery(query)
-        return (data)
-
-
-    def GetIssuesOpenedAt (self, period, startdate, enddate, closed_condition, ext_condition=None, alias=None):
-        q = """SELECT i.id issue_id, TIMESTAMPDIFF(SECOND, submitted_on, %(enddate)s)/(24*3600) AS %(alias)s
-               FROM issues i, ("""
-        q += self.GetIssuesOpenedAtQuery(startdate, enddate, closed_condition, ext_condition)
-        q += """ ) log
-                WHERE i.id = log.issue_id"""
-
-        params = {'alias' : alias or 'time_opened',
-                  'enddate' : enddate}
-        query = q % params
-
-        data = self.db.ExecuteQuery(query)
-        return (data)
-
-
     def ticketsTimeToResponse(self, period, startdate, enddate, identities_db, backend):
         time_to_response_priority = self.ticketsTimeToResponseByField(period, startdate, enddate,
                                                                       backend.closed_condition,
@@ -219,19 +151,13 @@ class TimesTickets(Analyses):
     def ticketsTimeOpened(self, period, startdate, enddate, identities_db, backend):
         log_close_condition_mediawiki = "(status = 'RESOLVED' OR status = 'CLOSED' OR status = 'VERIFIED' OR priority = 'Lowest')"
 
-        evol = {}
-
-        for result_type in ['action', 'comment', 'open']:
-            time_opened = self.ticketsTimeOpenedByType(period, startdate, enddate, log_close_condition_mediawiki, result_type)
-
-            time_opened_priority = self.ticketsTimeOpenedByField(period, startdate, enddate, log_close_condition_mediawiki,
-                                                                 'priority', backend.priority, result_type)
-
-            time_opened_severity = self.ticketsTimeOpenedByField(period, startdate, enddate, log_close_condition_mediawiki,
-                                                                 'type', backend.severity, result_type)
+        # Build a set of dates
+        dates = completePeriodIds({period : []}, period, startdate, enddate)[period]
+        dates.append(dates[-1] + 1) # add one more month
 
-            evol = dict(evol.items() + time_opened.items() + time_opened_priority.items() + time_opened_severity.items())
-        return evol
+        fields = [('priority', backend.priority), ('type', backend.severity)]
+        evol = self.getTicketsTimeOpened(period, dates, log_close_condition_mediawiki, fields)
+        return completePeriodIds(evol, period, startdate, enddate)
 
     def ticketsTimeToResponseByField(self, period, startdate, enddate, closed_condition, field, values_set):
         condition = "AND i." + field + " = '%s'"
@@ -268,98 +194,154 @@ class TimesTickets(Analyses):
             evol = dict(evol.items() + time_to_fa.items() + time_to_fc.items() + time_closed.items())
         return evol
 
-    def ticketsTimeOpenedByType(self, period, startdate, enddate, closed_condition, result_type):
-        # Build a set of dates
-        dates = completePeriodIds({period : []}, period, startdate, enddate)[period]
-        dates.append(dates[-1] + 1) # add one more month
-
+    def _get_time_opened_alias(self, result_type, field_value = None):
         if result_type == 'action':
             alias = "topened_tfa"
         elif result_type == 'comment':
             alias = "topened_tfc"
         else:
             alias = "topened"
+        if field_value is not None:
+            alias += "_%s" % field_value
+        return alias
 
-        time_opened = self.getTicketsTimeOpened(period, dates, closed_condition, result_type, alias)
-        time_opened = completePeriodIds(time_opened, period, startdate, enddate)
-        return time_opened
-
-    def ticketsTimeOpenedByField(self, period, startdate, enddate, closed_condition, field, values_set, result_type):
-        condition = "AND " + field + " = '%s'"
-        evol = {}
-
-        # Build a set of dates
-        dates = completePeriodIds({period : []}, period, startdate, enddate)[period]
-        dates.append(dates[-1] + 1) # add one more month
-
-        for field_value in values_set:
-            field_condition = condition % field_value
-
-            if result_type == 'action':
-                alias = "topened_tfa_%s" % field_value
-            elif result_type == 'comment':
-                alias = "topened_tfc_%s" % field_value
-            else:
-                alias = "topened_%s" % field_value
-
-            time_opened = self.getTicketsTimeOpened(period, dates, closed_condition, result_type, alias, field_condition)
-            time_opened = completePeriodIds(time_opened, period, startdate, enddate)
-            evol = dict(evol.items() + time_opened.items())
-
-        return evol
-
-    def getTicketsTimeOpened(self, period, dates, closed_condition, result_type, alias, field_condition=None):
-        period_dates = []
-        size_values = []
-        median_values = []
-        avg_values = []
-        current_period = dates[0]  # The first month there aren't remaining issues opened
+    def _get_issues_log_intervals(self, boundaries, closed_condition, fields):
+        """ Log state of each issue between boundaries
 
+            The state of an issue at a boundary is its last log entry (MAX(id))
+            before it. Returns issue_id -> [(from, to, open, fields values)]
+        """
         startdate = self.filters.startdate
-        enddate = self.filters.enddate
-
-
+        enddate = "'" + boundaries[-1].strftime("%Y-%m-%d") + "'"
+        fields_sql = "".join([", " + field for (field, values_set) in fields])
+        q = """SELECT issue_id, id, date, %s AS closed %s
+               FROM issues_log_bugzilla
+               WHERE date >= %s AND date < %s""" % (closed_condition, fields_sql, startdate, enddate)
+        logs = check_array_values(self.db.ExecuteQuery(q))
+
+        changes = {}
+        for i in range(0, len(logs.get('issue_id', []))):
+            # first boundary after the log entry
+            from_boundary = bisect.bisect_right(boundaries, logs['date'][i])
+            values = [logs[field][i] for (field, values_set) in fields]
+            # NOT closed_condition is only true for 0
+            is_open = logs['closed'][i] == 0
+            changes.setdefault(logs['issue_id'][i], []).append((from_boundary, logs['id'][i], is_open, values))
+
+        intervals = {}
+        for issue_id in changes:
+            intervals[issue_id] = []
+            current = None
+            for change in sorted(changes[issue_id]):
+                # An older log entry found after a newer one
+                if current is not None and change[1] < current[1]: continue
+                if current is not None and change[0] > current[0]:
+                    intervals[issue_id].append((current[0], change[0], current[2], current[3]))
+                current = change
+            intervals[issue_id].append((current[0], len(boundaries), current[2], current[3]))
+        return intervals
+
+    def _get_issues_dates(self, boundaries, q):
+        # Dates (issue_id, date) from the query, using the analysis dates
+        startdate = self.filters.startdate
+        enddate = "'" + boundaries[-1].strftime("%Y-%m-%d") + "'"
+        data = check_array_values(self.db.ExecuteQuery(q % (startdate, enddate)))
+        return dict(zip(data.get('issue_id', []), data.get('date', [])))
+
+    def getTicketsTimeOpened(self, period, dates, closed_condition, fields):
+        """ Size, median and average age of the opened tickets in each period
+
+            The issues log, first actions and first comments are read once
+            and all periods, fields values and result types (open, without
+            first action, without first comment) are computed in one sweep,
+            keeping the submission dates of the opened tickets sorted.
+        """
+        # Each period is analyzed at the start of the next one
+        boundaries = []
         for dt in dates[1:]:
-            # Convert dates to readable format (YY-MM-DD)
             year = dt / 12
             month = dt % 12
             if month == 0:
                 year = year - 1
                 month = 12
-            enddate = "'" + str(year) + "-" + str(month) + "-1'"
-
-            if result_type == 'action':
-                open_issues = self.GetIssuesWithoutFirstActionAt(period, startdate, enddate, closed_condition,
-                                                                      field_condition, alias)[alias]
-            elif result_type == 'comment':
-                open_issues = self.GetIssuesWithoutFirstCommentAt(period, startdate, enddate, closed_condition,
-                                                                       field_condition, alias)[alias]
-            else:
-                open_issues = self.GetIssuesOpenedAt(period, startdate, enddate, closed_condition,
-                                                          field_condition, alias)[alias]
-
-            m = get_median(open_issues)
-            avg = get_avg(open_issues)
-
-            # set size of the tickets population
-            if not open_issues:
-                size = 0
-            elif not isinstance(open_issues, list):
-                size = 1
-            else:
-                size = len(open_issues)
-
-            period_dates.append(current_period)
-            size_values.append(size)
-            median_values.append(m)
-            avg_values.append(avg)
-            current_period = dt
-
-        time_opened = {period : period_dates,
-                       'size_' + alias : size_values,
-                       'median_' + alias : median_values,
-                       'avg_' + alias : avg_values}
-        return time_opened
+            boundaries.append(datetime(year, month, 1))
+        nboundaries = len(boundaries)
+
+        intervals = self._get_issues_log_intervals(boundaries, closed_condition, fields)
+        submitted = self._get_issues_dates(boundaries, """
+            SELECT DISTINCT i.id issue_id, i.submitted_on date
+            FROM issues i, issues_log_bugzilla log
+            WHERE i.id = log.issue_id AND log.date >= %s AND log.date < %s""")
+        first_action = self._get_issues_dates(boundaries, """
+            SELECT issue_id, date FROM first_action_per_issue
+            WHERE date >= %s AND date < %s""")
+        first_comment = self._get_issues_dates(boundaries, """
+            SELECT issue_id, date FROM first_comment_per_issue
+            WHERE date >= %s AND date < %s""")
+
+        keys = []
+        for result_type in ['action', 'comment', 'open']:
+            keys.append((result_type, None))
+            for (field, values_set) in fields:
+                for field_value in values_set:
+                    keys.append((result_type, (field, field_value)))
+
+        # Tickets added to and removed from each population at each boundary
+        added = [[] for i in range(0, nboundaries+1)]
+        removed = [[] for i in range(0, nboundaries+1)]
+        for issue_id in intervals:
+            if issue_id not in submitted: continue
+            submitted_on = calendar.timegm(submitted[issue_id].timetuple())
+            last = {'open': nboundaries, 'action': nboundaries, 'comment': nboundaries}
+            if issue_id in first_action:
+                last['action'] = bisect.bisect_right(boundaries, first_action[issue_id])
+            if issue_id in first_comment:
+                last['comment'] = bisect.bisect_right(boundaries, first_comment[issue_id])
+            for (start, end, is_open, values) in intervals[issue_id]:
+                if not is_open: continue
+                groups = [None] + [(fields[i][0], values[i]) for i in range(0, len(fields))]
+                for result_type in last:
+                    to = min(end, last[result_type])
+                    if start >= to: continue
+                    for group in groups:
+                        added[start].append(((result_type, group), submitted_on))
+                        removed[to].append(((result_type, group), submitted_on))
+
+        populations = dict([(key, []) for key in keys])
+        totals = dict([(key, 0) for key in keys])
+        evol = {period : dates[0:nboundaries]}
+        for key in keys:
+            alias = self._get_time_opened_alias(key[0], key[1][1] if key[1] else None)
+            for serie in ['size_', 'median_', 'avg_']:
+                evol[serie + alias] = []
+
+        for i in range(0, nboundaries):
+            for (key, submitted_on) in removed[i]:
+                if key not in populations: continue
+                population = populations[key]
+                del population[bisect.bisect_left(population, submitted_on)]
+                totals[key] -= submitted_on
+            for (key, submitted_on) in added[i]:
+                if key not in populations: continue
+                bisect.insort(populations[key], submitted_on)
+                totals[key] += submitted_on
+
+            boundary = calendar.timegm(boundaries[i].timetuple())
+            for key in keys:
+                population = populations[key]
+                size = len(population)
+                # Ages in days. No data for this period is NaN.
+                median = avg = float('nan')
+                if size > 0:
+                    middle = (population[(size-1)/2] + population[size/2]) / 2.0
+                    median = (boundary - middle) / (24*3600)
+                    avg = (boundary - float(totals[key]) / size) / (24*3600)
+                alias = self._get_time_opened_alias(key[0], key[1][1] if key[1] else None)
+                evol['size_' + alias].append(size)
+                evol['median_' + alias].append(median)
+                evol['avg_' + alias].append(avg)
+
+        return evol
 
     def get_ts (self, data_source):
         return self.result(data_source)
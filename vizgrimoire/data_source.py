@@ -24,9 +24,10 @@
 """ DataSource offers the API to get aggregated, evolutionary and top data with filter 
     support for Grimoire supported data sources """ 
 
-import logging, os
-from vizgrimoire.metrics.query_builder import DSQuery, ITSQuery, MLSQuery
+import copy, logging, os
+from vizgrimoire.metrics.query_builder import DSQuery, ITSQuery, MLSQuery, QueryPlan
 from vizgrimoire.GrimoireUtils import createJSON
+from vizgrimoire.json_bundle import FilterItemsWriter
 from vizgrimoire.metrics.metrics_filter import MetricFilters
 from vizgrimoire.filter import Filter
 
@@ -240,6 +241,60 @@ class DataSource(object):
         """Get aggregated data for a person activity"""
         raise NotImplementedError
 
+    def get_people_evol(self, people, period, startdate, enddate, identities_db):
+        """Get the evolutionary data for a list of people: {uuid: evol}"""
+        evol = {}
+        for uuid in people:
+            evol[uuid] = self.get_person_evol(uuid, period, startdate, enddate,
+                                              identities_db, type_analysis = None)
+        return evol
+
+    def get_people_agg(self, people, startdate, enddate, identities_db):
+        """Get the aggregated data for a list of people: {uuid: agg}"""
+        agg = {}
+        for uuid in people:
+            agg[uuid] = self.get_person_agg(uuid, startdate, enddate,
+                                            identities_db, type_analysis = None)
+        return agg
+
+    @staticmethod
+    def get_people_filter(people):
+        """SQL condition for the people_uidentities uuids in people"""
+        uuids = ",".join(["'"+str(uuid)+"'" for uuid in people])
+        return "pup.uuid IN (" + uuids + ")"
+
+    @staticmethod
+    def split_people_data(data, people, evol = False, period = None,
+                          startdate = None, enddate = None):
+        """Split the results of a GROUP BY uuid query in a dict per person
+
+        Evolutionary data is completed for all people. Aggregated data is
+        only returned for people with activity.
+        """
+        from vizgrimoire.GrimoireUtils import check_array_values, completePeriodIds
+        data = check_array_values(data)
+        fields = [field for field in data if field != 'uuid']
+        people_data = {}
+        if evol:
+            for uuid in people:
+                people_data[uuid] = dict([(field, []) for field in fields])
+        for i in range(0, len(data.get('uuid', []))):
+            uuid = data['uuid'][i]
+            if evol:
+                if uuid not in people_data: continue
+                for field in fields:
+                    people_data[uuid][field].append(data[field][i])
+            else:
+                people_data[uuid] = dict([(field, data[field][i]) for field in fields])
+        if evol:
+            for uuid in people_data:
+                people_data[uuid] = completePeriodIds(people_data[uuid], period,
+                                                      startdate, enddate)
+        return people_data
+
+    # Number of people whose activity is got in each query
+    people_batch = 1000
+
     def create_people_report(self, period, startdate, enddate, destdir, npeople, identities_db, people_ids=None):
         """Create all files related to people activity (aggregated, evolutionary)"""
         fpeople = os.path.join(destdir,self.get_top_people_file(self.get_name()))
@@ -251,16 +306,15 @@ class DataSource(object):
 
         createJSON(people, fpeople)
 
-        for uuid in people :
-            evol_data = self.get_person_evol(uuid, period, startdate, enddate,
-                                            identities_db, type_analysis = None)
-            fperson = os.path.join(destdir,self.get_person_evol_file(uuid))
-            createJSON (evol_data, fperson)
-
-            agg = self.get_person_agg(uuid, startdate, enddate,
-                                     identities_db, type_analysis = None)
-            fperson = os.path.join(destdir,self.get_person_agg_file(uuid))
-            createJSON (agg, fperson)
+        for i in range(0, len(people), self.people_batch):
+            batch = people[i:i+self.people_batch]
+            evol = self.get_people_evol(batch, period, startdate, enddate, identities_db)
+            agg = self.get_people_agg(batch, startdate, enddate, identities_db)
+            for uuid in batch:
+                fperson = os.path.join(destdir,self.get_person_evol_file(uuid))
+                createJSON (evol[uuid], fperson)
+                fperson = os.path.join(destdir,self.get_person_agg_file(uuid))
+                createJSON (agg[uuid], fperson)
 
     @staticmethod
     def create_r_reports(vizr, enddate, destdir):
@@ -350,7 +404,7 @@ class DataSource(object):
     def get_metrics_data(DS, period, startdate, enddate, identities_db,
                          filter_ = None, evol = False):
         """ Get basic data from all core metrics """
-        from vizgrimoire.GrimoireUtils import fill_and_order_items
+        from vizgrimoire.GrimoireUtils import fill_and_order_items, ItemsAlignment
         from vizgrimoire.ITS import ITS
         from vizgrimoire.MLS import MLS
         data = {}
@@ -394,6 +448,9 @@ class DataSource(object):
         # TODO: the hardcoded 10 should be removed, and use instead the npeople provided
         #       in the config file.
         mfilter = MetricFilters(period, startdate, enddate, type_analysis, 10, people_out, None)
+        if type_analysis and type_analysis[1] is None:
+            # Same items alignment for all the metrics
+            alignment = ItemsAlignment(items, evol, period, startdate, enddate)
         metrics_reports = DS.get_metrics_core_reports()
         all_metrics = DS.get_metrics_set(DS)
 
@@ -404,19 +461,34 @@ class DataSource(object):
             for r in metrics_reports:
                 if r in reports_on: metrics_on += [r]
 
-        for item in all_metrics:
-            # print item
-            if item.id not in metrics_on: continue
-            mfilter_orig = item.filters
-            mfilter.global_filter = mfilter_orig.global_filter
-            mfilter.set_closed_condition(mfilter_orig.closed_condition)
-            item.filters = mfilter
-            if evol: mvalue = item.get_ts()
-            else:    mvalue = item.get_agg()
+        def get_item_filters(item):
+            # Each metric uses its own copy of the filters: they run concurrently
+            item_filters = copy.copy(mfilter)
+            item_filters.global_filter = item.filters.global_filter
+            item_filters.set_closed_condition(item.filters.closed_condition)
+            return item_filters
 
+        def get_metric_value(item):
+            """ Returns the value of the metric and its id_field """
+            mfilter_orig = item.filters
+            item.filters = get_item_filters(item)
+            try:
+                result = plan.get_result(item)
+                if result is not None:
+                    if evol: mvalue = item.get_ts_from_result(result)
+                    else: mvalue = result
+                elif evol:
+                    if Report.get_incremental() is not None:
+                        mvalue = Report.get_incremental().get_ts(item, DS.get_name())
+                    else:
+                        mvalue = item.get_ts()
+                else:    mvalue = item.get_agg()
+            finally:
+                item.filters = mfilter_orig
+
+            id_field = None
             if type_analysis and type_analysis[1] is None and mvalue:
                 logging.info(item.id)
-                id_field = None
                 # Support for combined filters
                 for idf in mvalue.keys():
                     if "CONCAT(" in idf:
@@ -425,11 +497,29 @@ class DataSource(object):
                 if id_field is None:
                     id_field = dsquery.get_group_field_alias(type_analysis[0])
                 mvalue = fill_and_order_items(items, mvalue, id_field,
-                                              evol, period, startdate, enddate)
+                                              alignment = alignment)
+            return (mvalue, id_field)
+
+        # Metrics queries are run concurrently, results merged in order
+        executor = Report.get_metrics_executor()
+        id_field = None
+        metrics = [item for item in all_metrics if item.id in metrics_on]
+
+        # Metrics with the same tables and filters computed in one query
+        plan = QueryPlan()
+        if DSQuery.query_batching and not (evol and Report.get_incremental() is not None):
+            for item in metrics:
+                mfilter_orig = item.filters
+                item.filters = get_item_filters(item)
+                try:
+                    item.add_to_query_plan(plan, evol)
+                finally:
+                    item.filters = mfilter_orig
+            plan.execute(executor.map)
+        for (mvalue, item_id_field) in executor.map(get_metric_value, metrics):
+            if item_id_field is not None: id_field = item_id_field
             data = dict(data.items() + mvalue.items())
 
-            item.filters = mfilter_orig
-
         if not evol:
             init_date = DS.get_date_init(startdate, enddate, identities_db, type_analysis)
             end_date = DS.get_date_end(startdate, enddate, identities_db, type_analysis)
@@ -438,9 +528,9 @@ class DataSource(object):
                 if id_field is None:
                     id_field = dsquery.get_group_field_alias(type_analysis[0])
                 init_date = fill_and_order_items(items, init_date, id_field,
-                                                 evol, period, startdate, enddate)
+                                                 alignment = alignment)
                 end_date = fill_and_order_items(items, end_date, id_field,
-                                                evol, period, startdate, enddate)
+                                                alignment = alignment)
             if init_date is None: init_date = {}
             if end_date is None: end_date = {}
             data = dict(data.items() + init_date.items() + end_date.items())
@@ -452,19 +542,24 @@ class DataSource(object):
             if automator_metrics in automator['r']:
                 metrics_trends = automator['r'][automator_metrics].split(",")
 
-            for i in [7,30,365]:
-                for item in all_metrics:
-                    if item.id not in metrics_trends: continue
-                    mfilter_orig = item.filters
-                    item.filters = mfilter
-                    period_data = item.get_trends(enddate, i)
+            def get_metric_trends(item):
+                mfilter_orig = item.filters
+                item.filters = get_item_filters(item)
+                try:
+                    # All trends windows computed at once
+                    period_data = item.get_trends_batch(enddate, [7,30,365])
+                finally:
                     item.filters = mfilter_orig
 
-                    if type_analysis and type_analysis[1] is None:
-                        group_field = dsquery.get_group_field_alias(type_analysis[0])
-                        period_data = fill_and_order_items(items, period_data, group_field)
+                if type_analysis and type_analysis[1] is None:
+                    group_field = dsquery.get_group_field_alias(type_analysis[0])
+                    period_data = fill_and_order_items(items, period_data, group_field,
+                                                       alignment = alignment)
+                return period_data
 
-                    data = dict(data.items() + period_data.items())
+            metrics = [item for item in all_metrics if item.id in metrics_trends]
+            for period_data in executor.map(get_metric_trends, metrics):
+                data = dict(data.items() + period_data.items())
 
         return data
 
@@ -541,6 +636,10 @@ class DataSource(object):
         ts_fields = ['unixtime','id','date',period]
         # Not metrics fields
         no_metrics_fields = ['filter_type']
+        if evolutionary:
+            items_writer = FilterItemsWriter(cls(), filter_, destdir, "evolutionary")
+        else:
+            items_writer = FilterItemsWriter(cls(), filter_, destdir, "static")
         for i in range(0,len(data['name'])):
             item_metrics = {}
             item = data['name'][i]
@@ -560,10 +659,8 @@ class DataSource(object):
                 for field in ts_fields:
                     # Shared time series fields
                     item_metrics[field] = data[field]
-                fn = os.path.join(destdir, filter_item.get_evolutionary_filename(cls()))
-            else:
-                fn = os.path.join(destdir, filter_item.get_static_filename(cls()))
-            createJSON(item_metrics, fn)
+            items_writer.write(filter_item, item_metrics)
+        items_writer.close()
 
     @classmethod
     def ages_study_com (ds, items, period,
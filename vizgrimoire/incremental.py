@@ -0,0 +1,236 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Incremental computation of time series using the ones from the last run """
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+
+class IncrementalTS(object):
+    """Time series computed reusing the results of the last run
+
+    For each (data source, metric, filter) the time series generated is
+    stored in state_dir. Its watermark is the start of its last period,
+    which could be incomplete in the last run. In the next run, only the
+    periods from the watermark are queried and they replace the tail of
+    the stored time series.
+
+    A full time series is computed if there is no stored one, if the
+    config, the schema of the database, the start date or the period
+    changed from the last run, if rows dated before the watermark were
+    added to the source tables of the data source (DSQuery.source_tables)
+    or if the identities (people, enrollments and organizations) changed.
+    Metrics with incremental False are always computed full.
+    """
+
+    # Not metrics fields in time series
+    ts_fields = ['unixtime', 'date', 'id']
+
+    def __init__(self, state_dir, config_hash):
+        self.state_dir = state_dir
+        self.config_hash = config_hash
+        self.full = 0
+        self.incremental = 0
+        self._source_counts = {} # (database, watermark): source count
+        self._identities = {} # database: identities checksum
+        self._lock = threading.Lock()
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir)
+
+    @staticmethod
+    def get_config_hash(config):
+        return hashlib.sha1(json.dumps(config, sort_keys=True)).hexdigest()
+
+    def _get_file(self, key):
+        return os.path.join(self.state_dir, hashlib.sha1(key).hexdigest() + ".json")
+
+    def _load(self, key):
+        state = None
+        if os.path.isfile(self._get_file(key)):
+            with open(self._get_file(key)) as f:
+                state = json.load(f)
+        return state
+
+    def _save(self, key, state):
+        tmp_file = self._get_file(key) + "." + str(os.getpid())
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.rename(tmp_file, self._get_file(key))
+
+    @staticmethod
+    def get_key(ds_name, metric):
+        return "%s|%s|%s" % (ds_name, metric.id, metric.filters.type_analysis)
+
+    @staticmethod
+    def _get_watermark(ts):
+        """ Start of the last period of ts """
+        watermark = datetime.utcfromtimestamp(int(ts["unixtime"][-1]))
+        return "'" + watermark.strftime('%Y-%m-%d') + "'"
+
+    def _get_source_count(self, db, watermark):
+        """ Rows of the source tables before watermark, queried once per run """
+        key = (db.database, watermark)
+        with self._lock:
+            if key in self._source_counts: return self._source_counts[key]
+        count = db.get_source_count(watermark)
+        with self._lock:
+            self._source_counts[key] = count
+        return count
+
+    def _get_identities_checksum(self, db):
+        """ Checksum of the identities tables, queried once per run """
+        with self._lock:
+            if db.database in self._identities: return self._identities[db.database]
+        checksum = db.get_identities_checksum()
+        with self._lock:
+            self._identities[db.database] = checksum
+        return checksum
+
+    def _get_state(self, metric, ts):
+        filters = metric.filters
+        state = {"config": self.config_hash,
+                 "schema": metric.db.get_schema_fingerprint(),
+                 "startdate": filters.startdate,
+                 "period": filters.period,
+                 "identities": self._get_identities_checksum(metric.db),
+                 "source_count": None,
+                 "ts": ts}
+        if ts is not None and len(ts["unixtime"]) > 0:
+            watermark = IncrementalTS._get_watermark(ts)
+            state["source_count"] = self._get_source_count(metric.db, watermark)
+        return state
+
+    def _is_valid(self, state, metric):
+        if state is None: return False
+        new_state = self._get_state(metric, None)
+        for field in ["config", "schema", "startdate", "period"]:
+            if state[field] != new_state[field]: return False
+        if state.get("identities") != new_state["identities"]:
+            logging.info("%s: identities changed, full time series" % (metric.id))
+            return False
+        if state["period"] not in state["ts"]: return False
+        if len(state["ts"]["unixtime"]) == 0: return False
+        # Without source tables data added in the past can not be detected
+        if len(metric.db.source_tables) == 0: return False
+        watermark = IncrementalTS._get_watermark(state["ts"])
+        if state.get("source_count") != self._get_source_count(metric.db, watermark):
+            logging.info("%s: data added before %s, full time series" % (metric.id, watermark))
+            return False
+        return True
+
+    @staticmethod
+    def _get_all_items_field(metric):
+        type_analysis = metric.filters.type_analysis
+        if type_analysis and type_analysis[1] is None:
+            return metric.db.get_group_field_alias(type_analysis[0])
+        return None
+
+    @staticmethod
+    def splice(prior, tail, period, id_field = None):
+        """ Replace the periods of prior from the first one in tail
+
+        Both time series must be complete (completePeriodIds). If id_field
+        is not None, the metrics contain a time series per item.
+        """
+        if len(tail[period]) == 0: return prior
+        watermark = tail[period][0]
+        prefix = len([p for p in prior[period] if p < watermark])
+        tail_len = len(tail[period])
+        ts = {}
+        for field in [period, 'unixtime', 'date']:
+            ts[field] = prior[field][0:prefix] + tail[field]
+        ts['id'] = range(0, prefix + tail_len)
+
+        metrics = [field for field in tail
+                   if field not in IncrementalTS.ts_fields + [period, id_field]]
+        if id_field is None:
+            for metric in metrics:
+                ts[metric] = prior.get(metric, [0] * prefix)[0:prefix] + tail[metric]
+            return ts
+
+        # Time series per item. Names from the stored JSON are unicode.
+        to_str = lambda x: x.encode('utf-8') if isinstance(x, unicode) else x
+        ts[id_field] = [to_str(item) for item in prior[id_field]]
+        prior_pos = dict([(item, i) for i, item in enumerate(ts[id_field])])
+        tail_pos = dict([(item, i) for i, item in enumerate(tail[id_field])])
+        for item in tail[id_field]:
+            if item not in prior_pos: ts[id_field].append(item)
+        for metric in metrics:
+            ts[metric] = []
+            for item in ts[id_field]:
+                head = [0] * prefix
+                if item in prior_pos and metric in prior:
+                    head = prior[metric][prior_pos[item]][0:prefix]
+                values = [0] * tail_len
+                if item in tail_pos:
+                    values = tail[metric][tail_pos[item]]
+                ts[metric].append(head + values)
+        return ts
+
+    def get_ts(self, metric, ds_name):
+        """ Returns metric.get_ts() computing only the periods from the watermark """
+        if not metric.incremental:
+            self.full += 1
+            return metric.get_ts()
+
+        key = IncrementalTS.get_key(ds_name, metric)
+        state = self._load(key)
+
+        if not self._is_valid(state, metric):
+            ts = metric.get_ts()
+            self.full += 1
+        else:
+            prior = state["ts"]
+            period = metric.filters.period
+            watermark = IncrementalTS._get_watermark(prior)
+            if watermark >= metric.filters.enddate:
+                ts = metric.get_ts()
+                self.full += 1
+            else:
+                filters = metric.filters
+                metric.filters = copy.copy(filters)
+                metric.filters.startdate = watermark
+                try:
+                    tail = metric.get_ts()
+                finally:
+                    metric.filters = filters
+                if period not in tail:
+                    ts = tail
+                else:
+                    ts = IncrementalTS.splice(prior, tail, period,
+                                              IncrementalTS._get_all_items_field(metric))
+                self.incremental += 1
+
+        if metric.filters.period in ts:
+            self._save(key, self._get_state(metric, ts))
+        return ts
+
+    def log_stats(self):
+        logging.info("Incremental time series: %i incremental, %i full" %
+                     (self.incremental, self.full))
@@ -0,0 +1,159 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" JSON of all the items of a filter in one indexed file """
+
+import json
+import logging
+import os
+
+from vizgrimoire.GrimoireUtils import createJSON, convertCombinedFiltersName
+from vizgrimoire.json_output import HashingFile
+from vizgrimoire.json_writer import JSONWriter
+
+
+class JSONBundle(object):
+    """Read the JSON of the items of a filter from a bundle
+
+    A bundle is a JSON lines file (name.jsonl), with the JSON of one item in
+    each line, and its index (name-index.json) with the offset and length of
+    each item line and the file where the item JSON is written in the per
+    item layout, so items are read without parsing the full bundle.
+    """
+
+    KINDS = ["evolutionary", "static", "top"]
+
+    def __init__(self, path):
+        """ path of the bundle without extension """
+        self.path = path
+        with open(JSONBundle.get_index_file(path)) as f:
+            self.index = json.load(f)
+
+    @staticmethod
+    def get_name(ds, filter_, kind):
+        return ds.get_name()+"-"+filter_.get_name_short()+"-"+kind+"-bundle"
+
+    @staticmethod
+    def get_data_file(path):
+        return path + ".jsonl"
+
+    @staticmethod
+    def get_index_file(path):
+        return path + "-index.json"
+
+    def get_items(self):
+        return sorted(self.index.keys())
+
+    def get_filename(self, item):
+        """ File of the item in the per item layout """
+        return self.index[item][2]
+
+    def get_raw(self, item):
+        """ JSON string of item """
+        offset, length = self.index[item][0:2]
+        with open(JSONBundle.get_data_file(self.path), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def get(self, item):
+        return json.loads(self.get_raw(item))
+
+    def extract(self, destdir, items = None):
+        """ Write the per item JSON files of items (all if None) in destdir """
+        if items is None: items = self.get_items()
+        with open(JSONBundle.get_data_file(self.path), 'rb') as f:
+            for item in items:
+                offset, length, filename = self.index[item]
+                f.seek(offset)
+                data = f.read(length)
+                with open(os.path.join(destdir, filename), 'w') as item_file:
+                    item_file.write(data)
+        return len(items)
+
+
+class JSONBundleWriter(object):
+    """ Write a JSONBundle, available once closed """
+
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.tmp_file = "%s.%i" % (JSONBundle.get_data_file(path), os.getpid())
+        self.file = HashingFile(open(self.tmp_file, 'wb'))
+        self.offset = 0
+        from vizgrimoire.metrics.metrics import Metrics
+        self.writer = JSONWriter(Metrics.max_decimals)
+
+    def add(self, item, filename, data):
+        data = self.writer.dumps(convertCombinedFiltersName(data))
+        self.file.write(data + "\n")
+        self.index[item] = [self.offset, len(data), filename]
+        self.offset += len(data) + 1
+
+    def close(self):
+        self.file.file.close()
+        data_file = JSONBundle.get_data_file(self.path)
+        if JSONWriter.manifest is None:
+            os.rename(self.tmp_file, data_file)
+        else:
+            JSONWriter.manifest.commit(self.tmp_file, data_file,
+                                       self.file.hexdigest(), self.file.size)
+        self.writer.write(self.index, JSONBundle.get_index_file(self.path))
+
+
+class FilterItemsWriter(object):
+    """Write the JSON of a kind of data for each item of a filter
+
+    Each item is written in its own file or, if bundles is on, in the
+    JSONBundle of the data source, filter and kind.
+    """
+
+    bundles = False # set from json_bundles in Report
+
+    def __init__(self, ds, filter_, destdir, kind):
+        if kind not in JSONBundle.KINDS:
+            raise Exception("Unknown kind of filter item data: " + kind)
+        self.ds = ds
+        self.filter = filter_
+        self.destdir = destdir
+        self.kind = kind
+        self.bundle = None # created with the first item
+
+    def write(self, filter_item, data):
+        if self.kind == "evolutionary":
+            filename = filter_item.get_evolutionary_filename(self.ds)
+        elif self.kind == "static":
+            filename = filter_item.get_static_filename(self.ds)
+        else:
+            filename = filter_item.get_top_filename(self.ds)
+        if not FilterItemsWriter.bundles:
+            createJSON(data, os.path.join(self.destdir, filename))
+            return
+        if self.bundle is None:
+            name = JSONBundle.get_name(self.ds, self.filter, self.kind)
+            self.bundle = JSONBundleWriter(os.path.join(self.destdir, name))
+        self.bundle.add(filter_item.get_item(), filename, data)
+
+    def close(self):
+        if self.bundle is None: return
+        self.bundle.close()
+        logging.info("%i items written in %s" % (len(self.bundle.index), self.bundle.path))
@@ -0,0 +1,184 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Content addressed output of the JSON files """
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+class HashingFile(object):
+    """ File wrapper computing the sha1 and size of the data written """
+
+    def __init__(self, f):
+        self.file = f
+        self.sha1 = hashlib.sha1()
+        self.size = 0
+
+    def write(self, data):
+        self.sha1.update(data)
+        self.size += len(data)
+        self.file.write(data)
+
+    def hexdigest(self):
+        return self.sha1.hexdigest()
+
+
+class OutputManifest(object):
+    """Skip the files with the same content than in the previous run
+
+    Each directory has a manifest.json with the sha1, size and mtime of its
+    files. A file is only replaced if its content changed, so mtimes, and
+    caches based on them, are kept. The file on disk is hashed again if its
+    size or mtime are not the ones in the manifest, i.e. it was written by
+    a run whose manifest was not saved. Changed files get compressed
+    siblings: .gz and .br (if the brotli module is installed).
+
+    Workers in other processes return their entries with pop_entries, to be
+    added to the main process one before save.
+    """
+
+    FILE = "manifest.json"
+
+    def __init__(self, compress = ["gz"]):
+        self.compress = list(compress)
+        if "br" in self.compress:
+            try:
+                import brotli
+            except ImportError:
+                logging.warning("brotli module not found, .br files not created")
+                self.compress.remove("br")
+        self._previous = {} # dir: manifest of the previous run
+        self.entries = {} # dir: {file: entry} written in this run
+        self.written = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _get_previous(self, dirname):
+        with self._lock:
+            if dirname not in self._previous:
+                manifest = {}
+                path = os.path.join(dirname, OutputManifest.FILE)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        manifest = json.load(f)
+                self._previous[dirname] = manifest
+            return self._previous[dirname]
+
+    def _compress(self, filepath):
+        if "gz" in self.compress:
+            tmp_file = filepath + ".gz.tmp"
+            with open(filepath, 'rb') as f_in:
+                with open(tmp_file, 'wb') as f_out:
+                    # mtime 0 so the same content gives the same .gz
+                    gz = gzip.GzipFile(filename='', mode='wb', fileobj=f_out, mtime=0)
+                    gz.write(f_in.read())
+                    gz.close()
+            os.rename(tmp_file, filepath + ".gz")
+        if "br" in self.compress:
+            import brotli
+            tmp_file = filepath + ".br.tmp"
+            with open(filepath, 'rb') as f_in:
+                with open(tmp_file, 'wb') as f_out:
+                    f_out.write(brotli.compress(f_in.read()))
+            os.rename(tmp_file, filepath + ".br")
+
+    @staticmethod
+    def _get_sha1(filepath):
+        sha1 = hashlib.sha1()
+        with open(filepath, 'rb') as f:
+            for data in iter(lambda: f.read(65536), ''):
+                sha1.update(data)
+        return sha1.hexdigest()
+
+    def _is_unchanged(self, previous, filepath, sha1):
+        """ Returns (unchanged, verified): verified if the file on disk is
+            the one in the previous manifest """
+        if not os.path.exists(filepath): return (False, False)
+        if previous is not None and previous["sha1"] == sha1:
+            stat = os.stat(filepath)
+            if stat.st_size == previous["size"] and stat.st_mtime == previous.get("mtime"):
+                return (True, True)
+        return (OutputManifest._get_sha1(filepath) == sha1, False)
+
+    def _has_siblings(self, filepath):
+        for ext in self.compress:
+            if not os.path.exists(filepath + "." + ext): return False
+        return True
+
+    def commit(self, tmp_file, filepath, sha1, size):
+        """ Replace filepath with tmp_file if its content changed
+
+        Returns True if filepath was replaced. tmp_file is removed if not.
+        """
+        dirname, filename = os.path.split(os.path.abspath(filepath))
+        previous = self._get_previous(dirname).get(filename)
+        unchanged, verified = self._is_unchanged(previous, filepath, sha1)
+        changed = not unchanged
+        if changed:
+            os.rename(tmp_file, filepath)
+        else:
+            os.remove(tmp_file)
+        # Siblings of a file not in the manifest could be from other content
+        if changed or not verified or not self._has_siblings(filepath):
+            self._compress(filepath)
+        mtime = os.stat(filepath).st_mtime
+        with self._lock:
+            self.entries.setdefault(dirname, {})[filename] = \
+                {"sha1": sha1, "size": size, "mtime": mtime}
+            if changed: self.written += 1
+            else: self.skipped += 1
+        return changed
+
+    def pop_entries(self):
+        """ Returns the entries, removing them from the manifest """
+        with self._lock:
+            entries = (self.entries, self.written, self.skipped)
+            self.entries, self.written, self.skipped = {}, 0, 0
+        return entries
+
+    def add_entries(self, entries):
+        """ Add entries from other manifest, i.e. in other process """
+        (entries, written, skipped) = entries
+        with self._lock:
+            for dirname in entries:
+                self.entries.setdefault(dirname, {}).update(entries[dirname])
+            self.written += written
+            self.skipped += skipped
+
+    def save(self):
+        """ Update the manifest of each directory with the files written """
+        for dirname in self.entries:
+            manifest = dict(self._get_previous(dirname))
+            manifest.update(self.entries[dirname])
+            path = os.path.join(dirname, OutputManifest.FILE)
+            tmp_file = path + "." + str(os.getpid())
+            with open(tmp_file, 'w') as f:
+                json.dump(manifest, f, sort_keys=True, indent=1)
+            os.rename(tmp_file, path)
+            self._previous[dirname] = manifest
+        logging.info("JSON files: %i written, %i not changed" % (self.written, self.skipped))
@@ -0,0 +1,148 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Writer of the JSON files used by the dashboards """
+
+import os
+import thread
+import types
+from datetime import date
+from decimal import Decimal
+from json.encoder import encode_basestring_ascii
+
+import numpy
+
+from vizgrimoire.json_output import HashingFile
+
+
+class JSONWriter(object):
+    """Encode data as JSON in a single traversal
+
+    Decimal values are written as floats, floats are rounded to max_decimals
+    and NaN is written as "NA", dates as strings and numpy values as Python
+    ones. Keys are sorted. The result is the one of json.dumps with sort_keys
+    after removeDecimals, roundDecimals and convertDatetime.
+
+    dump() writes to the file each buffer_size chunks, so the full JSON
+    string is never built. Generators are written as arrays.
+    """
+
+    manifest = None # OutputManifest used in write, set from Report
+
+    def __init__(self, max_decimals = 2, buffer_size = 8192):
+        self.max_decimals = max_decimals
+        self.buffer_size = buffer_size
+
+    def _encode_float(self, value):
+        value = float(value)
+        if value != value: return '"NA"'
+        if value == float('inf'): return 'Infinity'
+        if value == -float('inf'): return '-Infinity'
+        return repr(round(value, self.max_decimals))
+
+    @staticmethod
+    def _encode_key(key):
+        if isinstance(key, basestring): return encode_basestring_ascii(key)
+        if key is True: return '"true"'
+        if key is False: return '"false"'
+        if key is None: return '"null"'
+        # repr of a long has the L suffix
+        if isinstance(key, (int, long)): return '"' + str(key) + '"'
+        if isinstance(key, float): return '"' + repr(key) + '"'
+        raise TypeError("key " + repr(key) + " is not a string")
+
+    def _encode(self, data, chunks, out):
+        """ Append the JSON of data to chunks, written to out when full """
+        if isinstance(data, basestring):
+            chunks.append(encode_basestring_ascii(data))
+        elif data is None:
+            chunks.append('null')
+        elif data is True:
+            chunks.append('true')
+        elif data is False:
+            chunks.append('false')
+        elif isinstance(data, (int, long)):
+            chunks.append(str(data))
+        elif isinstance(data, (float, Decimal)):
+            chunks.append(self._encode_float(data))
+        elif isinstance(data, (list, tuple, types.GeneratorType)):
+            chunks.append('[')
+            first = True
+            for value in data:
+                if not first: chunks.append(', ')
+                first = False
+                self._encode(value, chunks, out)
+                if out is not None and len(chunks) > self.buffer_size:
+                    out.write(''.join(chunks))
+                    del chunks[:]
+            chunks.append(']')
+        elif isinstance(data, dict):
+            chunks.append('{')
+            first = True
+            for key in sorted(data.keys()):
+                if not first: chunks.append(', ')
+                first = False
+                chunks.append(JSONWriter._encode_key(key))
+                chunks.append(': ')
+                self._encode(data[key], chunks, out)
+            chunks.append('}')
+        elif isinstance(data, date):
+            chunks.append(encode_basestring_ascii(str(data)))
+        elif isinstance(data, numpy.ndarray):
+            self._encode(data.tolist(), chunks, out)
+        elif isinstance(data, numpy.generic):
+            self._encode(data.item(), chunks, out)
+        else:
+            raise TypeError(repr(data) + " is not JSON serializable")
+
+    def dumps(self, data):
+        chunks = []
+        self._encode(data, chunks, None)
+        return ''.join(chunks)
+
+    def dump(self, data, out):
+        chunks = []
+        self._encode(data, chunks, out)
+        out.write(''.join(chunks))
+
+    def write(self, data, filepath):
+        """Write data to filepath, replacing it only once written completely
+
+        With an output manifest, filepath is not replaced if its content is
+        the same.
+        """
+        tmp_file = "%s.%i.%i" % (filepath, os.getpid(), thread.get_ident())
+        try:
+            with open(tmp_file, 'w') as f:
+                if JSONWriter.manifest is None:
+                    self.dump(data, f)
+                else:
+                    out = HashingFile(f)
+                    self.dump(data, out)
+            if JSONWriter.manifest is None:
+                os.rename(tmp_file, filepath)
+            else:
+                JSONWriter.manifest.commit(tmp_file, filepath, out.hexdigest(), out.size)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
@@ -0,0 +1,193 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Pool of MySQL connections shared by DSQuery and GrimoireSQL """
+
+import logging
+import os
+import threading
+import time
+
+
+class ConnectionPool(object):
+    """Bounded pool of connections per (host, port, user, database, group)
+
+    Each thread checks out one connection per database, used for all its
+    queries until it is released with release(). At most max_size
+    connections are opened per database: other threads wait for a released
+    one. The connections not used in the last check_interval seconds are
+    checked with ping() before being used again, and a lost connection is
+    replaced with a new one.
+
+    The session time zone of the connections is UTC.
+
+    MySQL connections can not be shared between processes, so after a fork
+    the pool of the child process starts empty. The inherited connections
+    are kept referenced: closing them would close the parent ones too.
+    """
+
+    # MySQL client errors for lost connections
+    LOST_CONNECTION = (2006, 2013) # server has gone away, lost connection
+
+    def __init__(self, max_size = 4, check_interval = 60, timeout = 600, connect = None):
+        self.max_size = max_size
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._connect = connect
+        self._init_state()
+
+    def _init_state(self):
+        self.pid = os.getpid()
+        self._lock = threading.Condition()
+        self._local = threading.local()
+        self._passwords = {} # key: password
+        self._idle = {} # key: [(connection, cursor, last_used)]
+        self._open = {} # key: number of connections opened
+        self._inherited = [] # connections from the parent process
+        self.stats = {"created": 0, "reused": 0, "reconnects": 0, "waits": 0}
+
+    @staticmethod
+    def get_key(user, database, host, port, group):
+        return (host, port, user, database, group)
+
+    def _check_fork(self):
+        if self.pid != os.getpid():
+            inherited = self._inherited + [(self._idle, getattr(self._local, 'conns', {}))]
+            self._init_state()
+            self._inherited = inherited
+
+    def _new_connection(self, key):
+        (host, port, user, database, group) = key
+        password = self._passwords[key]
+        connect = self._connect
+        if connect is None:
+            import MySQLdb
+            connect = MySQLdb.connect
+        if group is None:
+            conn = connect(user=user, passwd=password, db=database, host=host, port=port)
+        else:
+            conn = connect(read_default_group=group, db=database)
+        cursor = conn.cursor()
+        cursor.execute("SET NAMES 'utf8'")
+        # UNIX_TIMESTAMP(DATE(date)) of day periods in UTC, as GrimoireUtils.getPeriodAxis
+        cursor.execute("SET time_zone = '+00:00'")
+        self.stats["created"] += 1
+        return (conn, cursor)
+
+    def _is_alive(self, conn):
+        try:
+            conn.ping()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def is_lost_connection(error):
+        return len(error.args) > 0 and error.args[0] in ConnectionPool.LOST_CONNECTION
+
+    def _checkout(self, key):
+        """ Connection from the idle ones or a new one if the pool is not full """
+        self._lock.acquire()
+        try:
+            start = time.time()
+            while len(self._idle.get(key, [])) == 0 and \
+                  self._open.get(key, 0) >= self.max_size:
+                if time.time() - start > self.timeout:
+                    raise Exception("No free connections for " + key[3])
+                self.stats["waits"] += 1
+                self._lock.wait(self.timeout)
+            if len(self._idle.get(key, [])) > 0:
+                (conn, cursor, last_used) = self._idle[key].pop()
+                self.stats["reused"] += 1
+            else:
+                self._open[key] = self._open.get(key, 0) + 1
+                conn, cursor, last_used = None, None, None
+        finally:
+            self._lock.release()
+
+        try:
+            if conn is None:
+                conn, cursor = self._new_connection(key)
+            elif time.time() - last_used > self.check_interval and not self._is_alive(conn):
+                logging.info("Reconnecting to " + key[3])
+                self.stats["reconnects"] += 1
+                conn, cursor = self._new_connection(key)
+        except:
+            self._discard(key)
+            raise
+        return (conn, cursor)
+
+    def _discard(self, key):
+        self._lock.acquire()
+        try:
+            self._open[key] -= 1
+            self._lock.notify()
+        finally:
+            self._lock.release()
+
+    def get(self, user, password, database, host = "127.0.0.1", port = 3306, group = None):
+        """ Returns the (connection, cursor) of the current thread for a database """
+        self._check_fork()
+        key = ConnectionPool.get_key(user, database, host, port, group)
+        self._passwords[key] = password
+        if not hasattr(self._local, 'conns'): self._local.conns = {}
+        if key not in self._local.conns:
+            self._local.conns[key] = self._checkout(key)
+        return self._local.conns[key]
+
+    def reconnect(self, user, password, database, host = "127.0.0.1", port = 3306, group = None):
+        """ Replace the lost connection of the current thread for a database """
+        key = ConnectionPool.get_key(user, database, host, port, group)
+        self.stats["reconnects"] += 1
+        try:
+            self._local.conns[key] = self._new_connection(key)
+        except:
+            del self._local.conns[key]
+            self._discard(key)
+            raise
+        return self._local.conns[key]
+
+    def release(self):
+        """ Return the connections of the current thread to the pool """
+        self._check_fork()
+        conns = getattr(self._local, 'conns', {})
+        self._local.conns = {}
+        self._lock.acquire()
+        try:
+            for key in conns:
+                (conn, cursor) = conns[key]
+                self._idle.setdefault(key, []).append((conn, cursor, time.time()))
+            self._lock.notify_all()
+        finally:
+            self._lock.release()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["open"] = sum(self._open.values())
+        stats["idle"] = sum([len(idle) for idle in self._idle.values()])
+        return stats
+
+    def log_stats(self):
+        logging.info("Connection pool: %(open)i open, %(idle)i idle, %(created)i created, "
+                     "%(reused)i reused, %(reconnects)i reconnects, %(waits)i waits"
+                     % self.get_stats())
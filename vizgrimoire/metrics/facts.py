@@ -0,0 +1,394 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Materialized daily facts tables used to compute the basic metrics """
+
+import logging
+
+from sets import Set
+
+from vizgrimoire.metrics.query_builder import SCMQuery, ITSQuery, MLSQuery, SCRQuery
+
+
+class FactsTable(object):
+    """Daily facts of a data source per uuid, repository and organization
+
+    Each row counts the actions (commits, issues, messages ...) done in a day
+    by a person (uuid) in a repository for an organization. The value ALL
+    ('') in repository or organization means all of them, so each action is
+    counted once in the rows with (ALL, ALL), once per repository in the rows
+    with (repository, ALL) and once per organization the person was enrolled
+    in at the date of the action in the rows with (ALL, organization).
+
+    The table is built in the database of the data source by materialize()
+    and only the days from the last materialized one are built again in
+    later runs. A full build is done if the identities changed or if
+    actions older than the last materialized day were added to the data
+    source (for example, a new repository). Reports only use a facts table
+    if the data source has not changed since it was built.
+    """
+
+    ALL = ''
+    state_table = "facts_state"
+
+    name = None # name of the facts table
+    query = None # DSQuery class of the data source
+    measure = None # name of the column with the number of actions
+    measure_field = None # number of actions in each group of the source
+    date_field = None # date of the actions
+    enrollment_date = None # date to find the enrollment, date_field if None
+    repository_field = None
+    tables = [] # tables with the actions and their repository
+    filters = []
+    people_tables = [] # tables to get the people_id of each action
+    people_filters = [] # conditions to get pup.people_id of each action
+    count_table = None # raw table used to detect actions added in the past
+    count_date = None
+    metrics = {} # metric id: field computed from the facts table f
+
+    _exists = {} # (database, table): facts table exists
+    _fresh = {} # (database, table): facts table built with the current data
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def get_facts_table(db):
+        """ Returns the facts table for the DSQuery db or None """
+        for facts in [SCMFacts, ITSFacts, MLSFacts, SCRFacts]:
+            if type(db) == facts.query: return facts(db)
+        return None
+
+    def _execute(self, sql):
+        """ Execute a sql statement not using the query cache """
+        self.db.cursor.execute(sql)
+        return self.db.cursor.fetchall()
+
+    def exists(self):
+        key = (self.db.database, self.name)
+        if key not in FactsTable._exists:
+            q = """SELECT COUNT(*) FROM information_schema.tables
+                   WHERE table_schema = '%s' AND table_name = '%s'
+                """ % (self.db.database, self.name)
+            FactsTable._exists[key] = self._execute(q)[0][0] > 0
+        return FactsTable._exists[key]
+
+    def _get_sql_create(self):
+        sql = """CREATE TABLE IF NOT EXISTS %s (
+                 day DATE NOT NULL,
+                 uuid VARCHAR(128),
+                 repository VARCHAR(255) NOT NULL,
+                 organization VARCHAR(255) NOT NULL,
+                 %s INT NOT NULL,
+                 INDEX %s_day (day),
+                 INDEX %s_repository (repository, day),
+                 INDEX %s_organization (organization, day)
+                 ) ENGINE=MyISAM DEFAULT CHARSET=utf8
+              """ % (self.name, self.measure, self.name, self.name, self.name)
+        return sql
+
+    def _get_sql_state_create(self):
+        sql = """CREATE TABLE IF NOT EXISTS %s (
+                 name VARCHAR(64) NOT NULL PRIMARY KEY,
+                 watermark DATE,
+                 source_count INT,
+                 before_count INT,
+                 identities VARCHAR(255)
+                 ) ENGINE=MyISAM DEFAULT CHARSET=utf8
+              """ % (FactsTable.state_table)
+        return sql
+
+    def _get_sql_source(self, startdate, by_repository, by_organization):
+        """ SQL to get the facts from the actions since startdate """
+        fields = ["DATE(" + self.date_field + ") AS day", "pup.uuid AS uuid"]
+        if by_repository: fields.append(self.repository_field + " AS repository")
+        else: fields.append("'" + FactsTable.ALL + "' AS repository")
+        if by_organization: fields.append("org.name AS organization")
+        else: fields.append("'" + FactsTable.ALL + "' AS organization")
+        fields.append(self.measure_field + " AS " + self.measure)
+
+        tables = list(self.tables)
+        filters = list(self.filters)
+        people_tables = self.people_tables + ["people_uidentities pup"]
+        if by_organization:
+            enrollment_date = self.enrollment_date
+            if enrollment_date is None: enrollment_date = self.date_field
+            tables += people_tables
+            tables += [self.db.identities_db + ".enrollments enr",
+                       self.db.identities_db + ".organizations org"]
+            filters += self.people_filters
+            filters += ["pup.uuid = enr.uuid", "enr.organization_id = org.id",
+                        enrollment_date + " >= enr.start", enrollment_date + " < enr.end"]
+            from_ = ", ".join(tables)
+        else:
+            # Actions without identity are also counted
+            from_ = "(" + ", ".join(tables) + ") LEFT JOIN (" + ", ".join(people_tables) + ")"
+            from_ += " ON (" + " AND ".join(self.people_filters) + ")"
+        if startdate is not None:
+            filters.append(self.date_field + " >= " + startdate)
+
+        sql = "SELECT " + ", ".join(fields) + " FROM " + from_
+        if len(filters) > 0: sql += " WHERE " + " AND ".join(filters)
+        sql += " GROUP BY day, uuid, repository, organization"
+        return sql
+
+    def _get_identities_checksum(self):
+        """ Checksum of the identities tables used to build the facts """
+        idb = self.db.identities_db
+        res = self._execute("CHECKSUM TABLE people_uidentities, %s.enrollments, %s.organizations"
+                            % (idb, idb))
+        return ",".join([str(row[1]) for row in res])
+
+    def _get_source_count(self, before):
+        """ Number of raw actions before a date """
+        q = "SELECT COUNT(*) FROM %s WHERE %s < %s" % (self.count_table, self.count_date, before)
+        return int(self._execute(q)[0][0])
+
+    @staticmethod
+    def _get_day_end(watermark):
+        """ End of the watermark day, the last day in the facts table """
+        return watermark + " + INTERVAL 1 DAY"
+
+    def _get_watermark(self):
+        day = self._execute("SELECT MAX(day) FROM " + self.name)[0][0]
+        if day is None: return None
+        return "'" + day.strftime('%Y-%m-%d') + "'"
+
+    def is_fresh(self):
+        """ True if the source and identities did not change since the last build """
+        key = (self.db.database, self.name)
+        if key not in FactsTable._fresh:
+            q = "SELECT watermark, source_count, identities FROM %s WHERE name = '%s'" \
+                % (FactsTable.state_table, self.name)
+            res = self._execute(q)
+            reason = None
+            if len(res) == 0 or res[0][0] is None or res[0][1] is None:
+                reason = "not built"
+            elif res[0][2] != self._get_identities_checksum():
+                reason = "identities changed"
+            else:
+                watermark = "'" + res[0][0].strftime('%Y-%m-%d') + "'"
+                if int(res[0][1]) != self._get_source_count(self._get_day_end(watermark)):
+                    reason = "actions added until " + watermark
+                elif self._get_source_count_after(watermark) > 0:
+                    reason = "actions added after " + watermark
+            if reason is not None:
+                logging.warning(self.name + ": " + reason + ", not used. Materialize it again.")
+            FactsTable._fresh[key] = reason is None
+        return FactsTable._fresh[key]
+
+    def _get_source_count_after(self, watermark):
+        """ Number of raw actions after the watermark day """
+        q = "SELECT COUNT(*) FROM %s WHERE %s >= %s" % \
+            (self.count_table, self.count_date, self._get_day_end(watermark))
+        return int(self._execute(q)[0][0])
+
+    def _get_state(self):
+        q = "SELECT before_count, identities FROM %s WHERE name = '%s'" % (FactsTable.state_table, self.name)
+        res = self._execute(q)
+        if len(res) == 0: return None
+        return res[0]
+
+    def _set_state(self, watermark, identities):
+        """ Store the actions until the end of the watermark day, checked by
+            is_fresh, and before it, checked by the next incremental build """
+        source_count = before_count = "NULL"
+        if watermark is not None:
+            source_count = self._get_source_count(self._get_day_end(watermark))
+            before_count = self._get_source_count(watermark)
+        else: watermark = "NULL"
+        q = "REPLACE INTO %s (name, watermark, source_count, before_count, identities) " \
+            "VALUES ('%s', %s, %s, %s, '%s')" \
+            % (FactsTable.state_table, self.name, watermark, source_count, before_count, identities)
+        self._execute(q)
+
+    def materialize(self, full = False):
+        """ Build the facts table, only from the last day built if not full """
+        self._execute(self._get_sql_create())
+        self._execute(self._get_sql_state_create())
+        identities = self._get_identities_checksum()
+        watermark = self._get_watermark()
+        state = self._get_state()
+
+        if not full and watermark is not None:
+            if state is None or state[1] != identities:
+                logging.info(self.name + ": identities changed, full build")
+                full = True
+            elif state[0] is None or int(state[0]) != self._get_source_count(watermark):
+                logging.info(self.name + ": actions added before " + watermark + ", full build")
+                full = True
+
+        if full or watermark is None:
+            self._execute("DELETE FROM " + self.name)
+            startdate = None
+        else:
+            self._execute("DELETE FROM %s WHERE day >= %s" % (self.name, watermark))
+            startdate = watermark
+        logging.info(self.name + ": building facts from " + str(startdate))
+
+        columns = "(day, uuid, repository, organization, " + self.measure + ")"
+        for by_repository, by_organization in [(False, False), (True, False), (False, True)]:
+            sql = "INSERT INTO " + self.name + " " + columns + " "
+            sql += self._get_sql_source(startdate, by_repository, by_organization)
+            self._execute(sql)
+
+        self._set_state(self._get_watermark(), identities)
+        self.db.conn.commit()
+        FactsTable._exists[(self.db.database, self.name)] = True
+        FactsTable._fresh.pop((self.db.database, self.name), None)
+
+    def _get_value_where(self, field, value):
+        """ Condition for a value or a list of values of a filter """
+        values = value
+        if not isinstance(value, list): values = [value]
+        return "(" + " OR ".join([field + " = " + self._quote(v) for v in values]) + ")"
+
+    def _quote(self, value):
+        # The values of filters are already quoted
+        return value
+
+    def is_compatible(self, metric):
+        """ True if the metric can be computed from the facts table """
+        mfilter = metric.filters
+        if metric.id not in self.metrics: return False
+        if mfilter.people_out is not None or mfilter.global_filter is not None: return False
+        type_analysis = mfilter.type_analysis
+        if type_analysis and type_analysis[0] not in ['repository', 'company']: return False
+        return self.exists() and self.is_fresh()
+
+    def get_sql(self, metric, evolutionary):
+        """ SQL for the metric using the facts table or None if not compatible """
+        if not self.is_compatible(metric): return None
+        mfilter = metric.filters
+
+        fields = Set([self.metrics[metric.id]])
+        tables = Set([self.name + " f"])
+        filters = Set([])
+
+        group_field = None
+        dims = {'repository': "f.repository", 'company': "f.organization"}
+        all_dims = Set(dims.keys())
+        if mfilter.type_analysis:
+            analysis, value = mfilter.type_analysis[0], mfilter.type_analysis[1]
+            all_dims.remove(analysis)
+            if value is None:
+                filters.add(dims[analysis] + " <> '" + FactsTable.ALL + "'")
+                alias = self.db.get_group_field_alias(analysis)
+                group_field = dims[analysis] + " AS " + alias
+            else:
+                filters.add(self._get_value_where(dims[analysis], value))
+        for dim in all_dims:
+            filters.add(dims[dim] + " = '" + FactsTable.ALL + "'")
+
+        q = self.db.BuildQuery(mfilter.period, mfilter.startdate, mfilter.enddate,
+                               " f.day ", fields, tables, filters, evolutionary,
+                               mfilter.type_analysis, group_field = group_field)
+        return q
+
+
+class SCMFacts(FactsTable):
+    """ Commits per day, author, repository and organization """
+
+    name = "facts_scm"
+    query = SCMQuery
+    measure = "commits"
+    # Merges are not commits but their authors are authors
+    measure_field = "COUNT(DISTINCT(CASE WHEN s.id IN (SELECT a.commit_id FROM actions a) THEN s.rev END))"
+    date_field = "s.author_date"
+    repository_field = "r.name"
+    tables = ["scmlog s", "repositories r"]
+    filters = ["r.id = s.repository_id"]
+    people_filters = ["s.author_id = pup.people_id"]
+    count_table = "scmlog"
+    count_date = "author_date"
+    metrics = {"commits": "SUM(f.commits) AS commits",
+               "authors": "COUNT(DISTINCT(f.uuid)) AS authors"}
+
+
+class ITSFacts(FactsTable):
+    """ Opened tickets per day, submitter, tracker and organization """
+
+    name = "facts_its"
+    query = ITSQuery
+    measure = "opened"
+    measure_field = "COUNT(DISTINCT(i.id))"
+    date_field = "i.submitted_on"
+    repository_field = "t.url"
+    tables = ["issues i", "trackers t"]
+    filters = ["i.tracker_id = t.id"]
+    people_filters = ["i.submitted_by = pup.people_id"]
+    count_table = "issues"
+    count_date = "submitted_on"
+    metrics = {"opened": "SUM(f.opened) AS opened",
+               "openers": "COUNT(DISTINCT(f.uuid)) AS openers"}
+
+
+class MLSFacts(FactsTable):
+    """ Sent messages per day, sender, mailing list and organization """
+
+    name = "facts_mls"
+    query = MLSQuery
+    measure = "sent"
+    measure_field = "COUNT(DISTINCT(m.message_ID))"
+    date_field = "m.first_date"
+    repository_field = "m.mailing_list_url"
+    tables = ["messages m"]
+    people_tables = ["messages_people mp"]
+    people_filters = ["m.message_ID = mp.message_id", "mp.type_of_recipient = 'From'",
+                      "mp.email_address = pup.people_id"]
+    count_table = "messages"
+    count_date = "first_date"
+    metrics = {"sent": "SUM(f.sent) AS sent",
+               "senders": "COUNT(DISTINCT(f.uuid)) AS senders"}
+
+
+class SCRFacts(FactsTable):
+    """ Submitted reviews per day, submitter, repository and organization
+
+    As in SCRQuery.GetReviewsSQL, the date of the review is the upload of
+    its first patchset.
+    """
+
+    name = "facts_scr"
+    query = SCRQuery
+    measure = "submitted"
+    measure_field = "COUNT(DISTINCT(i.issue))"
+    date_field = "ch.changed_on"
+    enrollment_date = "i.submitted_on"
+    repository_field = "t.url"
+    tables = ["issues i", "issues_ext_gerrit ie", "changes ch", "trackers t"]
+    filters = ["i.id = ie.issue_id", "ch.issue_id = i.id", "ch.field = 'Upload'",
+               "ch.old_value = 1", "t.id = i.tracker_id"]
+    people_filters = ["i.submitted_by = pup.people_id"]
+    count_table = "issues"
+    count_date = "submitted_on"
+    metrics = {"submitted": "SUM(f.submitted) AS submitted"}
+
+    def _quote(self, value):
+        # SCRQuery filters values are not quoted
+        return "'" + value + "'"
+
+    def is_compatible(self, metric):
+        # Reviews from the filtered submitter are not in the facts
+        if self.db.GetIssuesFiltered() != "": return False
+        return FactsTable.is_compatible(self, metric)
@@ -244,16 +244,10 @@ class Closed(Metrics):
     def _get_sql(self, evolutionary):
         """ Implemented using Changed """
         close = True
-        changed = ITS.get_metrics("changed", ITS)
-        if changed is None:
-            # We need to create changers metric
-            changed = Changed(self.db, self.filters)
-            q = changed._get_sql(evolutionary, close)
-        else:
-            cfilters = changed.filters
-            changed.filters = self.filters
-            q = changed._get_sql(evolutionary, close)
-            changed.filters = cfilters
+        # Not the registered changed metric: its filters are not shared
+        # with the metrics computed in other threads
+        changed = Changed(self.db, self.filters)
+        q = changed._get_sql(evolutionary, close)
         return q
 
 
@@ -369,18 +363,12 @@ class Closers(Metrics):
         return self.db.ExecuteQuery(query)
 
     def _get_sql(self, evolutionary):
-        """ Implemented using Changers (changed metric should exists first) """
+        """ Implemented using Changers """
         close = True
-        changers = ITS.get_metrics("changers", ITS)
-        if changers is None:
-            # We need to create changers metric
-            changers = Changers(self.db, self.filters)
-            q = changers._get_sql(evolutionary, close)
-        else:
-            cfilters = changers.filters
-            changers.filters = self.filters
-            q = changers._get_sql(evolutionary, close)
-            changers.filters = cfilters
+        # Not the registered changers metric: its filters are not shared
+        # with the metrics computed in other threads
+        changers = Changers(self.db, self.filters)
+        q = changers._get_sql(evolutionary, close)
         return q
 
 class BMIIndex(Metrics):
@@ -67,6 +67,9 @@ class Metrics(object):
     domains_limit = 30
     max_decimals = 2
     min_item_per_tag = 20
+    # False for metrics whose value in a period depends on the data of
+    # previous periods (backlogs): their time series are always computed full
+    incremental = True
 
     def __init__(self, dbcon = None, filters = None):
         """db connection and filter to be used"""
@@ -116,6 +119,21 @@ class Metrics(object):
 
         raise NotImplementedError
 
+    def _get_sql_facts(self, evolutionary):
+        """ SQL using the materialized facts tables, None if not possible """
+        from vizgrimoire.metrics.facts import FactsTable
+
+        if not DSQuery.facts or self.db is None: return None
+        facts = FactsTable.get_facts_table(self.db)
+        if facts is None: return None
+        return facts.get_sql(self, evolutionary)
+
+    def _get_query(self, evolutionary):
+        """ SQL from the facts tables if compatible, from _get_sql if not """
+        query = self._get_sql_facts(evolutionary)
+        if query is None: query = self._get_sql(evolutionary)
+        return query
+
     def _get_sql_filter_all (self, evolutionary):
         """ Returns specific sql for the provided filters """
         raise NotImplementedError
@@ -191,8 +209,11 @@ class Metrics(object):
 
         """
 
-        query = self._get_sql(True)
-        ts = self.db.ExecuteQuery(query)
+        query = self._get_query(True)
+        return self.get_ts_from_result(self.db.ExecuteQuery(query))
+
+    def get_ts_from_result(self, ts):
+        """ Time series from the result of the evolutionary query """
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             id_field = self.db.get_group_field_alias(self.filters.type_analysis[0])
             ts = Metrics._convert_group_to_ts(ts, id_field)
@@ -205,9 +226,20 @@ class Metrics(object):
 
     def get_agg(self):
         """ Returns an aggregated value """
-        q = self._get_sql(False)
+        q = self._get_query(False)
         return self.db.ExecuteQuery(q)
 
+    def add_to_query_plan(self, plan, evolutionary):
+        """ Add the query of get_ts or get_agg to a QueryPlan, False if not possible """
+        # Only metrics using the standard get_ts and get_agg with _get_sql
+        if evolutionary and type(self).get_ts != Metrics.get_ts: return False
+        if not evolutionary and type(self).get_agg != Metrics.get_agg: return False
+        if self.db is None: return False
+        try:
+            return plan.add(self, self.db, lambda: self._get_query(evolutionary))
+        except NotImplementedError:
+            return False
+
 
     def get_trends(self, date, days):
         """ Returns the trend metrics between now and now-days values """
@@ -245,6 +277,81 @@ class Metrics(object):
         self.filters = filters
         return (data)
 
+    def get_trends_batch(self, date, days_list):
+        """ Returns the trend metrics for all days in days_list
+
+        All the windows (last and previous days) are computed in one query
+        using conditional aggregation. If the metric SQL can not be computed
+        in this way, get_trends is used for each days.
+        """
+        data = self._get_trends_batch(date, days_list)
+        if data is None:
+            data = {}
+            for days in days_list:
+                data = dict(data.items() + self.get_trends(date, days).items())
+        return data
+
+    def _get_trends_batch(self, date, days_list):
+        # Only metrics using the standard get_agg with _get_sql are supported
+        if type(self).get_agg != Metrics.get_agg: return None
+
+        all_items = self.filters.type_analysis and self.filters.type_analysis[1] is None
+        if all_items and self.id in ['bmitickets']:
+            logging.warning(self.id + " not supported in GROUP BY queries.")
+            return {}
+
+        windows = []
+        for days in days_list:
+            chardates = GetDates(date, days)
+            windows.append(("last_"+str(days), chardates[1], chardates[0]))
+            windows.append(("prev_"+str(days), chardates[2], chardates[1]))
+        startdate = min([window[1] for window in windows])
+        enddate = max([window[2] for window in windows])
+
+        # Keeping state of origin filters
+        filters = self.filters
+        self.filters = MetricFilters(filters.period, startdate, enddate,
+                                     filters.type_analysis)
+        self.filters.global_filter = filters.global_filter
+        self.filters.closed_condition = filters.closed_condition
+        try:
+            # The dates must be used only to filter the main date field
+            query = self._get_query(False)
+            if query is None or query.count(startdate) != 1: return None
+            # Windows seen by all query builders, also the ones of delegated metrics
+            DSQuery.set_trends_windows(windows)
+            query = self._get_query(False)
+        except NotImplementedError:
+            return None
+        finally:
+            DSQuery.set_trends_windows(None)
+            self.filters = filters
+        if query is None: return None
+
+        res = check_array_values(self.db.ExecuteQuery(query))
+        for window in windows:
+            if window[0] not in res:
+                logging.warning(self.id + " trends not computed in one query")
+                return None
+        to_int = lambda values: [int(value) if value is not None else 0 for value in values]
+
+        data = {}
+        if all_items:
+            group_field = self.db.get_group_field_alias(self.filters.type_analysis[0])
+            if group_field not in res: res[group_field] = []
+            data[group_field] = res[group_field]
+        for days in days_list:
+            last = to_int(res.get("last_"+str(days), []))
+            prev = to_int(res.get("prev_"+str(days), []))
+            diff = [last[i] - prev[i] for i in range(0, len(last))]
+            percentage = [GetPercentageDiff(prev[i], last[i]) for i in range(0, len(last))]
+            if not all_items:
+                last, diff, percentage = last[0], diff[0], percentage[0]
+            data[self.id+'_'+str(days)] = last
+            data['diff_net'+self.id+'_'+str(days)] = diff
+            data['percentage_'+self.id+'_'+str(days)] = percentage
+        return data
+
     def _get_trends_all_items(self, date, days):
         """ Returns the trend metrics between now and now-days values """
         from vizgrimoire.GrimoireUtils import check_array_values
@@ -0,0 +1,63 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Concurrent evaluation of metrics in a pool of threads """
+
+import os
+
+from vizgrimoire.metrics.query_builder import DSQuery
+
+
+class MetricsExecutor(object):
+    """Evaluate a function for several metrics with at most workers in flight
+
+    Metrics queries spend most of their time waiting for MySQL, which
+    releases the GIL, so the queries of different metrics overlap when run
+    in threads. Each thread uses its own connections from the DSQuery
+    connection pool, returned to it after each metric. With one worker,
+    metrics are evaluated in the calling thread as before.
+
+    The function must not modify objects shared between the metrics.
+    """
+
+    def __init__(self, workers = 1):
+        self.workers = workers
+        self._pool = None
+        self._pid = None # threads are not inherited by forked processes
+
+    def _run(self, args):
+        func, item = args
+        try:
+            return func(item)
+        finally:
+            DSQuery.connection_pool.release()
+
+    def map(self, func, items):
+        """ Returns [func(item) for item in items], in the same order """
+        if self.workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        if self._pool is None or self._pid != os.getpid():
+            from multiprocessing.pool import ThreadPool
+            self._pool = ThreadPool(self.workers)
+            self._pid = os.getpid()
+        return self._pool.map(self._run, [(func, item) for item in items], chunksize = 1)
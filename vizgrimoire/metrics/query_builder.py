@@ -22,21 +22,35 @@
 ##   Alvaro del Castillo <acs@bitergia.com>
 
 import logging
-import MySQLdb
 import re
 import sys
+import threading
 from sets import Set
 import datetime
 import time
 
 from vizgrimoire.metrics.metrics_filter import MetricFilters
+from vizgrimoire.metrics.connection_pool import ConnectionPool
 from vizgrimoire.GrimoireUtils import genDates
 from vizgrimoire.datahandlers.data_handler import DHESA
 
 class DSQuery(object):
     """ Generic methods to control access to db """
 
-    db_conn_pool = {} # one connection per database
+    connection_pool = ConnectionPool() # connections of all the query builders
+    query_cache = None # QueryCache shared by all queries, disabled by default
+    query_profiler = None # QueryProfiler recording all queries, disabled by default
+    _trends = threading.local() # windows of the trends queries built in each thread
+    schema_fingerprints = {} # schemas fingerprint per databases used
+    data_fingerprints = {} # data fingerprint per databases used in this run
+    histogram_bucket = None # bucket size to get durations as histograms
+    facts = False # use the materialized facts tables when possible
+    query_batching = False # metrics with the same tables and filters in one query
+    query_plan_args = None # [BuildQuery args] collected by a QueryPlan
+    # (table, columns, queries using it) indexes needed by the metrics
+    indexes = [("people_uidentities", ["people_id", "uuid"], "people and organizations joins")]
+    # (table, date field) of the raw data, counted to detect data added in the past
+    source_tables = []
 
     def __init__(self, user, password, database,
                  identities_db = None, projects_db = None,
@@ -49,28 +63,100 @@ class DSQuery(object):
         self.host = host
         self.port = port
         self.group = group
-        if database in DSQuery.db_conn_pool:
-            db = DSQuery.db_conn_pool[database]
-        else:
-            db = self.__SetDBChannel__(user, password, database, host, port, group)
-            DSQuery.db_conn_pool[database] = db
-        self.cursor = db.cursor()
-        self.cursor.execute("SET NAMES 'utf8'")
+        # Check the connection params with the first connection
+        self._get_connection()
+
+    def _get_connection(self):
+        """ (connection, cursor) of the current thread to the database """
+        return DSQuery.connection_pool.get(self.user, self.password, self.database,
+                                           self.host, self.port, self.group)
+
+    @property
+    def conn(self):
+        return self._get_connection()[0]
+
+    @property
+    def cursor(self):
+        return self._get_connection()[1]
+
+    def _execute(self, sql, cursor_class = None):
+        """ Execute sql in a cursor of the thread connection
 
-        db = self.__SetDBChannel__(user, password, database, host, port, group)
+            If the connection was lost it is opened again and sql executed
+            once more. Returns the cursor used.
+        """
+        for retry in [True, False]:
+            if cursor_class is None: cursor = self.cursor
+            else: cursor = self.conn.cursor(cursor_class)
+            try:
+                cursor.execute(sql)
+                return cursor
+            except Exception, e:
+                if not retry or not ConnectionPool.is_lost_connection(e): raise
+                logging.warning("Lost connection to " + self.database + ", reconnecting")
+                DSQuery.connection_pool.reconnect(self.user, self.password, self.database,
+                                                  self.host, self.port, self.group)
+
+    @staticmethod
+    def get_index_name(table, columns):
+        return ("grimoire_" + table + "_" + "_".join(columns))[0:64]
 
-        self.create_indexes()
+    def get_indexes_report(self):
+        """ Indexes needed by the metrics with the queries using them
+
+            Returns a list of dicts with table, columns, used_by and status:
+            present, missing or no_table if the table is not in the database.
+        """
+        q = """SELECT table_name, index_name, column_name
+               FROM information_schema.statistics
+               WHERE table_schema = '%s'
+               ORDER BY table_name, index_name, seq_in_index""" % (self.database)
+        self.cursor.execute(q)
+        # columns of each index per table
+        tables = {}
+        for (table, index, column) in self.cursor.fetchall():
+            tables.setdefault(table, {}).setdefault(index, []).append(column)
+        q = """SELECT table_name FROM information_schema.tables
+               WHERE table_schema = '%s'""" % (self.database)
+        self.cursor.execute(q)
+        all_tables = Set([row[0] for row in self.cursor.fetchall()])
+
+        report = []
+        for (table, columns, used_by) in self.indexes:
+            status = "missing"
+            if table not in all_tables:
+                status = "no_table"
+            else:
+                # An index starting with the same columns is also valid
+                for index_columns in tables.get(table, {}).values():
+                    if index_columns[0:len(columns)] == columns:
+                        status = "present"
+                        break
+            report.append({"table": table, "columns": columns,
+                           "used_by": used_by, "status": status})
+        return report
 
     def create_indexes(self):
-        """ Basic indexes used in each data source """
-        pass
+        """ Create the indexes needed by the metrics not in the database
+
+            It is done once with create_indexes.py, not in each connection.
+        """
+        for index in self.get_indexes_report():
+            if index["status"] != "missing": continue
+            name = DSQuery.get_index_name(index["table"], index["columns"])
+            q = "CREATE INDEX %s ON %s (%s)" % (name, index["table"], ",".join(index["columns"]))
+            logging.info("Creating index %s in %s for %s" % (name, self.database, index["used_by"]))
+            try:
+                self.cursor.execute(q)
+            except Exception:
+                logging.warning("Can not create index " + name + " in " + self.database)
 
     @classmethod
-    def GetSQLGlobal(cls, date, fields, tables, filters, start, end, all_items = None, strict = False):
-        group_field = None
+    def GetSQLGlobal(cls, date, fields, tables, filters, start, end, all_items = None,
+                     strict = False, group_field = None):
         count_field = None
         if all_items:
-            group_field = cls.get_group_field(all_items)
+            if group_field is None: group_field = cls.get_group_field(all_items)
             # Format: "count(distinct(pup.uuid)) AS authors"
             count_field = fields.split(" ")[2]
             if len(fields.split(" ")) == 5:
@@ -100,8 +186,7 @@ class DSQuery(object):
 
     @classmethod
     def GetSQLPeriod(cls, period, date, qfields, tables, filters, start, end,
-                     all_items = None, strict = False):
-        group_field = None
+                     all_items = None, strict = False, group_field = None):
 
         iso_8601_mode = 3
         if (period == 'day'):
@@ -118,7 +203,7 @@ class DSQuery(object):
             raise Exception
         # sql = paste(sql, 'DATE_FORMAT (',date,', \'%d %b %Y\') AS date, ')
         if all_items:
-            group_field = cls.get_group_field(all_items)
+            if group_field is None: group_field = cls.get_group_field(all_items)
             if group_field.find("DISTINCT") > -1:
                 # DISTINCT field should be the first
                 fields = group_field + ", "+ fields
@@ -163,6 +248,75 @@ class DSQuery(object):
 
         return(sql)
 
+    @staticmethod
+    def _split_args(expr):
+        """ Split a SQL expression by its top level commas """
+        args = []
+        level = 0
+        current = ""
+        for char in expr:
+            if char == "(": level += 1
+            elif char == ")": level -= 1
+            if char == "," and level == 0:
+                args.append(current)
+                current = ""
+            else:
+                current += char
+        args.append(current)
+        return args
+
+    @classmethod
+    def GetSQLTrends(cls, date, fields, tables, filters, windows, all_items = None,
+                     group_field = None, strict = False):
+        """ SQL to compute an aggregated field in several time windows at once
+
+        windows is a list of (name, startdate, enddate). The aggregate function
+        in fields (count or sum) is applied only to rows in each window using
+        CASE WHEN conditions, and the result is returned in a column per window
+        with the window name as alias. If strict, enddate is included in the
+        windows as in GetSQLGlobal. Returns None if fields is not a single
+        count or sum aggregation.
+        """
+        end_op = '<'
+        if strict: end_op = '<='
+        agg_re = re.compile(r"^\s*(count|sum)\s*\(\s*(distinct\b)?(.*)\)\s+as\s+\w+\s*$",
+                            re.IGNORECASE | re.DOTALL)
+        field = agg_re.match(fields)
+        if field is None: return None
+        func, distinct, expr = field.groups()
+        distinct = "DISTINCT " if distinct else ""
+        args = cls._split_args(expr)
+        if args == ["*"]: args = ["1"]
+
+        windows_fields = []
+        for (name, start, end) in windows:
+            cond = date + '>=' + start + ' AND ' + date + end_op + end
+            cases = ["CASE WHEN " + cond + " THEN " + arg.strip() + " END" for arg in args]
+            windows_fields.append(func + "(" + distinct + ", ".join(cases) + ") AS " + name)
+        fields = ", ".join(windows_fields)
+
+        if all_items:
+            if group_field is None: group_field = cls.get_group_field(all_items)
+            fields = group_field + ", " + fields
+
+        start = min([window[1] for window in windows])
+        end = max([window[2] for window in windows])
+        sql = 'SELECT ' + fields
+        sql += ' FROM ' + tables
+        sql += ' WHERE ' + date + '>=' + start + ' AND ' + date + end_op + end
+
+        reg_and = re.compile("^[ ]*and", re.IGNORECASE)
+        if (filters != ""):
+            if (reg_and.match (filters.lower())) is not None: sql += " " + filters
+            else: sql += ' AND ' + filters
+
+        if all_items:
+            if len(group_field.split(" ")) == 3:
+                group_field = group_field.split(" ")[2]
+            sql += " GROUP BY " + group_field
+
+        return sql
+
     def _get_fields_query(self, fields):
         # Returns a string with fields separated by ","
         fields_str = ""
@@ -196,11 +350,25 @@ class DSQuery(object):
         return filters_str
 
     def BuildQuery (self, period, startdate, enddate, date_field, fields,
-                    tables, filters, evolutionary, type_analysis = None, strict = False):
+                    tables, filters, evolutionary, type_analysis = None, strict = False,
+                    group_field = None):
         # Select the way to evolutionary or aggregated dataset
         # filter_all: get data for all items in a filter
+        # group_field: field used to group all items if not the default one
         q = ""
 
+        trends_windows = DSQuery.get_trends_windows()
+        if self.query_plan_args is not None and isinstance(fields, Set) and \
+           trends_windows is None:
+            # The query is built later by a QueryPlan with the fields of other metrics
+            self.query_plan_args.append({"period": period, "startdate": startdate,
+                                         "enddate": enddate, "date_field": date_field,
+                                         "fields": Set(fields), "tables": Set(tables),
+                                         "filters": Set(filters), "evolutionary": evolutionary,
+                                         "type_analysis": type_analysis, "strict": strict,
+                                         "group_field": group_field})
+            return QueryPlan.QUERY_MARK
+
         if isinstance(fields, Set):
             # Special case where query fields are sets.
             # TODO: The "if" should be removed after the migration given that
@@ -212,48 +380,213 @@ class DSQuery(object):
         # if all_items build a query for getting all items in one query
         all_items = self.get_all_items(type_analysis)
 
+        if trends_windows is not None and not evolutionary:
+            return self.GetSQLTrends(date_field, fields, tables, filters,
+                                     trends_windows, all_items, group_field, strict)
+
         if (evolutionary):
             q = self.GetSQLPeriod(period, date_field, fields, tables, filters,
-                                  startdate, enddate, all_items, strict = strict)
+                                  startdate, enddate, all_items, strict = strict,
+                                  group_field = group_field)
         else:
             q = self.GetSQLGlobal(date_field, fields, tables, filters,
-                                  startdate, enddate, all_items, strict = strict)
+                                  startdate, enddate, all_items, strict = strict,
+                                  group_field = group_field)
         return(q)
 
-    def __SetDBChannel__ (self, user=None, password=None, database=None,
-                      host="127.0.0.1", port=3306, group=None):
-        if (group == None):
-            db = MySQLdb.connect(user=user, passwd=password,
-                                 db=database, host=host, port=port)
-        else:
-            db = MySQLdb.connect(read_default_group=group, db=database)
+    @staticmethod
+    def GetSQLHistogram(q, value, fields, group_by, bucket):
+        """ Histogram of value per group_by fields of the rows in query q
 
-        return db
+            For each group and bucket of size bucket, the number of rows and
+            the sum of their values are returned, instead of all rows.
+        """
+        sql = "SELECT " + fields + ", ROUND(" + value + "/" + str(bucket) + ") AS bucket, "
+        sql += "COUNT(*) AS count, SUM(" + value + ") AS total "
+        sql += "FROM (" + q + ") histogram "
+        sql += "GROUP BY " + group_by + ", bucket"
+        return sql
+
+    @staticmethod
+    def set_trends_windows(windows):
+        """ [(name, startdate, enddate)] windows of the aggregated queries built
+            in this thread by any query builder, None for the normal queries """
+        DSQuery._trends.windows = windows
+
+    @staticmethod
+    def get_trends_windows():
+        return getattr(DSQuery._trends, "windows", None)
+
+    @staticmethod
+    def set_query_cache(query_cache):
+        """ Activate (QueryCache object) or deactivate (None) the results cache """
+        DSQuery.query_cache = query_cache
+
+    def _get_databases(self):
+        """ Databases used by the queries: data source, identities and projects """
+        return (self.database, self.identities_db, self.projects_db)
+
+    def get_schema_fingerprint(self):
+        """ Hash of the definition of all tables in the databases used """
+        import hashlib
+
+        key = self._get_databases()
+        if key not in DSQuery.schema_fingerprints:
+            dbs = [db for db in key if db is not None]
+            q = """
+                SELECT table_schema, table_name, column_name, column_type
+                FROM information_schema.columns
+                WHERE table_schema IN (%s)
+                ORDER BY table_schema, table_name, ordinal_position
+                """ % (",".join(["'"+db+"'" for db in dbs]))
+            self.cursor.execute(q)
+            schema = str(self.cursor.fetchall())
+            DSQuery.schema_fingerprints[key] = hashlib.sha1(schema).hexdigest()
+        return DSQuery.schema_fingerprints[key]
+
+    def get_data_fingerprint(self):
+        """ Hash of the rows and last date of the source tables and of the
+            identities, computed once per run. None if there are no source tables """
+        import hashlib
+
+        if len(self.source_tables) == 0: return None
+        key = self._get_databases()
+        if key not in DSQuery.data_fingerprints:
+            data = []
+            for (table, date_field) in self.source_tables:
+                q = "SELECT COUNT(*), MAX(%s) FROM %s" % (date_field, table)
+                data.append(tuple(self._execute(q).fetchone()))
+            data.append(self.get_identities_checksum())
+            DSQuery.data_fingerprints[key] = hashlib.sha1(str(data)).hexdigest()
+        return DSQuery.data_fingerprints[key]
+
+    def get_source_count(self, before):
+        """ Rows of each source table dated before a date, not cached """
+        counts = []
+        for (table, date_field) in self.source_tables:
+            q = "SELECT COUNT(*) FROM %s WHERE %s < %s" % (table, date_field, before)
+            counts.append(int(self._execute(q).fetchone()[0]))
+        return counts
+
+    def get_identities_checksum(self):
+        """ Checksum of the identities tables used by people and organizations filters, not cached """
+        tables = ["people_uidentities"]
+        if self.identities_db is not None:
+            tables += [self.identities_db + ".enrollments", self.identities_db + ".organizations"]
+        res = self._execute("CHECKSUM TABLE " + ", ".join(tables)).fetchall()
+        return ",".join([str(row[1]) for row in res])
+
+    def _ExecuteCached (self, sql, execute, key_sql = None):
+        """ Returns (result of execute(), cached) using the query cache if active
+
+            Results are only stored on disk if the data can be fingerprinted.
+        """
+        cache = DSQuery.query_cache
+        if cache is None or not cache.is_cacheable(sql): return (execute(), False)
+        if key_sql is None: key_sql = sql
+        data = self.get_data_fingerprint()
+        key = cache.get_key(key_sql, self.database, self.get_schema_fingerprint(), data)
+        result = cache.get(key)
+        if result is not None: return (result, True)
+        result = execute()
+        cache.set(key, result, persistent = data is not None)
+        return (result, False)
+
+    def _ExecuteTimed (self, sql, execute):
+        """ Returns the result of execute(), which returns (result, cached),
+            recording its time in the query profiler if active """
+        start = time.time()
+        result, cached = execute()
+        if DSQuery.query_profiler is not None:
+            DSQuery.query_profiler.record(self, sql, time.time() - start, result, cached)
+        return result
 
     def ExecuteQuery (self, sql):
         if sql is None: return {}
+        return self._ExecuteTimed(sql, lambda: self._ExecuteCached(sql, lambda: self._ExecuteQuery(sql)))
+
+    def _ExecuteQuery (self, sql):
         # print sql
         result = {}
-        self.cursor.execute(sql)
-        rows = self.cursor.rowcount
-        columns = self.cursor.description
+        cursor = self._execute(sql)
+        rows = cursor.rowcount
+        columns = cursor.description
 
         if columns is None: return result
 
         for column in columns:
             result[column[0]] = []
         if rows > 1:
-            for value in self.cursor.fetchall():
-                for (index,column) in enumerate(value):
-                    result[columns[index][0]].append(column)
+            # Transpose rows to columns in C instead of appending each cell
+            values = zip(*cursor.fetchall())
+            for i in range (0, len(columns)):
+                result[columns[i][0]] = list(values[i])
         elif rows == 1:
-            value = self.cursor.fetchone()
+            value = cursor.fetchone()
             for i in range (0, len(columns)):
                 result[columns[i][0]] = value[i]
         return result
 
+    @staticmethod
+    def _get_column_dtype(column):
+        """ numpy dtype for a column using its cursor.description info """
+        from MySQLdb.constants import FIELD_TYPE
+
+        int_types = [FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.LONG,
+                     FIELD_TYPE.INT24, FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR]
+        float_types = [FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE,
+                       FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL]
+        type_code, null_ok = column[1], column[6]
+
+        if type_code in int_types and not null_ok: return 'int64'
+        # NULL values in numeric columns are converted to NaN
+        elif type_code in int_types + float_types: return 'float64'
+        else: return 'object'
+
+    def ExecuteQueryColumnar (self, sql, chunk_size = 10000):
+        """ Execute sql returning a dict with a numpy array per column
+
+        Rows are read from a server side cursor in chunks of chunk_size rows,
+        so the full result is never stored as a list of Python rows. Columns
+        are always arrays, even if there is only one row.
+        """
+        execute = lambda: self._ExecuteQueryColumnar(sql, chunk_size)
+        return self._ExecuteTimed(sql, lambda: self._ExecuteCached(sql, execute,
+                                                                   "/* columnar */ " + sql))
+
+    def _ExecuteQueryColumnar (self, sql, chunk_size):
+        import numpy as np
+        from MySQLdb.cursors import SSCursor
+
+        result = {}
+        cursor = self._execute(sql, SSCursor)
+        try:
+            columns = cursor.description
+            if columns is None: return result
+
+            dtypes = [self._get_column_dtype(column) for column in columns]
+            chunks = [[] for column in columns]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows: break
+                values = zip(*rows)
+                for i in range (0, len(columns)):
+                    chunks[i].append(np.array(values[i], dtype = dtypes[i]))
+        finally:
+            cursor.close()
+
+        for i in range (0, len(columns)):
+            if len(chunks[i]) == 0:
+                result[columns[i][0]] = np.array([], dtype = dtypes[i])
+            else:
+                result[columns[i][0]] = np.concatenate(chunks[i])
+        return result
+
     def ExecuteViewQuery(self, sql):
-        self.cursor.execute(sql)
+        def execute():
+            self._execute(sql)
+            return ({}, False)
+        self._ExecuteTimed(sql, execute)
 
     def get_subprojects(self, project):
         """ Return all subprojects ids for a project in a string join by comma """
@@ -300,13 +633,15 @@ class DSQuery(object):
         field = None
         supported = ['people2','company','country','domain','project','repository',
                      'company'+MetricFilters.DELIMITER+'country',
-                     'company'+MetricFilters.DELIMITER+'project',]
+                     'company'+MetricFilters.DELIMITER+'project','uuid']
 
         analysis = filter_type
 
         if analysis not in supported:
             raise Exception("Can't get_group_field for " +  filter_type)
         if analysis == 'people2': field = "up.identifier"
+        # people activity in bulk using people_uidentities pup
+        elif analysis == 'uuid': field = "pup.uuid"
         elif analysis == "company": field = "org.name"
         elif analysis == "country": field = "cou.name"
         # elif analysis == "domain": field = "d.name"
@@ -434,9 +769,104 @@ class DSQuery(object):
         return filters
 
 
+class QueryPlan(object):
+    """Batch the queries of metrics differing only in their aggregated fields
+
+    The BuildQuery arguments of each metric query are collected instead of
+    building it. Metrics with the same tables, filters, date field and
+    dates are grouped, and a single SELECT with the fields of all of them
+    is run for each group. Its result columns are then split by alias
+    between the metrics of the group.
+    """
+
+    QUERY_MARK = "-- query collected by QueryPlan"
+    # Format: "count(distinct(s.rev)) as commits"
+    field_alias_re = re.compile(r"^.*\)\s+as\s+(\w+)\s*$", re.IGNORECASE | re.DOTALL)
+
+    def __init__(self):
+        self.queries = [] # [{"db", "key", "args", "aliases", "items"}]
+        self.results = {} # id(item): result of its query
+
+    @staticmethod
+    def _get_key(db, args):
+        type_analysis = args["type_analysis"]
+        if type_analysis is not None: type_analysis = tuple(type_analysis)
+        return (db.database, args["period"], args["startdate"], args["enddate"],
+                args["date_field"].strip(), frozenset(args["tables"]),
+                frozenset(args["filters"]), args["evolutionary"], type_analysis,
+                args["strict"], args["group_field"])
+
+    def add(self, item, db, get_query):
+        """ Add the query of item built by get_query(), False if it can not be batched """
+        db.query_plan_args = []
+        try:
+            query = get_query()
+        finally:
+            args_list = db.query_plan_args
+            db.query_plan_args = None
+        # Only queries built with a single BuildQuery call and not modified later
+        if query != QueryPlan.QUERY_MARK or len(args_list) != 1: return False
+        args = args_list[0]
+
+        aliases = {}
+        for field in args["fields"]:
+            alias = QueryPlan.field_alias_re.match(field)
+            if alias is None: return False
+            aliases[alias.group(1)] = field
+
+        key = QueryPlan._get_key(db, args)
+        for query in self.queries:
+            if query["key"] != key: continue
+            # The same alias must be the same field in all the metrics
+            if [a for a in aliases if query["aliases"].get(a, aliases[a]) != aliases[a]]:
+                continue
+            query["aliases"].update(aliases)
+            query["items"].append((item, aliases.keys()))
+            return True
+        self.queries.append({"db": db, "key": key, "args": args,
+                             "aliases": dict(aliases), "items": [(item, aliases.keys())]})
+        return True
+
+    def get_sql(self, query):
+        """ SQL with the fields of all the metrics in query """
+        args = query["args"]
+        return query["db"].BuildQuery(args["period"], args["startdate"], args["enddate"],
+                                      args["date_field"], Set(query["aliases"].values()),
+                                      Set(args["tables"]), Set(args["filters"]),
+                                      args["evolutionary"], args["type_analysis"],
+                                      args["strict"], args["group_field"])
+
+    def _execute(self, query):
+        return query["db"].ExecuteQuery(self.get_sql(query))
+
+    def execute(self, map_func = map):
+        """ Run the batched queries, using map_func to run them concurrently """
+        results = map_func(self._execute, self.queries)
+        for (query, result) in zip(self.queries, results):
+            for (item, aliases) in query["items"]:
+                others = Set(query["aliases"].keys()) - Set(aliases)
+                self.results[id(item)] = dict([(column, result[column]) for column in result
+                                               if column not in others])
+        logging.info("%i metrics queries batched in %i queries" %
+                     (len(self.results), len(self.queries)))
+
+    def get_result(self, item):
+        """ Result of the query of item, None if it was not batched """
+        return self.results.get(id(item))
+
+
 class SCMQuery(DSQuery):
     """ Specific query builders for source code management system data source """
 
+    indexes = DSQuery.indexes + [
+        ("scmlog", ["author_date"], "dates filter of all metrics"),
+        ("scmlog", ["author_id", "author_date"], "authors and organizations metrics"),
+        ("scmlog", ["committer_id", "date"], "committers metrics"),
+        ("scmlog", ["repository_id", "author_date"], "repositories filter"),
+        ("actions", ["commit_id"], "merges filter (nomergers) and files metrics"),
+        ("actions", ["file_id"], "files metrics")]
+    source_tables = [("scmlog", "author_date")]
+
     def GetSQLRepositoriesFrom (self):
         """ Tables needed for repository studies
 
@@ -952,6 +1382,15 @@ class SCMQuery(DSQuery):
 
 class ITSQuery(DSQuery):
     """ Specific query builders for issue tracking system data source """
+
+    indexes = DSQuery.indexes + [
+        ("issues", ["submitted_on"], "opened metrics"),
+        ("issues", ["submitted_by", "submitted_on"], "openers and organizations metrics"),
+        ("issues", ["tracker_id", "submitted_on"], "repositories filter"),
+        ("changes", ["issue_id", "changed_on"], "closed and time to close metrics"),
+        ("changes", ["changed_by", "changed_on"], "changers and closers metrics"),
+        ("changes", ["changed_on"], "changed and closed metrics")]
+    source_tables = [("issues", "submitted_on"), ("changes", "changed_on")]
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         tables = Set([])
@@ -1302,6 +1741,14 @@ class ITSQuery(DSQuery):
 
 class MLSQuery(DSQuery):
     """ Specific query builders for mailing lists data source """
+
+    indexes = DSQuery.indexes + [
+        ("messages", ["first_date"], "sent and threads metrics"),
+        ("messages", ["mailing_list_url", "first_date"], "repositories filter"),
+        ("messages", ["is_response_of"], "responses and threads metrics"),
+        ("messages_people", ["message_id", "type_of_recipient"],
+         "senders and organizations metrics")]
+    source_tables = [("messages", "first_date")]
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         #return (" messages m ")
@@ -1600,6 +2047,16 @@ class MLSQuery(DSQuery):
 class SCRQuery(DSQuery):
     """ Specific query builders for source code review source"""
 
+    indexes = DSQuery.indexes + [
+        ("issues", ["submitted_on"], "submitted, opened and pending metrics"),
+        ("issues", ["submitted_by", "submitted_on"], "submitters and organizations metrics"),
+        ("issues", ["tracker_id", "submitted_on"], "repositories filter"),
+        ("issues_ext_gerrit", ["issue_id", "mod_date"], "closed, merged and abandoned metrics"),
+        ("changes", ["issue_id", "field"], "submitted metric (first upload)"),
+        ("changes", ["changed_on"], "reviews metrics"),
+        ("changes", ["changed_by", "changed_on"], "reviewers metrics")]
+    source_tables = [("issues", "submitted_on"), ("changes", "changed_on")]
+
     def GetSQLRepositoriesFrom (self):
         #tables necessaries for repositories
         tables = Set([])
@@ -2416,6 +2873,11 @@ class SCRQuery(DSQuery):
 
 class IRCQuery(DSQuery):
 
+    indexes = DSQuery.indexes + [
+        ("irclog", ["date"], "sent and senders metrics"),
+        ("irclog", ["nick", "date"], "senders and organizations metrics"),
+        ("irclog", ["channel_id", "date"], "repositories filter")]
+
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         fields = Set([])
@@ -2677,30 +3139,10 @@ class MediawikiQuery(DSQuery):
 class QAForumsQuery(DSQuery):
     """ Specific query builders for question and answer platforms """
 
-    def create_indexes(self):
-        try:
-            q = "create index q_id_a_idx on answers (question_identifier)"
-            self.ExecuteQuery(q)
-        except Exception:
-            pass
-            # logging.info("Indexes for QAForums already created")
-            # import traceback
-            # traceback.print_exc(file=sys.stdout)
-        try:
-            q = "create index q_id_qt_idx on questionstags (question_identifier)"
-            self.ExecuteQuery(q)
-        except:
-            pass
-        try:
-            q = "create index tag_id_qt_idx on questionstags (question_identifier)"
-            self.ExecuteQuery(q)
-        except:
-            pass
-        try:
-            q = "create index tag_idx_t on tags (tag)"
-            self.ExecuteQuery(q)
-        except:
-            pass
+    indexes = DSQuery.indexes + [
+        ("answers", ["question_identifier"], "answers of questions"),
+        ("questionstags", ["question_identifier"], "tags of questions"),
+        ("tags", ["tag"], "tags filter")]
 
     def GetSQLReportFrom(self, type_analysis):
         # generic function to generate "from" clauses
@@ -2983,6 +3425,13 @@ class ReleasesDSQuery(DSQuery):
 
 class PullpoQuery(DSQuery):
 
+    indexes = DSQuery.indexes + [
+        ("pull_requests", ["created_at"], "submitted metrics"),
+        ("pull_requests", ["user_id", "created_at"], "submitters and organizations metrics"),
+        ("pull_requests", ["repo_id", "created_at"], "repositories filter"),
+        ("pull_requests", ["merged_at"], "merged metrics"),
+        ("pull_requests", ["closed_at"], "closed metrics")]
+
     def GetSQLRepositoriesFrom (self):
         # tables necessary for repositories
         fields = Set([])
@@ -0,0 +1,136 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Cache for the results of the queries executed with DSQuery """
+
+import cPickle as pickle
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+
+
+class QueryCache(object):
+    """Cache of query results
+
+    Results are stored in memory in a LRU dict with at most size entries.
+    If a directory is provided, persistent results are also stored on disk
+    so they can be reused in later runs.
+
+    The key of each result is built from the normalized SQL, the name of the
+    database, a fingerprint of the schemas used and a fingerprint of the
+    data (see DSQuery), so a schema change or a data load invalidates the
+    cached results. Results of data sources without a data fingerprint are
+    only kept in memory, for the current run. Queries depending on the
+    current time or random values are never cached.
+    """
+
+    # Functions whose value changes between executions of the same SQL
+    volatile_re = re.compile(r"\b(NOW|CURDATE|CURTIME|SYSDATE|UTC_DATE|UTC_TIME|UTC_TIMESTAMP|" +
+                             r"RAND|UUID)\s*\(|\bUNIX_TIMESTAMP\s*\(\s*\)|" +
+                             r"\b(CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|LOCALTIMESTAMP)\b",
+                             re.IGNORECASE)
+
+    def __init__(self, size = 1000, cache_dir = None):
+        self.size = size
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock() # metrics can run in several threads
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    @staticmethod
+    def normalize_sql(sql):
+        """ Remove not relevant white spaces from sql """
+        return re.sub(r"\s+", " ", sql).strip()
+
+    @staticmethod
+    def is_cacheable(sql):
+        """ Only the results of read queries not using the current time can be cached """
+        sql = QueryCache.normalize_sql(sql)
+        if sql[0:6].upper() != "SELECT": return False
+        return QueryCache.volatile_re.search(sql) is None
+
+    def get_key(self, sql, database, fingerprint, data_fingerprint = None):
+        key = "%s|%s|%s|%s" % (database, fingerprint, data_fingerprint,
+                               QueryCache.normalize_sql(sql))
+        return hashlib.sha1(key).hexdigest()
+
+    def _get_file(self, key):
+        return os.path.join(self.cache_dir, key + ".pickle")
+
+    def get(self, key):
+        """ Returns a copy of the result for key, or None if not cached """
+        with self._lock:
+            result = None
+            if key in self._results:
+                result = self._results.pop(key)
+                self._results[key] = result # most recently used
+                self.hits += 1
+            elif self.cache_dir is not None and os.path.isfile(self._get_file(key)):
+                with open(self._get_file(key), 'rb') as f:
+                    result = pickle.load(f)
+                self._add(key, result)
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                return None
+            # Callers modify the results they get
+            return deepcopy(result)
+
+    def _add(self, key, result):
+        self._results[key] = result
+        while len(self._results) > self.size:
+            self._results.popitem(last = False)
+
+    def set(self, key, result, persistent = True):
+        """ Cache a copy of result, also on disk if persistent """
+        result = deepcopy(result)
+        with self._lock:
+            self._add(key, result)
+            if self.cache_dir is not None and persistent:
+                # Write and rename so concurrent readers never get partial files
+                tmp_file = self._get_file(key) + "." + str(os.getpid())
+                with open(tmp_file, 'wb') as f:
+                    pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+                os.rename(tmp_file, self._get_file(key))
+
+    def get_stats(self):
+        return {"hits": self.hits, "disk_hits": self.disk_hits,
+                "misses": self.misses, "size": len(self._results)}
+
+    def log_stats(self):
+        stats = self.get_stats()
+        total = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        ratio = 0
+        if total > 0:
+            ratio = (stats["hits"] + stats["disk_hits"]) * 100.0 / total
+        logging.info("Query cache: %i hits (%i from disk), %i misses (%.1f%% hit ratio), %i results in memory" %
+                     (stats["hits"] + stats["disk_hits"], stats["disk_hits"],
+                      stats["misses"], ratio, stats["size"]))
@@ -0,0 +1,227 @@
+## Copyright (C) 2014 Bitergia
+##
+## This program is free software; you can redistribute it and/or modify
+## it under the terms of the GNU General Public License as published by
+## the Free Software Foundation; either version 3 of the License, or
+## (at your option) any later version.
+##
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+## GNU General Public License for more details.
+##
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+##
+## This file is a part of GrimoireLib
+##  (an Python library for the MetricsGrimoire and vizGrimoire systems)
+##
+##
+## Authors:
+##   Alvaro del Castillo <acs@bitergia.com>
+
+""" Profile of the queries executed with DSQuery """
+
+import csv
+import hashlib
+import json
+import logging
+import re
+import sys
+import threading
+
+
+class QueryProfiler(object):
+    """Record the time, rows and bytes of each query and who executed it
+
+    The caller of each query (metric, study, data source and filter) is
+    found walking the stack up to the first Metrics or Analyses object.
+    Queries are grouped by fingerprint: the SQL without literal values.
+
+    When the profile is built, the slowest query of the explain slowest
+    statements is run again with EXPLAIN, so their plans can be reviewed
+    with the profile. Records from other processes are added before, so
+    the slowest statements are the ones of all the processes and they are
+    explained from the main process, with the connection params recorded.
+    """
+
+    CSV_FIELDS = ["fingerprint", "calls", "time", "max_time", "rows", "bytes",
+                  "cached", "callers", "query"]
+
+    def __init__(self, explain = 0):
+        self.explain = explain
+        self.records = []
+        self._dbs = {} # database: query builder used in this process
+        self._connections = {} # database: connection params from other processes
+        self._lock = threading.Lock() # metrics can run in several threads
+
+    @staticmethod
+    def normalize_sql(sql):
+        """ SQL without literal values nor not relevant white spaces """
+        sql = re.sub(r"'(?:[^'\\]|\\.|'')*'", "?", sql)
+        sql = re.sub(r"\b\d+(\.\d+)?\b", "?", sql)
+        sql = re.sub(r"\s+", " ", sql).strip()
+        return re.sub(r"\(\s*\?(\s*,\s*\?)+\s*\)", "(?+)", sql)
+
+    @staticmethod
+    def get_fingerprint(sql):
+        return hashlib.sha1(QueryProfiler.normalize_sql(sql)).hexdigest()[0:16]
+
+    @staticmethod
+    def get_size(result):
+        """ Rows and bytes of values in a query result """
+        rows, size = 0, 0
+        for values in result.values():
+            if hasattr(values, "nbytes"):
+                rows, size = len(values), size + values.nbytes
+            elif isinstance(values, list):
+                rows, size = len(values), size + sum([len(str(v)) for v in values])
+            else:
+                rows, size = 1, size + len(str(values))
+        return (rows, size)
+
+    @staticmethod
+    def get_caller():
+        """ Metric, study, data source and filter of the running query """
+        from vizgrimoire.metrics.metrics import Metrics
+        from vizgrimoire.analysis.analyses import Analyses
+
+        caller = {"metric": None, "study": None, "data_source": None, "filter": None}
+        frame = sys._getframe(1)
+        while frame is not None:
+            obj = frame.f_locals.get("self")
+            if isinstance(obj, Metrics) or isinstance(obj, Analyses):
+                if isinstance(obj, Metrics):
+                    caller["metric"] = obj.id
+                    if obj.data_source is not None:
+                        caller["data_source"] = obj.data_source.get_name()
+                else:
+                    caller["study"] = obj.id
+                filters = obj.filters
+                if filters is not None and filters.type_analysis is not None:
+                    caller["filter"] = ":".join([str(f) for f in filters.type_analysis])
+                break
+            frame = frame.f_back
+        return caller
+
+    def record(self, db, sql, seconds, result, cached = False):
+        """ Add the execution of sql in db to the profile """
+        rows, size = QueryProfiler.get_size(result)
+        record = {"fingerprint": QueryProfiler.get_fingerprint(sql),
+                  "database": db.database, "time": seconds, "rows": rows,
+                  "bytes": size, "cached": cached, "sql": sql}
+        record.update(QueryProfiler.get_caller())
+        with self._lock:
+            self.records.append(record)
+            if db.database not in self._dbs: self._dbs[db.database] = db
+
+    @staticmethod
+    def _get_connection_params(db):
+        if not hasattr(db, "user"): return None
+        return (db.user, db.password, db.database, db.identities_db,
+                db.projects_db, db.host, db.port, db.group)
+
+    def _get_db(self, database):
+        """ Query builder of this process for database """
+        from vizgrimoire.metrics.query_builder import DSQuery
+
+        if database not in self._dbs:
+            self._dbs[database] = DSQuery(*self._connections[database])
+        return self._dbs[database]
+
+    def _explain(self):
+        """ EXPLAIN the slowest query of the explain slowest statements """
+        if self.explain == 0: return
+        slowest = {} # fingerprint: slowest record
+        for record in self.records:
+            if record["cached"]: continue
+            fingerprint = record["fingerprint"]
+            if fingerprint not in slowest or record["time"] > slowest[fingerprint]["time"]:
+                slowest[fingerprint] = record
+        candidates = sorted(slowest.values(), key = lambda record: record["time"], reverse = True)
+        candidates = [record for record in candidates
+                      if QueryProfiler.normalize_sql(record["sql"])[0:6].upper() == "SELECT"]
+        for record in candidates[0:self.explain]:
+            if "explain" in record: continue
+            try:
+                db = self._get_db(record["database"])
+                record["explain"] = db._ExecuteQuery("EXPLAIN " + record["sql"])
+            except Exception:
+                logging.warning("Can not explain query " + record["fingerprint"])
+
+    def pop_records(self):
+        """ Returns the records and the connection params of their databases,
+            removing them from the profile """
+        with self._lock:
+            records = self.records
+            self.records = []
+            connections = {}
+            for (database, db) in self._dbs.items():
+                params = QueryProfiler._get_connection_params(db)
+                if params is not None: connections[database] = params
+        return (records, connections)
+
+    def add_records(self, records):
+        """ Add records from other profile, i.e. in other process """
+        (records, connections) = records
+        with self._lock:
+            self.records += records
+            self._connections.update(connections)
+
+    def get_profile(self):
+        """ Queries ranked by total time, and time per caller """
+        self._explain()
+        statements = {}
+        callers = {}
+        for record in self.records:
+            caller = "/".join([str(record[field]) for field in
+                               ["data_source", "metric", "study", "filter"]])
+            if record["fingerprint"] not in statements:
+                statements[record["fingerprint"]] = {
+                    "fingerprint": record["fingerprint"], "calls": 0, "time": 0,
+                    "max_time": 0, "rows": 0, "bytes": 0, "cached": 0, "callers": [],
+                    "query": QueryProfiler.normalize_sql(record["sql"]),
+                    "sql": record["sql"], "database": record["database"]}
+            statement = statements[record["fingerprint"]]
+            statement["calls"] += 1
+            statement["time"] += record["time"]
+            statement["rows"] += record["rows"]
+            statement["bytes"] += record["bytes"]
+            if record["cached"]: statement["cached"] += 1
+            if caller not in statement["callers"]: statement["callers"].append(caller)
+            if record["time"] >= statement["max_time"]:
+                statement["max_time"] = record["time"]
+                statement["sql"] = record["sql"]
+            if "explain" in record and \
+               record["time"] >= statement.get("explain_time", 0):
+                statement["explain"] = record["explain"]
+                statement["explain_time"] = record["time"]
+
+            if caller not in callers:
+                callers[caller] = {"caller": caller, "calls": 0, "time": 0}
+            callers[caller]["calls"] += 1
+            callers[caller]["time"] += record["time"]
+
+        statements = sorted(statements.values(), key = lambda s: s["time"], reverse = True)
+        for statement in statements:
+            statement.pop("explain_time", None)
+        return {"calls": len(self.records),
+                "time": sum([record["time"] for record in self.records]),
+                "statements": statements,
+                "callers": sorted(callers.values(), key = lambda c: c["time"], reverse = True)}
+
+    def save(self, path):
+        """ Write the profile to path.json and the statements to path.csv """
+        profile = self.get_profile()
+        with open(path + ".json", "w") as f:
+            json.dump(profile, f, indent = 2, default = str)
+        with open(path + ".csv", "wb") as f:
+            writer = csv.writer(f)
+            writer.writerow(QueryProfiler.CSV_FIELDS)
+            for statement in profile["statements"]:
+                row = dict(statement)
+                row["callers"] = " ".join(row["callers"])
+                writer.writerow([row[field] for field in QueryProfiler.CSV_FIELDS])
+        logging.info("Query profile: %i queries in %.2fs saved in %s.json" %
+                     (profile["calls"], profile["time"], path))
@@ -397,15 +397,10 @@ class People(Metrics):
 
     def _get_sql (self, evolutionary):
         """ Implemented using Authors """
-        authors = SCM.get_metrics("authors", SCM)
-        if authors is None:
-            authors = Authors(self.db, self.filters)
-            q = authors._get_sql(evolutionary)
-        else:
-            afilters = authors.filters
-            authors.filters = self.filters
-            q = authors._get_sql(evolutionary)
-            authors.filters = afilters
+        # Not the registered authors metric: its filters are not shared
+        # with the metrics computed in other threads
+        authors = Authors(self.db, self.filters)
+        q = authors._get_sql(evolutionary)
         return q
 
     def _get_top_global (self, days = 0, metric_filters = None):
@@ -236,26 +236,13 @@ class Pending(Metrics):
     data_source = SCR
 
     def _get_metrics_for_pending(self):
-        # We need to fix the same filter for all metrics
+        # We need to fix the same filter for all metrics. New metrics, not
+        # the registered ones, so the filters of metrics computed in other
+        # threads are not changed.
         metrics_for_pendig = {}
-
-        metric = SCR.get_metrics("submitted", SCR)
-        if metric is None:
-            metric = Submitted(self.db, self.filters)
-        metric.filters = self.filters
-        metrics_for_pendig['submitted'] = metric
-
-        metric = SCR.get_metrics("merged", SCR)
-        if metric is None:
-            metric = Merged(self.db, self.filters)
-        metric.filters = self.filters
-        metrics_for_pendig['merged'] = metric
-
-        metric = SCR.get_metrics("abandoned", SCR)
-        if metric is None:
-            metric = Abandoned(self.db, self.filters)
-        metric.filters = self.filters
-        metrics_for_pendig['abandoned'] = metric
+        metrics_for_pendig['submitted'] = Submitted(self.db, self.filters)
+        metrics_for_pendig['merged'] = Merged(self.db, self.filters)
+        metrics_for_pendig['abandoned'] = Abandoned(self.db, self.filters)
 
         return metrics_for_pendig
 
@@ -805,6 +792,7 @@ class ReviewsWaitingForReviewerTS(Metrics):
     name = "Reviews waiting for reviewer"
     desc = "Number of preview processes waiting for reviewer"
     data_source = SCR
+    incremental = False # reviews submitted before the watermark still waiting
 
     def _get_date_from_month(self, monthid):
         # month format: year*12+month
@@ -813,160 +801,181 @@ class ReviewsWaitingForReviewerTS(Metrics):
         # We need the last day of the month
         import calendar
         last_day = calendar.monthrange(year, month)[1]
-        current = str(year)+"-"+str(month)+"-"+str(last_day)
-        return (current)
-
-    def _get_pending(self, month, reviewers = False):
-        startdate = self.filters.startdate
-        enddate = self.filters.enddate
-        identities_db = self.db.identities_db
-        type_analysis =  self.filters.type_analysis
-
-        current = self._get_date_from_month(month)
-
-        sql_max_patchset = self.db.get_sql_max_patchset_for_reviews (current)
-        sql_reviews_reviewed = self.db.get_sql_reviews_reviewed(self.filters.startdate, current)
-        sql_reviews_closed = self.db.get_sql_reviews_closed(self.filters.startdate, current)
-
-        fields = Set([])
-
-
-        fields.add("COUNT(DISTINCT(i.id)) as pending")
-        fields = self.db._get_fields_query(fields)
+        return datetime(year, month, last_day)
+
+    def _get_month_index(self, date, start_month, months):
+        """ First month index whose analysis date (last day) is >= date """
+        if date is None: return months+1
+        month = date.year*12 + date.month
+        if date > self._get_date_from_month(month): month += 1
+        return min(max(month - start_month, 0), months+1)
+
+    def _get_reviews(self, all_items):
+        """ Reviews submitted in the analysis period: (id, submitted_on, item) """
+        fields = "i.id AS issue_id, i.submitted_on"
+        if all_items is not None:
+            # DISTINCT group fields must be the first one
+            fields = self.db.get_group_field(all_items) + ", " + fields
 
         tables = Set([])
         tables.add("issues i")
         tables.union_update(self.db.GetSQLReportFrom(self.filters))
         tables = self.db._get_tables_query(tables)
 
-        # Pending (NEW = submitted-merged-abandoned) REVIEWS
         filters = Set([])
-        filters.add(" i.submitted_on <= '"+current+"'")
         filters.union_update(self.db.GetSQLReportWhere(self.filters,"issues"))
-        # remove closed reviews
-        filters.add("i.id NOT IN ("+ sql_reviews_closed +")")
-
-        if reviewers:
-            filters.add("i.id NOT IN (%s)" % (sql_reviews_reviewed))
-
         filters = self.db._get_filters_query(filters)
 
-        all_items = self.db.get_all_items(self.filters.type_analysis)
-
         q = self.db.GetSQLGlobal('i.submitted_on', fields, tables, filters,
-                                 startdate, enddate, all_items)
-
-        rs = self.db.ExecuteQuery(q)
-        if all_items is not None:
-            checkListArray(rs)
-        else:
-            rs = rs['pending']
-        return rs
-
-
-    def _get_ts_all(self):
-        startdate = self.filters.startdate
-        enddate = self.filters.enddate
-        period = self.filters.period
-        start = datetime.strptime(startdate, "'%Y-%m-%d'")
-        end = datetime.strptime(enddate, "'%Y-%m-%d'")
-
-        if (period != "month"):
-            logging.error("Period not supported in " + self.id  + " " + period)
-            return {}
+                                 self.filters.startdate, self.filters.enddate)
+        return check_array_values(self.db.ExecuteQuery(q))
 
+    def _get_reviews_closed(self):
+        """ Close date (mod_date) of the merged and abandoned reviews """
+        q = """
+            SELECT i.id AS issue_id, mod_date FROM issues i, issues_ext_gerrit ie
+            WHERE i.id = ie.issue_id AND (status='MERGED' OR status='ABANDONED')
+            AND submitted_on >= %s AND submitted_on < %s
+        """ % (self.filters.startdate, self.filters.enddate)
+        res = check_array_values(self.db.ExecuteQuery(q))
+        return dict(zip(res.get('issue_id', []), res.get('mod_date', [])))
+
+    def _get_reviews_waiting_submitter(self, start_month, months):
+        """ For each review, the months in which it is waiting for the submitter
+
+            A review is waiting for the submitter if its last patchset up to
+            the analysis date has been reviewed with -1 or -2. Returns a dict
+            with review id and a list of [from, to) months intervals.
+        """
+        q = """
+            SELECT ch.issue_id, CAST(ch.old_value as UNSIGNED) AS patchset,
+                   ch.changed_on,
+                   ((field = 'Code-Review' AND (new_value = -1 or new_value = -2))
+                    OR (field = 'Verified' AND (new_value = -1 or new_value = -2))) AS reviewed
+            FROM changes ch, issues i
+            WHERE ch.issue_id = i.id AND ch.old_value<>'' AND ch.old_value<>'None'
+            AND i.submitted_on >= %s AND i.submitted_on < %s
+            ORDER BY ch.changed_on
+        """ % (self.filters.startdate, self.filters.enddate)
+        res = check_array_values(self.db.ExecuteQuery(q))
+        if 'issue_id' not in res: return {}
+
+        # Patchsets reviewed at any time and patchsets uploads per review
+        reviewed = {}
+        uploads = {}
+        for i in range(0, len(res['issue_id'])):
+            issue = res['issue_id'][i]
+            if res['reviewed'][i]:
+                reviewed.setdefault(issue, Set([])).add(res['patchset'][i])
+            uploads.setdefault(issue, []).append((res['changed_on'][i], res['patchset'][i]))
+
+        waiting = {}
+        for issue in reviewed:
+            intervals = []
+            max_patchset = None
+            from_month = None
+            for (changed_on, patchset) in uploads[issue]:
+                if max_patchset is not None and patchset <= max_patchset: continue
+                max_patchset = patchset
+                month = self._get_month_index(changed_on, start_month, months)
+                if max_patchset in reviewed[issue]:
+                    if from_month is None: from_month = month
+                elif from_month is not None:
+                    intervals.append([from_month, month])
+                    from_month = None
+            if from_month is not None:
+                intervals.append([from_month, months+1])
+            waiting[issue] = intervals
+        return waiting
+
+    def _get_pending_ts(self, all_items = None):
+        """ Pending reviews time series computed sweeping reviews events
+
+        Reviews submitted, closed and reviewed are read once and the pending
+        backlog for all months (and all items) is computed adding +1/-1 at the
+        months in which each review starts and stops being pending.
+        """
+        start = datetime.strptime(self.filters.startdate, "'%Y-%m-%d'")
+        end = datetime.strptime(self.filters.enddate, "'%Y-%m-%d'")
         start_month = start.year*12 + start.month
-        end_month = end.year*12 + end.month
-        months = end_month - start_month
+        months = end.year*12 + end.month - start_month
+
+        id_field = None
+        if all_items is not None:
+            id_field = self.db.get_group_field_alias(all_items)
+
+        reviews = self._get_reviews(all_items)
+        closed = self._get_reviews_closed()
+        waiting_submitter = self._get_reviews_waiting_submitter(start_month, months)
+
+        # Deltas per item (None if not GROUP BY) and month
+        deltas = {}
+        deltas_reviewer = {}
+        done = Set([])
+        for i in range(0, len(reviews.get('issue_id', []))):
+            issue = reviews['issue_id'][i]
+            item = reviews[id_field][i] if id_field else None
+            # Reviews could be duplicated by the filters joins
+            if (item, issue) in done: continue
+            done.add((item, issue))
+            if item not in deltas:
+                deltas[item] = [0] * (months+2)
+                deltas_reviewer[item] = [0] * (months+2)
+            from_month = self._get_month_index(reviews['submitted_on'][i], start_month, months)
+            to_month = self._get_month_index(closed.get(issue), start_month, months)
+            if from_month >= to_month: continue
+            deltas[item][from_month] += 1
+            deltas[item][to_month] -= 1
+            # Remove the months waiting for the submitter
+            waiting = [[from_month, to_month]]
+            for interval in waiting_submitter.get(issue, []):
+                waiting = [[w[0], min(w[1], interval[0])] for w in waiting] + \
+                          [[max(w[0], interval[1]), w[1]] for w in waiting]
+                waiting = [w for w in waiting if w[0] < w[1]]
+            for w in waiting:
+                deltas_reviewer[item][w[0]] += 1
+                deltas_reviewer[item][w[1]] -= 1
+
+        def cumsum(values):
+            total = 0
+            ts = []
+            for value in values[0:months+1]:
+                total += value
+                ts.append(total)
+            return ts
+
+        pending = {}
+        pending['month'] = [start_month+i for i in range(0, months+1)]
+        if id_field is None:
+            pending['ReviewsWaiting_ts'] = cumsum(deltas.get(None, [0]*(months+2)))
+            pending['ReviewsWaitingForReviewer_ts'] = cumsum(deltas_reviewer.get(None, [0]*(months+2)))
+            return pending
 
-        # First, we need to group by the filter field the data
-        all_items = self.db.get_all_items(self.filters.type_analysis)
-        group_field = self.db.get_group_field(all_items)
-        id_field = group_field.split('.')[1] # remove table name
-
-        # First we get all the data from db
-        pending_data = {'month':[],'pending':[],id_field:[]}
-        pending_reviewers_data = {'month':[],'pending':[],id_field:[]}
-        for i in range(0, months+1):
-            # total pending this month
-            pending_month = self._get_pending(start_month+i)
-            pending_data['month'].append(start_month+i)
-            pending_data[id_field].append(pending_month[id_field])
-            pending_data['pending'].append(pending_month['pending'])
-            # total pending waiting for reviewers this month
-            pending_reviewers_month = self._get_pending(start_month+i, True)
-            pending_reviewers_data['month'].append(start_month+i)
-            pending_reviewers_data[id_field].append(pending_reviewers_month[id_field])
-            pending_reviewers_data['pending'].append(pending_reviewers_month['pending'])
-        # print pending_review_data
-        # Get the complete list of items
-        all_items = []
-        for data in pending_data[id_field]:
-            all_items = list(Set(all_items+data))
-        # Build the final dict with format [[months],[itens],[[item1_ts],...]
-        pending = {"month":[]}
-        pending['month'] = pending_data['month']
         pending = completePeriodIds(pending, self.filters.period,
                                     self.filters.startdate, self.filters.enddate)
+        pending[id_field] = []
         pending["ReviewsWaiting_ts"] = []
         pending["ReviewsWaitingForReviewer_ts"] = []
-        pending[id_field] = all_items
-        # For each item build the tme series and append it
-        for item in all_items:
-            item_ts = []
-            for i in range(0, months+1):
-                if len(pending_data[id_field])>0 and \
-                   item in pending_data[id_field][i]:
-                    pos = pending_data[id_field][i].index(item)
-                    item_ts.append(pending_data['pending'][i][pos])
-                else:
-                    # No pendings reviews for this item
-                    item_ts.append(0)
+        for item in deltas:
+            item_ts = cumsum(deltas[item])
+            # Only items with pending reviews
+            if max(item_ts) == 0: continue
+            pending[id_field].append(item)
             pending['ReviewsWaiting_ts'].append(item_ts)
-            item_reviewers_ts = []
-            for i in range(0, months+1):
-                if len(pending_reviewers_data[id_field])>0 and \
-                   item in pending_reviewers_data[id_field][i]:
-                    pos = pending_reviewers_data[id_field][i].index(item)
-                    item_reviewers_ts.append(pending_reviewers_data['pending'][i][pos])
-                else:
-                    # No pendings reviews for this item
-                    item_reviewers_ts.append(0)
-            pending['ReviewsWaitingForReviewer_ts'].append(item_reviewers_ts)
+            pending['ReviewsWaitingForReviewer_ts'].append(cumsum(deltas_reviewer[item]))
         return pending
 
     def get_ts(self):
+        if (self.filters.period != "month"):
+            logging.error("Period not supported in " + self.id  + " " + self.filters.period)
+            return {}
 
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             # Support for GROUP BY queries
-            return self._get_ts_all()
-
-        pending = {"month":[],
-                   "ReviewsWaiting_ts":[],
-                   "ReviewsWaitingForReviewer_ts":[]}
-
-        startdate = self.filters.startdate
-        enddate = self.filters.enddate
-        period = self.filters.period
-        start = datetime.strptime(startdate, "'%Y-%m-%d'")
-        end = datetime.strptime(enddate, "'%Y-%m-%d'")
-
-        if (period != "month"):
-            logging.error("Period not supported in " + self.id  + " " + period)
-            return {}
-
-        start_month = start.year*12 + start.month
-        end_month = end.year*12 + end.month
-        months = end_month - start_month
-
-        for i in range(0, months+1):
-            pending['month'].append(start_month+i)
-            pending_month = self._get_pending(start_month+i)
-            pending_reviewers_month = self._get_pending(start_month+i, True)
-            pending['ReviewsWaiting_ts'].append(pending_month)
-            pending['ReviewsWaitingForReviewer_ts'].append(pending_reviewers_month)
+            all_items = self.db.get_all_items(self.filters.type_analysis)
+            return self._get_pending_ts(all_items)
 
-        return pending
+        return self._get_pending_ts()
 
 
 class ReviewsWaitingForReviewer(Metrics):
@@ -1672,102 +1681,91 @@ class TimeToReview(Metrics):
         q = self.db.GetTimeToReviewQuerySQL (self.filters, bots)
         return q
 
-    def _get_agg_all(self, data):
-        from numpy import median, average
-        from vizgrimoire.GrimoireUtils import removeDecimals
-
-        data_all = {}
-
-        # First, we need to group by the filter field the data
+    def _get_id_field(self):
         all_items = self.db.get_all_items(self.filters.type_analysis)
-        id_field = self.db.get_group_field_alias(all_items)
-
-        items =  list(Set(data[id_field]))
-        data_all[id_field] = items
-        for id in ["review_time_days_median", "review_time_days_avg"]:
-            data_all[id] = []
+        if all_items is None: return None
+        return self.db.get_group_field_alias(all_items)
+
+    def _get_review_times(self, q, evol):
+        """ Size, median and average review time per item and/or month
+
+        Review times are grouped in one pass. If DSQuery.histogram_bucket
+        is set, MySQL returns the histogram of review times per group
+        instead of all of them.
+        """
+        from vizgrimoire.GrimoireUtils import medianAndAvgByGroup, medianAndAvgByGroupHistogram
+
+        id_field = self._get_id_field()
+        group_fields = []
+        if id_field is not None: group_fields.append(id_field)
+        if evol: group_fields.append("month")
+
+        bucket = self.db.histogram_bucket
+        if bucket is not None and len(group_fields) > 0 and "CONCAT(" not in str(id_field):
+            fields = []
+            if id_field is not None: fields.append(id_field)
+            if evol: fields.append("YEAR(changed_on)*12+MONTH(changed_on) AS month")
+            q = self.db.GetSQLHistogram(q, "revtime", ",".join(fields), ",".join(group_fields), bucket)
+            data = check_array_values(self.db.ExecuteQuery(q))
+            groups = zip(*[data.get(field, []) for field in group_fields])
+            return medianAndAvgByGroupHistogram(groups, data.get('bucket', []), data.get('count', []),
+                                                data.get('total', []), bucket)
+
+        data = check_array_values(self.db.ExecuteQuery(q))
+        columns = []
+        if id_field is not None: columns.append(data.get(id_field, []))
+        if evol:
+            columns.append([date.year*12 + date.month for date in data.get('changed_on', [])])
+        return medianAndAvgByGroup(zip(*columns), data.get('revtime', []))
 
-        for item in items:
-            # First, extract the data for the item
-            data_item = {"changed_on":[],"revtime":[]}
-            for i in range(0,len(data[id_field])):
-                if data[id_field][i] == item:
-                    data_item["changed_on"].append(data["changed_on"][i])
-                    data_item["revtime"].append(data["revtime"][i])
-            data_revtime = data_item['revtime']
-            if (isinstance(data, list) == False): data_revtime = [data_revtime]
-            # ttr_median = sorted(data)[len(data)//2]
-            if (len(data_revtime) == 0):
-                ttr_median = float("nan")
-                ttr_avg = float("nan")
-            else:
-                ttr_median = float(median(removeDecimals(data_revtime)))
-                ttr_avg = float(average(removeDecimals(data_revtime)))
-            data_all["review_time_days_median"].append(ttr_median)
-            data_all["review_time_days_avg"].append(ttr_avg)
-        return data_all
+    def _get_agg_all(self, q):
+        id_field = self._get_id_field()
+        times = self._get_review_times(q, False)
+        return {id_field : [group[0] for group in times['group']],
+                "review_time_days_median" : times['median'],
+                "review_time_days_avg" : times['avg']}
 
     def get_agg(self):
         from numpy import median, average
-        from vizgrimoire.GrimoireUtils import removeDecimals
 
         q = self._get_sql()
         if q is None: return {}
-        data = self.db.ExecuteQuery(q)
 
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             # Support for GROUP BY queries
-            return self._get_agg_all(data)
+            return self._get_agg_all(q)
 
-        data = data['revtime']
-        if (isinstance(data, list) == False): data = [data]
+        # All review times are needed: read them directly as an array
+        data = self.db.ExecuteQueryColumnar(q)['revtime']
         # ttr_median = sorted(data)[len(data)//2]
         if (len(data) == 0):
             ttr_median = float("nan")
             ttr_avg = float("nan")
         else:
-            ttr_median = float(median(removeDecimals(data)))
-            ttr_avg = float(average(removeDecimals(data)))
+            ttr_median = float(median(data))
+            ttr_avg = float(average(data))
         return {"review_time_days_median":ttr_median, "review_time_days_avg":ttr_avg}
 
-    def _get_ts_all(self, data):
-        from numpy import median, average
-        from vizgrimoire.GrimoireUtils import removeDecimals
-
-        data_all = {}
-
-        # First, we need to group by the filter field the data
-        all_items = self.db.get_all_items(self.filters.type_analysis)
-        id_field = self.db.get_group_field_alias(all_items)
-
-        items =  list(Set(data[id_field]))
-        data_all[id_field] = items
-        for id in ["review_time_days_median", "review_time_days_avg"]:
-            data_all[id] = []
-
+    def _get_ts_all(self, q):
+        id_field = self._get_id_field()
+        times = self._get_review_times(q, True)
+
+        # Months of each item
+        items = {}
+        for i in range(0, len(times['group'])):
+            (item, month) = times['group'][i]
+            if item not in items:
+                items[item] = {'month':[], 'review_time_days_median':[],
+                               'review_time_days_avg':[]}
+            items[item]['month'].append(month)
+            items[item]['review_time_days_median'].append(times['median'][i])
+            items[item]['review_time_days_avg'].append(times['avg'][i])
+
+        data_all = {id_field : [], 'review_time_days_median' : [], 'review_time_days_avg' : []}
         for item in items:
-            # First, extract the data for the item
-            data_item = {"changed_on":[],"revtime":[]}
-            for i in range(0,len(data[id_field])):
-                if data[id_field][i] == item:
-                    data_item["changed_on"].append(data["changed_on"][i])
-                    data_item["revtime"].append(data["revtime"][i])
-
-            med_avg_list = medianAndAvgByPeriod(self.filters.period,
-                                                data_item['changed_on'], data_item['revtime'])
-            metrics_list = {}
-            if (med_avg_list != None):
-                metrics_list['review_time_days_median'] = med_avg_list['median']
-                metrics_list['review_time_days_avg'] = med_avg_list['avg']
-                metrics_list['month'] = med_avg_list['month']
-            else:
-                metrics_list['review_time_days_median'] = []
-                metrics_list['review_time_days_avg'] = []
-                metrics_list['month'] = []
-
-            metrics_list = completePeriodIds(metrics_list, self.filters.period,
+            metrics_list = completePeriodIds(items[item], self.filters.period,
                                              self.filters.startdate, self.filters.enddate)
-
+            data_all[id_field].append(item)
             data_all['review_time_days_median'].append(metrics_list['review_time_days_median'])
             data_all['review_time_days_avg'].append(metrics_list['review_time_days_avg'])
             ts_fields = ['unixtime','date','month','id']
@@ -1779,23 +1777,16 @@ class TimeToReview(Metrics):
     def get_ts(self):
         q = self._get_sql()
         if q is None: return {}
-        review_list = self.db.ExecuteQuery(q)
-        checkListArray(review_list)
 
         if self.filters.type_analysis and self.filters.type_analysis[1] is None:
             # Support for GROUP BY queries
-            return self._get_ts_all(review_list)
+            return self._get_ts_all(q)
 
+        times = self._get_review_times(q, True)
         metrics_list = {}
-        med_avg_list = medianAndAvgByPeriod(self.filters.period, review_list['changed_on'], review_list['revtime'])
-        if (med_avg_list != None):
-            metrics_list['review_time_days_median'] = med_avg_list['median']
-            metrics_list['review_time_days_avg'] = med_avg_list['avg']
-            metrics_list['month'] = med_avg_list['month']
-        else:
-            metrics_list['review_time_days_median'] = []
-            metrics_list['review_time_days_avg'] = []
-            metrics_list['month'] = []
+        metrics_list['review_time_days_median'] = times['median']
+        metrics_list['review_time_days_avg'] = times['avg']
+        metrics_list['month'] = [group[0] for group in times['group']]
 
         metrics_list = completePeriodIds(metrics_list, self.filters.period,
                           self.filters.startdate, self.filters.enddate)
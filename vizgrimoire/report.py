@@ -52,6 +52,9 @@ class Report(object):
     _on_studies = []
     _automator = None
     _automator_file = None
+    _incremental = None # IncrementalTS if incremental time series are on
+    _metrics_executor = None # MetricsExecutor used to compute the metrics
+    _query_profile = None # path of the queries profile if profiling is on
 
     @staticmethod
     def init(automator_file, metrics_path = None):
@@ -59,6 +62,16 @@ class Report(object):
         Report._automator = read_main_conf(automator_file)
         Report._init_filters()
         Report._init_data_sources()
+        Report._init_query_cache()
+        Report._init_query_profiler()
+        Report._init_incremental()
+        Report._init_histograms()
+        Report._init_facts()
+        Report._init_query_batching()
+        Report._init_json_bundles()
+        Report._init_json_manifest()
+        Report._init_connection_pool()
+        Report._init_metrics_executor()
         if metrics_path is not None:
             Report._init_metrics(metrics_path)
             studies_path = metrics_path.replace("metrics","analysis")
@@ -98,6 +111,163 @@ class Report(object):
             if ds.get_name()+'_global_filter' in Report.get_config()['r']:
                 ds.set_global_filter(ds, Report.get_config()['r'][ds.get_name()+'_global_filter'])
 
+    @staticmethod
+    def _init_query_cache():
+        """ Query results cache: query_cache, query_cache_size and query_cache_dir """
+        from vizgrimoire.metrics.query_cache import QueryCache
+
+        config = Report._automator['r']
+        if config.get('query_cache', 'false').lower() not in ['true', 'yes', '1']:
+            return
+        size = int(config.get('query_cache_size', 1000))
+        cache_dir = config.get('query_cache_dir', None)
+        logging.info("Query cache enabled (size %i, dir %s)" % (size, cache_dir))
+        DSQuery.set_query_cache(QueryCache(size, cache_dir))
+
+    @staticmethod
+    def _init_query_profiler():
+        """ Profile of all queries saved in query_profile(.json|.csv) if defined
+
+        The query_profile_explain slowest queries are also run with EXPLAIN.
+        """
+        from vizgrimoire.metrics.query_profiler import QueryProfiler
+
+        config = Report._automator['r']
+        if 'query_profile' not in config: return
+        explain = int(config.get('query_profile_explain', 0))
+        logging.info("Queries profiled in " + config['query_profile'])
+        Report._query_profile = config['query_profile']
+        DSQuery.query_profiler = QueryProfiler(explain)
+
+    @staticmethod
+    def pop_query_profile_records():
+        """ Queries profiled in this process, to be added to the main one """
+        if DSQuery.query_profiler is None: return ([], {})
+        return DSQuery.query_profiler.pop_records()
+
+    @staticmethod
+    def add_query_profile_records(records):
+        if DSQuery.query_profiler is None: return
+        DSQuery.query_profiler.add_records(records)
+
+    @staticmethod
+    def save_query_profile():
+        if DSQuery.query_profiler is None: return
+        DSQuery.query_profiler.save(Report._query_profile)
+
+    @staticmethod
+    def _init_histograms():
+        """ Durations read as histograms with buckets of histogram_bucket days """
+        if 'histogram_bucket' not in Report._automator['r']: return
+        bucket = float(Report._automator['r']['histogram_bucket'])
+        logging.info("Durations histograms with buckets of %s days" % (bucket))
+        DSQuery.histogram_bucket = bucket
+
+    @staticmethod
+    def _init_facts():
+        """ Metrics from the facts tables built by materialize.py if facts """
+        if Report._automator['r'].get('facts', 'false').lower() not in ['true', 'yes', '1']:
+            return
+        logging.info("Metrics computed from facts tables when possible")
+        DSQuery.facts = True
+
+    @staticmethod
+    def _init_query_batching():
+        """ Metrics with the same tables and filters in one query if query_batching """
+        if Report._automator['r'].get('query_batching', 'false').lower() not in ['true', 'yes', '1']:
+            return
+        logging.info("Metrics queries batched when possible")
+        DSQuery.query_batching = True
+
+    @staticmethod
+    def _init_json_bundles():
+        """ Items JSON of each filter in one JSONBundle per kind if json_bundles """
+        from vizgrimoire.json_bundle import FilterItemsWriter
+
+        if Report._automator['r'].get('json_bundles', 'false').lower() not in ['true', 'yes', '1']:
+            return
+        logging.info("Filters items JSON written in bundles")
+        FilterItemsWriter.bundles = True
+
+    @staticmethod
+    def _init_json_manifest():
+        """ JSON files only replaced if changed, with json_compress siblings, if json_manifest """
+        from vizgrimoire.json_output import OutputManifest
+        from vizgrimoire.json_writer import JSONWriter
+
+        config = Report._automator['r']
+        if config.get('json_manifest', 'false').lower() not in ['true', 'yes', '1']:
+            return
+        compress = [ext.strip() for ext in config.get('json_compress', 'gz').split(",")
+                    if ext.strip() not in ['', 'none']]
+        logging.info("JSON files written only if changed, compressed as " + str(compress))
+        JSONWriter.manifest = OutputManifest(compress)
+
+    @staticmethod
+    def pop_json_manifest_entries():
+        """ JSON files written in this process, to be added to the main one """
+        from vizgrimoire.json_writer import JSONWriter
+        if JSONWriter.manifest is None: return None
+        return JSONWriter.manifest.pop_entries()
+
+    @staticmethod
+    def add_json_manifest_entries(entries):
+        from vizgrimoire.json_writer import JSONWriter
+        if JSONWriter.manifest is None: return
+        JSONWriter.manifest.add_entries(entries)
+
+    @staticmethod
+    def save_json_manifest():
+        from vizgrimoire.json_writer import JSONWriter
+        if JSONWriter.manifest is None: return
+        JSONWriter.manifest.save()
+
+    @staticmethod
+    def _init_connection_pool():
+        """ Max number of connections per database: db_pool_size """
+        if 'db_pool_size' not in Report._automator['r']: return
+        DSQuery.connection_pool.max_size = int(Report._automator['r']['db_pool_size'])
+
+    @staticmethod
+    def _init_metrics_executor():
+        """ Metrics of a data source computed concurrently by metrics_workers threads """
+        from vizgrimoire.metrics.metrics_executor import MetricsExecutor
+
+        workers = int(Report._automator['r'].get('metrics_workers', 1))
+        if workers > 1:
+            logging.info("Metrics computed by %i threads" % (workers))
+        Report._metrics_executor = MetricsExecutor(workers)
+
+    @staticmethod
+    def get_metrics_executor():
+        if Report._metrics_executor is None:
+            from vizgrimoire.metrics.metrics_executor import MetricsExecutor
+            Report._metrics_executor = MetricsExecutor()
+        return Report._metrics_executor
+
+    @staticmethod
+    def log_query_cache_stats():
+        DSQuery.connection_pool.log_stats()
+        if DSQuery.query_cache is not None:
+            DSQuery.query_cache.log_stats()
+        if Report._incremental is not None:
+            Report._incremental.log_stats()
+
+    @staticmethod
+    def _init_incremental():
+        """ Incremental time series if incremental_dir is configured """
+        from vizgrimoire.incremental import IncrementalTS
+
+        if 'incremental_dir' not in Report._automator['r']: return
+        state_dir = Report._automator['r']['incremental_dir']
+        logging.info("Incremental time series using " + state_dir)
+        config_hash = IncrementalTS.get_config_hash(Report._automator)
+        Report._incremental = IncrementalTS(state_dir, config_hash)
+
+    @staticmethod
+    def get_incremental():
+        return Report._incremental
+
     @staticmethod
     def get_default_filter():
         npeople = Metrics.default_npeople
@@ -250,6 +420,16 @@ class Report(object):
         #  logging.info("Total studies: " + str(len(Report._on_studies)))
 
 
+    @staticmethod
+    def reconnect():
+        """Use new db connections in a report worker after fork.
+
+        MySQLdb connections can not be shared between processes. The
+        connection pool opens new ones in the worker process, keeping the
+        inherited ones referenced (see ConnectionPool).
+        """
+        DSQuery.connection_pool.release()
+
     @staticmethod
     def get_config():
         return Report._automator